@@ -1,43 +1,60 @@
-from fastapi import APIRouter
-from app.api.v1.endpoints import bank_accounts, financial_settings , ledgers , transactions, inventory , transaction_filter , user , user_management,invitation_status,funds
+from fastapi import APIRouter, Depends
+from app.core.auth import require_tenant_access
+from app.api.v1.endpoints import bank_accounts, financial_settings , ledgers , transactions, inventory , transaction_filter , user , user_management,invitation_status,funds, statements
 
 
 api_router = APIRouter()
 
+# Bearer-token check for tenant data (see AUTH_MODE)
+tenant_auth = [Depends(require_tenant_access)]
+
 api_router.include_router(
     bank_accounts.router,
     prefix="/accounts",
-    tags=["Accounts"]
+    tags=["Accounts"],
+    dependencies=tenant_auth
 )
 
 api_router.include_router(
     financial_settings.router,
     prefix="/accounts",
-    tags=["Financial Settings"]
+    tags=["Financial Settings"],
+    dependencies=tenant_auth
 )
 
 api_router.include_router(
     ledgers.router, 
     prefix="/ledgers", 
-    tags=["Ledgers"]
+    tags=["Ledgers"],
+    dependencies=tenant_auth
 )
 
 api_router.include_router(
     transaction_filter.router,
     prefix="/transactions",
-    tags=["Transactions"]
+    tags=["Transactions"],
+    dependencies=tenant_auth
 )   
 
 api_router.include_router(
     transactions.router,
     prefix="/transactions",
-    tags=["Transactions"]
+    tags=["Transactions"],
+    dependencies=tenant_auth
 )  
 
 api_router.include_router(
     inventory.router,
     prefix="/inventory",
-    tags=["Inventory"]
+    tags=["Inventory"],
+    dependencies=tenant_auth
+)
+
+api_router.include_router(
+    statements.router,
+    prefix="/statements",
+    tags=["Statements"],
+    dependencies=tenant_auth
 )
 
 # api_router.include_router(
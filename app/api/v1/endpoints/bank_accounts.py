@@ -1,18 +1,31 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
 
+from app.db.async_session import DbRunner, get_db_runner
+from app.db.replica import get_read_db_runner
 from app.db.session import get_db
+from app.schemas.balance import BalanceAsOfOut
 from app.schemas.bank_account import BankAccountCreate, BankAccountOut, CashAccountCreate
 from app.schemas.common import ApiResponse
+from app.utils.balance_reconciliation import BANK_ACCOUNT, BalanceReconciliationService
 from app.utils.bank_accounts import BankAccountService
 
 router = APIRouter()
 
+
+def _preverified(request: Request) -> bool:
+    # Set by require_tenant_access once the token is checked against this client/user
+    return getattr(request.state, "principal", None) is not None
+
+
 @router.post("/bank", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
 def create_bank_account(
+    request: Request,
     bank_account_in: BankAccountCreate, 
     db: Session = Depends(get_db)
 ):
@@ -20,7 +33,7 @@ def create_bank_account(
     Create a new bank or cash account by calling the service layer.
     """
     service = BankAccountService(db)
-    new_account = service.create_account(bank_account_in)
+    new_account = service.create_account(bank_account_in, preverified=_preverified(request))
         
     return ApiResponse(
         success=True,
@@ -31,6 +44,7 @@ def create_bank_account(
 
 @router.post("/cash", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
 def create_cash_account(
+    request: Request,
     cash_in: CashAccountCreate,
     db: Session = Depends(get_db)
 ):
@@ -47,7 +61,7 @@ def create_cash_account(
     )
     
     service = BankAccountService(db)
-    cash_account = service.create_account(bank_account_in)
+    cash_account = service.create_account(bank_account_in, preverified=_preverified(request))
 
     return ApiResponse(
         success=True,
@@ -56,17 +70,47 @@ def create_cash_account(
         data=BankAccountOut.model_validate(cash_account, from_attributes=True)
     )
 
+@router.get("/{account_id}/balance", response_model=ApiResponse)
+async def get_bank_account_balance(
+    account_id: UUID,
+    client_id: UUID,
+    user_id: UUID,
+    as_of: date | None = Query(None, description="Local date (default: today)"),
+    runner: DbRunner = Depends(get_db_runner),
+):
+    """
+    Balance of a bank account at the end of `as_of`, from month-end snapshots
+    (created on first use, hence the primary database).
+    """
+    data = await runner.run(
+        lambda db: BalanceAsOfOut(
+            **BalanceReconciliationService(db).balance_on(
+                entity_type=BANK_ACCOUNT, entity_id=account_id, client_id=client_id, user_id=user_id, as_of=as_of
+            )
+        )
+    )
+    return ApiResponse(
+        success=True,
+        status_code=status.HTTP_200_OK,
+        message="Balance fetched successfully",
+        data=data
+    )
+
 @router.get("/{client_id}/{user_id}", response_model=ApiResponse)
-def get_user_bank_accounts(client_id: UUID, user_id: UUID, db: Session = Depends(get_db)):
+async def get_user_bank_accounts(client_id: UUID, user_id: UUID, runner: DbRunner = Depends(get_read_db_runner)):
     """
     Retrieve all bank accounts for a specific user by calling the service layer.
     """
-    service = BankAccountService(db)
-    accounts = service.get_all_by_user(client_id=client_id, user_id=user_id)
+    data = await runner.run(
+        lambda db: [
+            BankAccountOut.model_validate(a, from_attributes=True)
+            for a in BankAccountService(db).get_all_by_user(client_id=client_id, user_id=user_id)
+        ]
+    )
     
     return ApiResponse(
         success=True,
         status_code=status.HTTP_200_OK,
         message="Bank accounts fetched successfully",
-        data=[BankAccountOut.model_validate(a, from_attributes=True) for a in accounts]
+        data=data
     )
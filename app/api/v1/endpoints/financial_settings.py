@@ -4,9 +4,9 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.schemas.financial_settings import FinancialSettingsCreate, FinancialSettingsResponse
+from app.schemas.financial_settings import FinancialSettingsCreate
 from app.schemas.common import ApiResponse
-from app.utils.financial_settings import FinancialSettingsService
+from app.utils.financial_settings import FinancialSettingsService, settings_response
 
 router = APIRouter()
 
@@ -44,5 +44,5 @@ def get_financial_settings_api(
         success=True,
         status_code=200,
         message="Financial settings fetched successfully",
-        data=[FinancialSettingsResponse.model_validate(s, from_attributes=True) for s in settings]
+        data=[settings_response(s) for s in settings]
     )
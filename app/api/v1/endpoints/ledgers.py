@@ -1,47 +1,78 @@
 
+from datetime import date
 from typing import List
 from uuid import UUID
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.async_session import DbRunner, get_db_runner
+from app.db.replica import get_read_db_runner
 from app.schemas import ledger as ledger_schema
+from app.schemas.balance import BalanceAsOfOut
 from app.schemas.common import ApiResponse
+from app.utils.balance_reconciliation import LEDGER, BalanceReconciliationService
 from app.utils.ledger_utils import LedgerService
 
 router = APIRouter()
 
 @router.post("/", response_model=ApiResponse, status_code=201)
-def create_new_ledger(
+async def create_new_ledger(
     ledger_in: ledger_schema.LedgerCreate,
-    db: Session = Depends(get_db)
+    runner: DbRunner = Depends(get_db_runner)
 ):
     """
     Create a new ledger by calling the utility function.
     """
-    new_ledger = LedgerService(db).create(ledger_in)
+    new_ledger_id = await runner.run(lambda db: LedgerService(db).create(ledger_in).id)
     return ApiResponse(
         success=True,
         status_code=201,
         message="Ledger created successfully",
-        data={"id": str(new_ledger.id)}
+        data={"id": str(new_ledger_id)}
+    )
+
+
+@router.get("/{ledger_id}/balance", response_model=ApiResponse)
+async def read_ledger_balance(
+    ledger_id: UUID,
+    client_id: UUID,
+    user_id: UUID,
+    as_of: date | None = Query(None, description="Local date (default: today)"),
+    runner: DbRunner = Depends(get_db_runner)
+):
+    """
+    Balance of a ledger at the end of `as_of`, from month-end snapshots.
+    """
+    data = await runner.run(
+        lambda db: BalanceAsOfOut(
+            **BalanceReconciliationService(db).balance_on(
+                entity_type=LEDGER, entity_id=ledger_id, client_id=client_id, user_id=user_id, as_of=as_of
+            )
+        )
+    )
+    return ApiResponse(
+        success=True,
+        status_code=200,
+        message="Ledger balance fetched successfully",
+        data=data
     )
 
 
 @router.get("/{client_id}/{user_id}", response_model=ApiResponse)
-def read_ledgers_for_group_user(
+async def read_ledgers_for_group_user(
     client_id: UUID,
     user_id: UUID,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    runner: DbRunner = Depends(get_read_db_runner)
 ):
     """
     Retrieve paginated ledgers for given client_id and user_id.
     """
-    rows, total = LedgerService(db).page_by_group_user(client_id=client_id, user_id=user_id, page=page, size=size)
+    def load(db):
+        rows, total = LedgerService(db).page_by_group_user(client_id=client_id, user_id=user_id, page=page, size=size)
+        return [ledger_schema.LedgerListItem.model_validate(r, from_attributes=True) for r in rows], total
 
-    items = [ledger_schema.LedgerListItem.model_validate(r, from_attributes=True) for r in rows]
+    items, total = await runner.run(load)
     total_pages = (total + size - 1) // size
     data_list = [i.model_dump() for i in items]
 
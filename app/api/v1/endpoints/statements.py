@@ -0,0 +1,90 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import FileResponse
+
+from app.db.async_session import DbRunner
+from app.db.replica import get_read_db_runner
+from app.schemas.common import ApiResponse
+from app.schemas.statement import StatementJobCreate, StatementJobOut
+from app.utils.statement_jobs import prepare_statement, statement_cache, statement_jobs
+
+router = APIRouter()
+
+
+def _job_out(job_id: str, job_status: str, error: str | None = None) -> StatementJobOut:
+    return StatementJobOut(
+        job_id=job_id,
+        status=job_status,
+        download_url=f"/statements/{job_id}" if job_status == "ready" else None,
+        error=error,
+    )
+
+
+@router.post("/", response_model=ApiResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_statement_job(
+    payload: StatementJobCreate,
+    response: Response,
+    runner: DbRunner = Depends(get_read_db_runner),
+):
+    """
+    Starts rendering a PDF statement in the background and returns its job id.
+    An identical statement that is already rendered is reported ready immediately.
+    """
+    prepared = await runner.run(
+        lambda db: prepare_statement(db, payload, statement_cache, is_pending=statement_jobs.is_pending)
+    )
+    if prepared is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No transactions found for the selected period.",
+        )
+
+    job_id, data = prepared
+    if data is not None:
+        await statement_jobs.submit(job_id, data, client_id=payload.client_id, user_id=payload.user_id)
+
+    job_status, error = statement_jobs.status(job_id)
+    if job_status == "ready":
+        response.status_code = status.HTTP_200_OK
+    return ApiResponse(
+        success=job_status != "failed",
+        status_code=response.status_code,
+        message="Statement is ready" if job_status == "ready" else "Statement is being generated",
+        data=_job_out(job_id, job_status, error),
+    )
+
+
+@router.get("/{job_id}")
+def get_statement_job(
+    job_id: str,
+    response: Response,
+    user_id: UUID = Query(..., description="User ID"),
+    client_id: UUID = Query(..., description="Group ID"),
+):
+    """
+    Downloads the statement PDF once ready; otherwise reports the job status.
+    """
+    owner = statement_cache.owner(job_id)
+    if owner is None or owner != {"client_id": str(client_id), "user_id": str(user_id)}:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Statement job not found.")
+
+    job_status, error = statement_jobs.status(job_id)
+    if job_status == "ready":
+        return FileResponse(
+            statement_cache.pdf_path(job_id),
+            media_type="application/pdf",
+            filename="statement.pdf",
+        )
+    if job_status == "unknown":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Statement job not found.")
+    if job_status == "failed":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error or "PDF rendering failed.")
+
+    response.status_code = status.HTTP_202_ACCEPTED
+    return ApiResponse(
+        success=True,
+        status_code=status.HTTP_202_ACCEPTED,
+        message="Statement is being generated",
+        data=_job_out(job_id, job_status),
+    )
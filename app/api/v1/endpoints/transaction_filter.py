@@ -1,30 +1,71 @@
-from fastapi import APIRouter, Query, Depends, HTTPException, status
+from fastapi import APIRouter, Query, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from datetime import date
 import uuid
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.async_session import DbRunner
+from app.db.replica import get_read_db, get_read_db_runner, read_sessionmaker, read_sessionmaker_async
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionOut
 from app.utils.transaction_filter import (
     TransactionFilterService,
     LedgerSummaryService,
     PeriodEnum,
 )
-from fastapi.responses import StreamingResponse
-from app.utils.statement_generator import StatementGenerator
-from io import BytesIO
+from fastapi.responses import FileResponse, StreamingResponse
+from app.schemas.statement import StatementJobCreate
+from app.utils.statement_export import EXPORT_MEDIA_TYPES, export_range, iter_csv, iter_export_rows, iter_xlsx
+from app.utils.statement_generator import write_statement_pdf
+from app.utils.statement_jobs import prepare_statement, statement_cache
 
 router = APIRouter()
 
 
 @router.get("/history")
-def filter_transactions_api(
+async def filter_transactions_api(
+    request: Request,
     filter_type: str = Query(..., regex="^(today|yesterday|this_week|last_week|this_month|custom)$"),
     user_id: uuid.UUID = Query(..., description="User ID"),
     client_id: uuid.UUID = Query(..., description="Group ID"),
     start_date: date = None,
     end_date: date = None,
-    db: Session = Depends(get_db),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    page_size: int = Query(None, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    stream: bool = Query(False, description="Stream every row as NDJSON instead of paging"),
+    runner: DbRunner = Depends(get_read_db_runner),
 ):
-    result = TransactionFilterService.filter_transactions(db, filter_type, user_id, client_id, start_date, end_date)
+    # Checked up front: once streaming starts the status code is already sent
+    if filter_type == "custom" and not (start_date and end_date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date and end_date are required for a custom range.",
+        )
+
+    if stream:
+        stream_sessionmaker = await read_sessionmaker_async(request)
+
+        def ndjson_rows():
+            # Own session: the generator outlives the request-scoped dependency
+            stream_db = stream_sessionmaker()
+            try:
+                for tx in TransactionFilterService.iter_transactions(
+                    stream_db, filter_type, user_id, client_id, start_date, end_date
+                ):
+                    yield TransactionOut.model_validate(tx, from_attributes=True).model_dump_json() + "\n"
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+
+    def load_page(db):
+        page = TransactionFilterService.page_transactions(
+            db, filter_type, user_id, client_id, start_date, end_date, cursor=cursor, page_size=page_size
+        )
+        if page:
+            page["transactions"] = [TransactionOut.model_validate(tx, from_attributes=True) for tx in page["transactions"]]
+        return page
+
+    result = await runner.run(load_page)
     if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -34,13 +75,16 @@ def filter_transactions_api(
 
 
 @router.get("/total_balance")
-def get_ledger_summary(
+async def get_ledger_summary(
     period: PeriodEnum = Query(..., description="Select period (dropdown)"),
     user_id: uuid.UUID = Query(..., description="User ID"),
     client_id: uuid.UUID = Query(..., description="Group ID"),
-    db: Session = Depends(get_db),
+    breakdown: str = Query(None, regex="^(ledger|day)$", description="Optional per-ledger or per-day totals"),
+    runner: DbRunner = Depends(get_read_db_runner),
 ):
-    result = LedgerSummaryService.calculate_ledger_summary(db, period, user_id, client_id)
+    result = await runner.run(
+        lambda db: LedgerSummaryService.calculate_ledger_summary(db, period, user_id, client_id, breakdown=breakdown)
+    )
     if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -51,29 +95,84 @@ def get_ledger_summary(
 
 @router.get("/download_statement")
 def download_statement_api(
-    filter_type: str = Query(..., regex="^(yesterday|this_week|this_month)$"),
+    request: Request,
+    filter_type: str = Query(
+        ...,
+        regex="^(today|yesterday|this_week|last_week|this_month|this_financial_year|last_financial_year|custom)$",
+    ),
     user_id: uuid.UUID = Query(..., description="User ID"),
     client_id: uuid.UUID = Query(..., description="Group ID"),
-    db: Session = Depends(get_db),
+    start_date: date = None,
+    end_date: date = None,
+    format: str = Query("pdf", regex="^(pdf|csv|xlsx)$", description="pdf, csv or xlsx"),
+    db: Session = Depends(get_read_db),
 ):
     """
-    Download a transaction statement as a PDF.
+    Download a transaction statement as a PDF, CSV or XLSX file.
+    PDFs are served from the statement cache when the period's transactions are unchanged;
+    CSV and XLSX rows are streamed straight from the database.
+    Financial-year filters use the tenant's financial settings.
     """
-    generator = StatementGenerator(db)
-    pdf_buffer = generator.generate_statement_pdf(
-        filter_type=filter_type, 
-        user_id=user_id, 
-        client_id=client_id
+    if filter_type == "custom" and not (start_date and end_date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date and end_date are required for a custom range.",
+        )
+
+    if format != "pdf":
+        return _export_statement(request, db, format, filter_type, user_id, client_id, start_date, end_date)
+
+    statement_request = StatementJobCreate(
+        client_id=client_id, user_id=user_id, filter_type=filter_type, start_date=start_date, end_date=end_date
+    )
+    prepared = prepare_statement(db, statement_request, statement_cache)
+    if prepared is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No transactions found for the selected period.",
+        )
+
+    key, data = prepared
+    if data is not None:
+        if not write_statement_pdf(data, statement_cache.pdf_path(key)):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No transactions found for the selected period.",
+            )
+        statement_cache.write_owner(key, client_id=client_id, user_id=user_id)
+        statement_cache.prune()
+
+    return FileResponse(
+        statement_cache.pdf_path(key),
+        media_type="application/pdf",
+        filename="statement.pdf",
     )
 
-    if not pdf_buffer:
+
+def _export_statement(request, db, export_format, filter_type, user_id, client_id, start_date, end_date):
+    params = dict(filter_type=filter_type, user_id=user_id, client_id=client_id, start_date=start_date, end_date=end_date)
+    start, end, query = export_range(db, **params)
+    # Checked up front: once streaming starts the status code is already sent
+    if query.with_entities(Transaction.id).limit(1).first() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No transactions found for the selected period.",
         )
 
+    stream_sessionmaker = read_sessionmaker(request)
+    encode = iter_csv if export_format == "csv" else iter_xlsx
+
+    def export_chunks():
+        # Own session: the generator outlives the request-scoped dependency
+        stream_db = stream_sessionmaker()
+        try:
+            yield from encode(iter_export_rows(stream_db, **params))
+        finally:
+            stream_db.close()
+
+    filename = f"statement_{start.isoformat()}_{end.isoformat()}.{export_format}"
     return StreamingResponse(
-        iter([pdf_buffer.read()]),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=statement.pdf"}
-    )
\ No newline at end of file
+        export_chunks(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,28 +1,65 @@
 
 from uuid import UUID
-from fastapi import APIRouter, Depends, status, Response, Query
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.schemas.transaction import TransactionAutoCreate, TransactionFromQueryCreate, TransactionOut, TransactionUpdate
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from app.core.config import settings
+from app.db.async_session import DbRunner, get_db_runner
+from app.schemas.transaction import (
+    TransactionAutoCreate,
+    TransactionBatchQueryCreate,
+    TransactionBulkCreate,
+    TransactionBulkRowResult,
+    TransactionFromQueryCreate,
+    TransactionOut,
+    TransactionUpdate,
+)
 from app.schemas.common import ApiResponse
+from app.services.batch_parser import parse_queries_batched
+from app.services.parse_cache import issue_preview_token, parse_query_cached, redeem_preview_token
 from app.utils.transaction_query_util import TransactionQueryService
+from app.utils.transaction_limits import check_daily_limit
 from app.utils.transaction_service import TransactionService
 
 router = APIRouter()
 
 @router.post("/query", response_model=ApiResponse)
-def create_transaction_from_natural_language(
+async def create_transaction_from_natural_language(
     payload: TransactionFromQueryCreate,
     response: Response,
-    db: Session = Depends(get_db)
+    runner: DbRunner = Depends(get_db_runner)
 ):
     """
     Creates a transaction from a query or returns a preview if bank_account_id is missing.
     """
-    service = TransactionQueryService(db)
-    result = service.handle_query_transaction(payload)
+    if payload.bank_account_id:
+        # Reject early (without reserving) so a capped user does not cost an AI call;
+        # the slot itself is reserved after parsing, so no DB work is held open during the call
+        def precheck(db):
+            try:
+                check_daily_limit(db, user_id=payload.user_id, client_id=payload.client_id)
+            finally:
+                # End the read transaction so no connection is held across the AI call
+                db.rollback()
+
+        await runner.run(precheck)
+
+    parsed = None
+    if payload.preview_token and payload.bank_account_id:
+        parsed = await redeem_preview_token(
+            payload.preview_token, payload.client_id, payload.user_id, payload.query
+        )
+    if parsed is None:
+        parsed = await parse_query_cached(payload.query)
+
+    def handle(db):
+        result = TransactionQueryService(db).handle_query_transaction(payload, dict(parsed))
+        if isinstance(result, dict):
+            return result
+        return TransactionOut.model_validate(result, from_attributes=True)
+
+    result = await runner.run(handle)
 
     if isinstance(result, dict):
+        result["preview_token"] = await issue_preview_token(payload.client_id, payload.user_id, payload.query, parsed)
         response.status_code = status.HTTP_200_OK
         return ApiResponse(
             success=False,
@@ -37,51 +74,133 @@ def create_transaction_from_natural_language(
         success=True,
         status_code=status.HTTP_201_CREATED,
         message="Transaction created successfully.",
-        data=TransactionOut.model_validate(result, from_attributes=True)
+        data=result
+    )
+
+@router.post("/query/batch", response_model=ApiResponse)
+async def create_transactions_from_natural_language_batch(
+    payload: TransactionBatchQueryCreate,
+    response: Response,
+    runner: DbRunner = Depends(get_db_runner)
+):
+    """
+    Parses several queries (each may list several entries) with as few AI calls as possible
+    and creates every transaction in one database transaction, or previews them if
+    bank_account_id is missing.
+    """
+    if len(payload.queries) > settings.NL_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many queries in one batch (max {settings.NL_BATCH_MAX_QUERIES}).",
+        )
+
+    parsed_items = None
+    if payload.preview_token and payload.bank_account_id:
+        redeemed = await redeem_preview_token(
+            payload.preview_token, payload.client_id, payload.user_id, payload.queries, kind="batch"
+        )
+        if redeemed is not None:
+            parsed_items = [(query_index, parsed) for query_index, parsed in redeemed]
+    if parsed_items is None:
+        parsed_items = await parse_queries_batched(payload.queries)
+        if isinstance(parsed_items, dict):
+            TransactionQueryService.raise_if_unavailable(parsed_items)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=parsed_items)
+
+    if not payload.bank_account_id:
+        result = await runner.run(lambda db: TransactionQueryService(db).preview_batch(payload, parsed_items))
+        result["preview_token"] = await issue_preview_token(
+            payload.client_id, payload.user_id, payload.queries, [list(item) for item in parsed_items], kind="batch"
+        )
+        response.status_code = status.HTTP_200_OK
+        return ApiResponse(
+            success=False,
+            status_code=status.HTTP_200_OK,
+            message="Please select a bank account for these transactions.",
+            data=result,
+            meta={"requires": "bank_account_id", "transactions": len(parsed_items)}
+        )
+
+    data = await runner.run(
+        lambda db: [
+            TransactionOut.model_validate(tx, from_attributes=True)
+            for tx in TransactionQueryService(db).create_batch_from_parsed(payload, parsed_items)
+        ]
+    )
+    response.status_code = status.HTTP_201_CREATED
+    return ApiResponse(
+        success=True,
+        status_code=status.HTTP_201_CREATED,
+        message=f"{len(data)} transactions created successfully.",
+        data=data,
+        meta={"queries": len(payload.queries), "transactions": len(data)}
     )
 
 @router.post("/", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
-def create_transaction(payload: TransactionAutoCreate, db: Session = Depends(get_db)):
-    service = TransactionService(db)
-    tx = service.create_with_auto_ledger(payload)
+async def create_transaction(payload: TransactionAutoCreate, runner: DbRunner = Depends(get_db_runner)):
+    data = await runner.run(
+        lambda db: TransactionOut.model_validate(
+            TransactionService(db).create_with_auto_ledger(payload), from_attributes=True
+        )
+    )
     return ApiResponse(
         success=True,
         status_code=status.HTTP_201_CREATED,
         message="Transaction created successfully",
-        data=TransactionOut.model_validate(tx, from_attributes=True),
+        data=data,
+    )
+
+@router.post("/bulk", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+async def create_transactions_bulk(payload: TransactionBulkCreate, runner: DbRunner = Depends(get_db_runner)):
+    """
+    Creates many transactions in one database transaction and reports a result per row.
+    """
+    results = await runner.run(lambda db: TransactionService(db).create_bulk(payload.items))
+    created = sum(1 for r in results if r["success"])
+    return ApiResponse(
+        success=created == len(results),
+        status_code=status.HTTP_201_CREATED,
+        message=f"{created} of {len(results)} transactions created",
+        data=[TransactionBulkRowResult(**r) for r in results],
+        meta={"created": created, "failed": len(results) - created},
     )
 
 @router.put("/update", response_model=ApiResponse)
-def update_transaction_api(
+async def update_transaction_api(
     transaction_id: UUID = Query(...),
     user_id: UUID = Query(...),
     client_id: UUID = Query(...),
     payload: TransactionUpdate = None,
-    db: Session = Depends(get_db),
+    runner: DbRunner = Depends(get_db_runner),
 ):
-    service = TransactionService(db)
-    tx = service.update(
-        transaction_id=transaction_id,
-        user_id=user_id,
-        client_id=client_id,
-        payload=payload,
+    data = await runner.run(
+        lambda db: TransactionOut.model_validate(
+            TransactionService(db).update(
+                transaction_id=transaction_id,
+                user_id=user_id,
+                client_id=client_id,
+                payload=payload,
+            ),
+            from_attributes=True,
+        )
     )
     return ApiResponse(
         success=True,
         status_code=status.HTTP_200_OK,
         message="Transaction updated successfully",
-        data=TransactionOut.model_validate(tx, from_attributes=True),
+        data=data,
     )
 
 @router.delete("/delete", response_model=ApiResponse)
-def delete_transaction_api(
+async def delete_transaction_api(
     transaction_id: UUID = Query(...),
     user_id: UUID = Query(...),
     client_id: UUID = Query(...),
-    db: Session = Depends(get_db),
+    runner: DbRunner = Depends(get_db_runner),
 ):
-    service = TransactionService(db)
-    service.delete(tx_id=transaction_id, client_id=client_id, user_id=user_id)
+    await runner.run(
+        lambda db: TransactionService(db).delete(tx_id=transaction_id, client_id=client_id, user_id=user_id)
+    )
     return ApiResponse(
         success=True,
         status_code=status.HTTP_200_OK,
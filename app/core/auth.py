@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import requests
+from fastapi import HTTPException, Request, status
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.auth_client import remote_user_verifier
+
+logger = logging.getLogger(__name__)
+
+TENANT_FIELDS = ("client_id", "user_id")
+
+
+@dataclass(frozen=True)
+class Principal:
+    client_id: str
+    user_id: str
+    # "local" (JWT verified here) or "remote" (confirmed by the auth API)
+    source: str
+
+
+class KeyUnavailable(Exception):
+    """
+    The token cannot be checked locally (no key set, or no key matching its `kid`).
+    """
+
+
+class JwksCache:
+    """
+    Signing keys from AUTH_JWKS_URL, refreshed every AUTH_JWKS_REFRESH_SECONDS.
+    A token signed with an unknown key id forces an early refresh (key rotation),
+    at most once per AUTH_JWKS_MIN_REFRESH_SECONDS. If a refresh fails the
+    previous keys stay in use.
+    """
+
+    def __init__(self, url: str, *, refresh: float, min_refresh: float):
+        self.url = url
+        self.refresh = refresh
+        self.min_refresh = min_refresh
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: float | None = None
+        self._attempted_at = 0.0
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    def _fetch(self) -> None:
+        self._attempted_at = time.monotonic()
+        try:
+            resp = self._session.get(self.url, timeout=(settings.AUTH_CONNECT_TIMEOUT, settings.AUTH_TIMEOUT))
+            resp.raise_for_status()
+            keys = resp.json().get("keys", [])
+        except (requests.RequestException, ValueError) as exc:
+            logger.error("JWKS refresh failed: %s", exc)
+            return
+        self._keys = {key.get("kid", ""): key for key in keys}
+        self._fetched_at = self._attempted_at
+
+    def _lookup(self, kid: str | None) -> Dict[str, Any] | None:
+        if kid:
+            return self._keys.get(kid)
+        # A token without a kid is only accepted when the set holds a single key
+        return next(iter(self._keys.values())) if len(self._keys) == 1 else None
+
+    def get(self, kid: str | None) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            stale = self._fetched_at is None or now - self._fetched_at >= self.refresh
+            if (stale or self._lookup(kid) is None) and now - self._attempted_at >= self.min_refresh:
+                self._fetch()
+            key = self._lookup(kid)
+        if key is None:
+            raise KeyUnavailable(f"No signing key for kid={kid!r}")
+        return key
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "keys": len(self._keys),
+                "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None,
+            }
+
+
+jwks_cache = (
+    JwksCache(
+        settings.AUTH_JWKS_URL,
+        refresh=settings.AUTH_JWKS_REFRESH_SECONDS,
+        min_refresh=settings.AUTH_JWKS_MIN_REFRESH_SECONDS,
+    )
+    if settings.AUTH_JWKS_URL
+    else None
+)
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies the token's signature, expiry and (if configured) audience/issuer
+    and returns its claims. Raises KeyUnavailable if no key can check it,
+    JWTError if it is invalid.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        # Not a JWT at all (e.g. an opaque session token): only the auth API can tell
+        raise KeyUnavailable("Token is not a JWT")
+    if jwks_cache is not None:
+        key: Any = jwks_cache.get(header.get("kid"))
+    elif settings.AUTH_JWT_PUBLIC_KEY:
+        key = settings.AUTH_JWT_PUBLIC_KEY
+    else:
+        raise KeyUnavailable("Neither AUTH_JWKS_URL nor AUTH_JWT_PUBLIC_KEY is set")
+    return jwt.decode(
+        token,
+        key,
+        algorithms=settings.AUTH_JWT_ALGORITHMS,
+        audience=settings.AUTH_JWT_AUDIENCE,
+        issuer=settings.AUTH_JWT_ISSUER,
+        options={"verify_aud": settings.AUTH_JWT_AUDIENCE is not None},
+    )
+
+
+def _unauthorized(message: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail={"message": message, "code": "AUTH_INVALID_TOKEN"},
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _remote_principal(token: str, tenants: List[Dict[str, str]]) -> Principal:
+    tenant = next((t for t in tenants if len(t) == 2), None)
+    if tenant is None:
+        raise _unauthorized("Token cannot be verified without client_id and user_id.")
+    if not remote_user_verifier.verify(tenant["client_id"], tenant["user_id"], token):
+        raise _unauthorized("User verification failed.")
+    return Principal(client_id=tenant["client_id"], user_id=tenant["user_id"], source="remote")
+
+
+def authenticate(token: str, tenants: List[Dict[str, str]]) -> Principal:
+    """
+    Resolves the caller from a bearer token: locally from its JWT claims when
+    AUTH_MODE is "local", else (or, with AUTH_REMOTE_FALLBACK, when no key can
+    check it) through the auth API for the tenant named in the request.
+    Blocking (JWKS refresh, auth API); run it off the event loop.
+    """
+    if settings.AUTH_MODE == "local":
+        try:
+            claims = decode_token(token)
+        except KeyUnavailable as exc:
+            if not settings.AUTH_REMOTE_FALLBACK:
+                logger.error("Local token check unavailable: %s", exc)
+                raise _unauthorized("Token cannot be verified.")
+            return _remote_principal(token, tenants)
+        except ExpiredSignatureError:
+            raise _unauthorized("Token has expired.")
+        except (JWTClaimsError, JWTError):
+            raise _unauthorized("Invalid token.")
+        client_id = claims.get(settings.AUTH_JWT_CLIENT_CLAIM)
+        user_id = claims.get(settings.AUTH_JWT_USER_CLAIM)
+        if not client_id or not user_id:
+            raise _unauthorized("Token has no client_id/user_id claims.")
+        return Principal(client_id=str(client_id).lower(), user_id=str(user_id).lower(), source="local")
+    return _remote_principal(token, tenants)
+
+
+async def _json_body(request: Request) -> Any:
+    if not request.headers.get("content-type", "").startswith("application/json"):
+        return None
+    try:
+        # Starlette caches the body, so the endpoint still gets it
+        return await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _request_tenants(request: Request, body: Any) -> List[Dict[str, str]]:
+    """
+    client_id/user_id values named by the request's path, query and JSON body,
+    including each entry of a batch body's `items`.
+    """
+    sources = [request.path_params, request.query_params, body]
+    if isinstance(body, Mapping) and isinstance(body.get("items"), list):
+        sources.extend(body["items"])
+    tenants = []
+    for source in sources:
+        if not isinstance(source, Mapping):
+            continue
+        found = {field: str(source[field]).lower() for field in TENANT_FIELDS if source.get(field)}
+        if found:
+            tenants.append(found)
+    return tenants
+
+
+def _bearer_token(request: Request, body: Any) -> str | None:
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    # Account creation has always carried the token in the body
+    if isinstance(body, dict) and body.get("token"):
+        return str(body["token"]).strip().replace("Bearer ", "")
+    return None
+
+
+async def require_tenant_access(request: Request) -> Principal | None:
+    """
+    Router dependency: authenticates the bearer token (AUTH_MODE) and rejects
+    requests whose client_id/user_id differ from the caller's. The principal is
+    stored on `request.state.principal`. A no-op when AUTH_MODE is "off".
+    """
+    if settings.AUTH_MODE == "off":
+        return None
+
+    body = await _json_body(request)
+    token = _bearer_token(request, body)
+    if not token:
+        raise _unauthorized("Missing bearer token.")
+
+    tenants = _request_tenants(request, body)
+    if len({(t.get("client_id"), t.get("user_id")) for t in tenants if len(t) == 2}) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "A request may only address one client/user.", "code": "AUTH_MIXED_TENANTS"},
+        )
+    principal = await run_in_threadpool(authenticate, token, tenants)
+    for tenant in tenants:
+        if (
+            tenant.get("client_id", principal.client_id) != principal.client_id
+            or tenant.get("user_id", principal.user_id) != principal.user_id
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail={"message": "Token does not grant access to this user.", "code": "AUTH_FORBIDDEN"},
+            )
+    request.state.principal = principal
+    return principal
+
+
+async def identify_caller(request: Request, body: Any) -> str | None:
+    """
+    Who is making the request, for per-caller state kept before routing (e.g.
+    idempotency keys): the authenticated principal (or, with AUTH_MODE "off", a hash
+    of the bearer token) plus the tenants the request names. None when the token is
+    missing or rejected; the route's dependency then refuses the request.
+    """
+    tenants = _request_tenants(request, body)
+    token = _bearer_token(request, body)
+    if settings.AUTH_MODE == "off":
+        identity = hashlib.sha256((token or "").encode()).hexdigest()
+    else:
+        if not token:
+            return None
+        try:
+            principal = await run_in_threadpool(authenticate, token, tenants)
+        except HTTPException:
+            return None
+        identity = f"{principal.client_id}:{principal.user_id}"
+    named = sorted(f"{t.get('client_id')}:{t.get('user_id')}" for t in tenants)
+    return "|".join([identity, *named])
+
+
+def auth_status() -> Dict[str, Any]:
+    return {
+        "mode": settings.AUTH_MODE,
+        "remote_fallback": settings.AUTH_REMOTE_FALLBACK,
+        "jwks": jwks_cache.status() if jwks_cache is not None else None,
+    }
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Protocol, Tuple
+
+# Returned by lookups when a key is absent (None is a valid cached value)
+MISSING = object()
+
+
+class CacheBackend(Protocol):
+    """
+    Optional shared (cross-process) cache backend, e.g. a thin Redis wrapper.
+    Implementations handle their own serialization and return MISSING on a miss.
+    """
+
+    def get(self, key: str) -> Any: ...
+
+    def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def pop(self, key: str) -> Any:
+        """Atomically removes the key and returns its value (MISSING if absent or expired)."""
+        ...
+
+
+class TTLCache:
+    """
+    Thread-safe, process-local LRU cache whose entries expire after `ttl` seconds.
+
+    An optional shared `backend` acts as a second level: local misses fall through
+    to it and local writes/invalidations are mirrored to it. Entries already held
+    locally by other processes still live until their TTL runs out.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float, namespace: str, backend: CacheBackend | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespace = namespace
+        self.backend = backend
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _backend_key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, *map(str, parts)])
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            value = self.backend.get(self._backend_key(key))
+            if value is not MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(self._backend_key(key), value, self.ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(self._backend_key(key))
+
+    def pop(self, key: Hashable) -> Any:
+        """
+        Removes `key` and returns its value, or MISSING. With a backend the backend's
+        atomic pop decides, so across processes exactly one caller gets the value.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if self.backend is not None:
+            value = self.backend.pop(self._backend_key(key))
+        elif entry is not None and entry[0] > now:
+            value = entry[1]
+        else:
+            value = MISSING
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+            }
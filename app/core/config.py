@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,9 +16,65 @@ class Settings:
 
     
     DATABASE_URL: str = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    ASYNC_DATABASE_URL: str = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    # Serve ported endpoints through AsyncSession/asyncpg instead of the threadpool
+    DB_ASYNC_ENABLED: bool = os.getenv("DB_ASYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # Connection pool
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_POOL_USE_LIFO: bool = os.getenv("DB_POOL_USE_LIFO", "false").lower() in ("1", "true", "yes")
+    # PgBouncer transaction pooling: no app-side pool, no server-side prepared statements
+    DB_USE_NULLPOOL: bool = os.getenv("DB_USE_NULLPOOL", "false").lower() in ("1", "true", "yes")
+    DB_STATEMENT_CACHE: bool = os.getenv("DB_STATEMENT_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+    # Read replica for reporting endpoints (disabled when DB_REPLICA_HOST is unset)
+    DB_REPLICA_HOST: str = os.getenv("DB_REPLICA_HOST", "")
+    DB_REPLICA_PORT: str = os.getenv("DB_REPLICA_PORT", DB_PORT)
+    DB_REPLICA_USER: str = os.getenv("DB_REPLICA_USER", DB_USER)
+    DB_REPLICA_PASSWORD: str = os.getenv("DB_REPLICA_PASSWORD", DB_PASSWORD or "")
+    DB_REPLICA_NAME: str = os.getenv("DB_REPLICA_NAME", DB_NAME or "")
+    REPLICA_DATABASE_URL: str = (
+        f"postgresql://{DB_REPLICA_USER}:{DB_REPLICA_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_REPLICA_NAME}"
+    )
+    ASYNC_REPLICA_DATABASE_URL: str = (
+        f"postgresql+asyncpg://{DB_REPLICA_USER}:{DB_REPLICA_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_REPLICA_NAME}"
+    )
+    # Reads fall back to the primary when replay lag exceeds this many seconds
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "2"))
+    # After a write the client reads from the primary for this many seconds (cookie)
+    READ_YOUR_WRITES_SECONDS: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
 
    
     AUTH_API_URL: str = os.getenv("AUTH_API_URL", "")
+    AUTH_TIMEOUT: float = float(os.getenv("AUTH_TIMEOUT", "5"))
+    AUTH_CONNECT_TIMEOUT: float = float(os.getenv("AUTH_CONNECT_TIMEOUT", "2"))
+    AUTH_POOL_SIZE: int = int(os.getenv("AUTH_POOL_SIZE", "10"))
+    # Remote user verification results: confirmed users vs rejected tokens
+    AUTH_VERIFY_CACHE_SIZE: int = int(os.getenv("AUTH_VERIFY_CACHE_SIZE", "10000"))
+    AUTH_VERIFY_CACHE_TTL: float = float(os.getenv("AUTH_VERIFY_CACHE_TTL", "300"))
+    AUTH_VERIFY_NEGATIVE_TTL: float = float(os.getenv("AUTH_VERIFY_NEGATIVE_TTL", "30"))
+    # Bearer-token checks on the account/ledger/transaction routers:
+    # "off" (no check), "local" (JWT signature + claims) or "remote" (auth API per user)
+    AUTH_MODE: str = os.getenv("AUTH_MODE", "off").lower()
+    # Local mode: tokens that cannot be checked locally (no matching key) go to the auth API
+    AUTH_REMOTE_FALLBACK: bool = os.getenv("AUTH_REMOTE_FALLBACK", "true").lower() in ("1", "true", "yes")
+    AUTH_JWKS_URL: str = os.getenv("AUTH_JWKS_URL", "")
+    AUTH_JWT_PUBLIC_KEY: str = os.getenv("AUTH_JWT_PUBLIC_KEY", "")
+    AUTH_JWT_ALGORITHMS: list[str] = [a.strip() for a in os.getenv("AUTH_JWT_ALGORITHMS", "RS256").split(",") if a.strip()]
+    AUTH_JWT_AUDIENCE: str | None = os.getenv("AUTH_JWT_AUDIENCE") or None
+    AUTH_JWT_ISSUER: str | None = os.getenv("AUTH_JWT_ISSUER") or None
+    AUTH_JWT_CLIENT_CLAIM: str = os.getenv("AUTH_JWT_CLIENT_CLAIM", "client_id")
+    AUTH_JWT_USER_CLAIM: str = os.getenv("AUTH_JWT_USER_CLAIM", "user_id")
+    AUTH_JWKS_REFRESH_SECONDS: float = float(os.getenv("AUTH_JWKS_REFRESH_SECONDS", "600"))
+    # Unknown key ids trigger an early refresh, at most this often
+    AUTH_JWKS_MIN_REFRESH_SECONDS: float = float(os.getenv("AUTH_JWKS_MIN_REFRESH_SECONDS", "30"))
 
     # AI / Gemini
     GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")
@@ -25,9 +82,66 @@ class Settings:
         "GEMINI_API_URL",
         "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
     )
+    # Prompt template version (see app/services/prompts.py)
+    GEMINI_PROMPT_VERSION: str = os.getenv("GEMINI_PROMPT_VERSION", "v2")
+    GEMINI_TIMEOUT: float = float(os.getenv("GEMINI_TIMEOUT", "20"))
+    GEMINI_CONNECT_TIMEOUT: float = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+    # Max in-flight Gemini calls per process; further calls wait for a slot
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+    GEMINI_BACKOFF_BASE: float = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+    GEMINI_BACKOFF_MAX: float = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+    # Consecutive failed calls that open the circuit, and how long it stays open
+    GEMINI_BREAKER_THRESHOLD: int = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+    GEMINI_BREAKER_COOLDOWN: float = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+    # Rule-based parser tried before Gemini; its result is used at or above this confidence
+    NL_FAST_PATH_ENABLED: bool = os.getenv("NL_FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+    NL_FAST_PATH_THRESHOLD: float = float(os.getenv("NL_FAST_PATH_THRESHOLD", "0.85"))
+    # Parsed-query cache (keyed by normalized text + prompt version) and preview tokens
+    NL_PARSE_CACHE_SIZE: int = int(os.getenv("NL_PARSE_CACHE_SIZE", "5000"))
+    NL_PARSE_CACHE_TTL: float = float(os.getenv("NL_PARSE_CACHE_TTL", "86400"))
+    NL_PREVIEW_TOKEN_TTL: float = float(os.getenv("NL_PREVIEW_TOKEN_TTL", "900"))
+    # Mirror both caches to the cache_entries table so they survive restarts and are shared by workers
+    NL_PARSE_CACHE_PERSISTENT: bool = os.getenv("NL_PARSE_CACHE_PERSISTENT", "false").lower() in ("1", "true", "yes")
+    # Batch parsing: max queries per request, and inputs packed into one Gemini call
+    NL_BATCH_MAX_QUERIES: int = int(os.getenv("NL_BATCH_MAX_QUERIES", "50"))
+    NL_BATCH_INPUTS_PER_CALL: int = int(os.getenv("NL_BATCH_INPUTS_PER_CALL", "20"))
 
     # Business rules
+    DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "Asia/Kolkata")
     MAX_TRANSACTIONS_PER_DAY: int = int(os.getenv("MAX_TRANSACTIONS_PER_DAY", "15"))
+    BULK_TRANSACTIONS_MAX_ITEMS: int = int(os.getenv("BULK_TRANSACTIONS_MAX_ITEMS", "10000"))
+
+    # Transaction history
+    HISTORY_DEFAULT_PAGE_SIZE: int = int(os.getenv("HISTORY_DEFAULT_PAGE_SIZE", "100"))
+    HISTORY_MAX_PAGE_SIZE: int = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "1000"))
+    HISTORY_STREAM_BATCH_SIZE: int = int(os.getenv("HISTORY_STREAM_BATCH_SIZE", "1000"))
+
+    # PDF statements: rendered in worker processes and cached on disk
+    STATEMENT_CACHE_DIR: str = os.getenv(
+        "STATEMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "accountbook-statements")
+    )
+    STATEMENT_CACHE_MAX_FILES: int = int(os.getenv("STATEMENT_CACHE_MAX_FILES", "1000"))
+    STATEMENT_WORKERS: int = int(os.getenv("STATEMENT_WORKERS", "2"))
+    # A pending job marker older than this is treated as abandoned (worker died)
+    STATEMENT_JOB_TIMEOUT_SECONDS: float = float(os.getenv("STATEMENT_JOB_TIMEOUT_SECONDS", "600"))
+    # Long statements are rendered this many rows at a time and the PDFs concatenated
+    STATEMENT_ROWS_PER_CHUNK: int = int(os.getenv("STATEMENT_ROWS_PER_CHUNK", "500"))
+    # Re-check template files for changes on every render (development only)
+    TEMPLATE_AUTO_RELOAD: bool = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() in ("1", "true", "yes")
+    TEMPLATE_BYTECODE_CACHE_DIR: str = os.getenv(
+        "TEMPLATE_BYTECODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "accountbook-jinja")
+    )
+
+    # Idempotency-Key handling for transaction-creating POSTs: how long responses are
+    # replayed, and how long a running request blocks retries before it is presumed dead
+    IDEMPOTENCY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LOCK_SECONDS: float = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+
+    # Caches
+    LEDGER_CACHE_SIZE: int = int(os.getenv("LEDGER_CACHE_SIZE", "10000"))
+    FINANCIAL_SETTINGS_CACHE_SIZE: int = int(os.getenv("FINANCIAL_SETTINGS_CACHE_SIZE", "10000"))
+    FINANCIAL_SETTINGS_CACHE_TTL: float = float(os.getenv("FINANCIAL_SETTINGS_CACHE_TTL", "300"))
 
 settings = Settings()
 
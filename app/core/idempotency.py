@@ -0,0 +1,249 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.auth import identify_caller
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.idempotency import IdempotencyKey
+
+HEADER = "idempotency-key"
+
+# Transaction-creating POST routes that honour the header
+IDEMPOTENT_PATHS = {
+    "/transactions/",
+    "/transactions/bulk",
+    "/transactions/query",
+    "/transactions/query/batch",
+    "/inventory/",
+}
+
+
+
+class IdempotencyStore:
+    """
+    `idempotency_keys` rows. A key is claimed by inserting its row (the primary key
+    makes concurrent duplicates lose), then completed with the response or released
+    so the request can be retried. Expired rows are purged every `purge_every` claims.
+    """
+
+    def __init__(self, session_factory=SessionLocal, *, ttl: float, lock_timeout: float, purge_every: int = 1000):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.purge_every = purge_every
+        self._claims = 0
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, IdempotencyKey | None]:
+        """
+        ("new", None) when this request owns the key and must run, ("replay", row)
+        for a finished request, ("mismatch", None) when the key was used with a
+        different body, or ("in_progress", None) while the first request runs.
+        """
+        now = datetime.now(timezone.utc)
+        locked_until = now + timedelta(seconds=self.lock_timeout)
+        with self.session_factory() as db:
+            claimed = db.execute(
+                insert(IdempotencyKey)
+                .values(key=key, fingerprint=fingerprint, state="pending", expires_at=locked_until)
+                .on_conflict_do_nothing()
+                .returning(IdempotencyKey.key)
+            ).first()
+            if claimed is None:
+                # Take over an expired response or an abandoned pending request
+                claimed = db.execute(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now)
+                    .values(
+                        fingerprint=fingerprint,
+                        state="pending",
+                        status_code=None,
+                        headers=None,
+                        body=None,
+                        created_at=now,
+                        expires_at=locked_until,
+                    )
+                    .returning(IdempotencyKey.key)
+                ).first()
+            self._claims += 1
+            if self._claims % self.purge_every == 0:
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+            db.commit()
+            if claimed is not None:
+                return "new", None
+
+            row = db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key)).scalar_one_or_none()
+        if row is None:
+            # Released between our insert and read; the client may simply retry
+            return "in_progress", None
+        if row.fingerprint != fingerprint:
+            return "mismatch", None
+        if row.state != "complete":
+            return "in_progress", None
+        return "replay", row
+
+    def complete(self, key: str, *, status_code: int, headers: List[List[str]], body: bytes) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(
+                    state="complete",
+                    status_code=status_code,
+                    headers=headers,
+                    body=body,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+                )
+            )
+            db.commit()
+
+    def release(self, key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.state == "pending"))
+            db.commit()
+
+
+idempotency_store = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS, lock_timeout=settings.IDEMPOTENCY_LOCK_SECONDS
+)
+
+
+def _error(status_code: int, message: str, code: str) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    body = json.dumps({
+        "success": False,
+        "status_code": status_code,
+        "message": message,
+        "data": None,
+        "error": {"type": "Idempotency", "message": message, "code": code},
+        "meta": None,
+    }).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if status_code == 409:
+        headers.append((b"retry-after", b"1"))
+    return status_code, headers, body
+
+
+class IdempotencyMiddleware:
+    """
+    Runs a POST to IDEMPOTENT_PATHS that carries an `Idempotency-Key` header at
+    most once per caller: retries with the same key and body get the stored response
+    (with `Idempotent-Replayed: true`) without the endpoint running, a different body
+    gets 422 and a retry while the first request is still running gets 409.
+    Keys are scoped to the caller (see identify_caller), so another token cannot
+    replay a response. Only successful responses are stored; errors release the key,
+    so a retry after fixing the cause (auth, funds, input) runs again.
+    """
+
+    def __init__(self, app: ASGIApp, *, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        header = Headers(scope=scope).get(HEADER)
+        if not header:
+            await self.app(scope, receive, send)
+            return
+        if len(header) > 255:
+            await self._send(send, *_error(
+                400, "Idempotency-Key must be at most 255 characters.", "IDEMPOTENCY_KEY_INVALID"
+            ))
+            return
+
+        body = await self._read_body(receive)
+        replayed_body = False
+
+        async def receive_body() -> Message:
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        try:
+            parsed = json.loads(body) if body else None
+        except (ValueError, UnicodeDecodeError):
+            parsed = None
+        caller = await identify_caller(Request(scope), parsed)
+        if caller is None:
+            # Unauthenticated: the route rejects it, nothing to make idempotent
+            await self.app(scope, receive_body, send)
+            return
+
+        key = hashlib.sha256(f"{scope['method']} {scope['path']}\n{caller}\n{header}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        outcome, row = await run_in_threadpool(self.store.claim, key, fingerprint)
+        if outcome == "replay":
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in row.headers]
+            headers.append((b"idempotent-replayed", b"true"))
+            await self._send(send, row.status_code, headers, row.body)
+            return
+        if outcome == "mismatch":
+            await self._send(send, *_error(
+                422, "Idempotency-Key was already used with a different request.", "IDEMPOTENCY_KEY_REUSED"
+            ))
+            return
+        if outcome == "in_progress":
+            await self._send(send, *_error(
+                409, "A request with this Idempotency-Key is still being processed.", "IDEMPOTENCY_KEY_IN_USE"
+            ))
+            return
+
+        response: Dict[str, Any] = {"status": None, "headers": [], "body": bytearray(), "complete": False}
+
+        async def send_and_record(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+                response["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_record)
+        except BaseException:
+            await run_in_threadpool(self.store.release, key)
+            raise
+
+        status_code = response["status"]
+        if response["complete"] and status_code is not None and status_code < 400:
+            await run_in_threadpool(
+                self.store.complete,
+                key,
+                status_code=status_code,
+                headers=response["headers"],
+                body=bytes(response["body"]),
+            )
+        else:
+            await run_in_threadpool(self.store.release, key)
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _send(send: Send, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -1,6 +1,14 @@
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.config import settings
+from app.core.idempotency import IdempotencyMiddleware
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
 def setup_middleware(app):
+    # Added before CORS so replayed responses still get CORS headers for the current origin
+    app.add_middleware(IdempotencyMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"], 
@@ -8,3 +16,19 @@ def setup_middleware(app):
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    if settings.DB_REPLICA_HOST:
+        @app.middleware("http")
+        async def mark_recent_write(request: Request, call_next):
+            """
+            After a successful write, route the client's reads to the primary for
+            READ_YOUR_WRITES_SECONDS so it does not read stale replica data.
+            """
+            response = await call_next(request)
+            if request.method in WRITE_METHODS and response.status_code < 400:
+                from app.db.replica import RECENT_WRITE_COOKIE
+
+                response.set_cookie(
+                    RECENT_WRITE_COOKIE, "1", max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True
+                )
+            return response
@@ -0,0 +1,90 @@
+# In app/db/async_session.py
+
+from typing import AsyncIterator, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool
+from app.db.session import SessionLocal, engine_options
+
+T = TypeVar("T")
+
+# Async engine (asyncpg); only created when the async DB layer is enabled
+async_engine = (
+    create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        echo=False,
+        # asyncpg prepares statements per connection; PgBouncer transaction pooling needs this off
+        connect_args=(
+            {} if settings.DB_STATEMENT_CACHE
+            else {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        ),
+        **engine_options(InstrumentedAsyncQueuePool),
+    )
+    if settings.DB_ASYNC_ENABLED
+    else None
+)
+
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=True)
+    if async_engine is not None
+    else None
+)
+
+
+class DbRunner:
+    """
+    Runs session-bound service code for an async endpoint.
+
+    Service functions take a sync `Session` so the same business logic serves both
+    modes. With DB_ASYNC_ENABLED they run through `AsyncSession.run_sync` on an
+    asyncpg connection (no worker thread is held for the round trips); otherwise
+    they run on a regular `SessionLocal` session in the threadpool, and the session
+    is closed in the same worker thread so its pooled connection is not held while
+    the request waits for another thread (under load every thread could otherwise
+    block on the pool while the connections wait for a thread to be closed).
+    Results are returned after the call, so serialize ORM objects inside `fn`.
+    """
+
+    def __init__(self, *, async_session: AsyncSession | None = None, sync_session: Session | None = None):
+        self.async_session = async_session
+        self.sync_session = sync_session
+
+    async def run(self, fn: Callable[[Session], T]) -> T:
+        if self.async_session is not None:
+            return await self.async_session.run_sync(fn)
+        return await run_in_threadpool(self._run_sync, fn)
+
+    def _run_sync(self, fn: Callable[[Session], T]) -> T:
+        try:
+            return fn(self.sync_session)
+        finally:
+            self.sync_session.close()
+
+
+async def get_db_runner() -> AsyncIterator[DbRunner]:
+    """
+    Dependency yielding a DbRunner bound to the configured (async or sync) database layer.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield DbRunner(async_session=session)
+    else:
+        db = SessionLocal()
+        try:
+            yield DbRunner(sync_session=db)
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency to get an AsyncSession (requires DB_ASYNC_ENABLED).
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database layer is disabled; set DB_ASYNC_ENABLED=true.")
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -11,3 +11,9 @@ from app.models.transaction import Transaction  # noqa: F401
 from app.models.inventory import Inventory  # noqa: F401
 from app.models.user import User  # noqa: F401
 from app.models.invitation import Invitation  # noqa: F401
+from app.models.fund import Fund  # noqa: F401
+from app.models.transaction_limit import DailyTransactionCounter, TransactionLimitOverride  # noqa: F401
+from app.models.daily_rollup import DailyRollup  # noqa: F401
+from app.models.parse_cache import CacheEntry  # noqa: F401
+from app.models.balance_snapshot import BalanceOpening, BalanceSnapshot  # noqa: F401
+from app.models.idempotency import IdempotencyKey  # noqa: F401
@@ -0,0 +1,183 @@
+# In app/db/replica.py
+
+import logging
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.async_session import AsyncSessionLocal, DbRunner
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.db.session import SessionLocal, engine_options
+
+logger = logging.getLogger(__name__)
+
+# Clients can force primary reads per request with this header, e.g. right after a write
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# Set by the write middleware; while present, the client's reads go to the primary
+RECENT_WRITE_COOKIE = "recent_write"
+
+replica_engine = (
+    create_engine(settings.REPLICA_DATABASE_URL, echo=False, **engine_options(InstrumentedQueuePool))
+    if settings.DB_REPLICA_HOST
+    else None
+)
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None
+    else None
+)
+
+async_replica_engine = (
+    create_async_engine(
+        settings.ASYNC_REPLICA_DATABASE_URL,
+        echo=False,
+        connect_args=(
+            {} if settings.DB_STATEMENT_CACHE
+            else {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        ),
+        **engine_options(InstrumentedAsyncQueuePool),
+    )
+    if settings.DB_REPLICA_HOST and settings.DB_ASYNC_ENABLED
+    else None
+)
+AsyncReplicaSessionLocal = (
+    async_sessionmaker(async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=True)
+    if async_replica_engine is not None
+    else None
+)
+
+# Replay lag in seconds; 0 when the replica has replayed everything it received
+_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaLagMonitor:
+    """
+    Measures replica replay lag at most once per DB_REPLICA_LAG_CHECK_INTERVAL and
+    reports whether reads may use the replica. An unreachable replica counts as lagging.
+    """
+
+    def __init__(self, *, max_lag: float, interval: float):
+        self.max_lag = max_lag
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._lag: float | None = None
+
+    def cached_healthy(self) -> bool | None:
+        """
+        Last verdict if it is still fresh, else None (call is_healthy() off the event loop).
+        """
+        if time.monotonic() - self._checked_at >= self.interval:
+            return None
+        return self._lag is not None and self._lag <= self.max_lag
+
+    def is_healthy(self) -> bool:
+        cached = self.cached_healthy()
+        if cached is not None:
+            return cached
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.interval:
+                self._lag = self._measure()
+                self._checked_at = time.monotonic()
+            return self._lag is not None and self._lag <= self.max_lag
+
+    def _measure(self) -> float | None:
+        try:
+            with replica_engine.connect() as conn:
+                return float(conn.execute(_LAG_QUERY).scalar() or 0)
+        except Exception:
+            logger.exception("Replica lag check failed; reading from the primary")
+            return None
+
+    def status(self) -> dict:
+        return {
+            "lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag,
+            "healthy": self._lag is not None and self._lag <= self.max_lag,
+        }
+
+
+replica_lag_monitor = ReplicaLagMonitor(
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    interval=settings.DB_REPLICA_LAG_CHECK_INTERVAL,
+)
+
+
+def wants_primary(request: Request) -> bool:
+    """
+    Read-your-writes override: the explicit header or the recent-write cookie.
+    """
+    header = request.headers.get(READ_PRIMARY_HEADER, "")
+    return header.lower() in ("1", "true", "yes") or RECENT_WRITE_COOKIE in request.cookies
+
+
+def read_sessionmaker(request: Request) -> sessionmaker:
+    """
+    Sync session factory for a read-only request: the replica when it is configured,
+    not overridden and within the lag threshold; otherwise the primary.
+    """
+    if ReplicaSessionLocal is None or wants_primary(request):
+        return SessionLocal
+    return ReplicaSessionLocal if replica_lag_monitor.is_healthy() else SessionLocal
+
+
+async def read_sessionmaker_async(request: Request) -> sessionmaker:
+    """
+    read_sessionmaker for async endpoints: a stale lag verdict is re-measured in the
+    threadpool, so the lock and the replica round trip never block the event loop.
+    """
+    if ReplicaSessionLocal is None or wants_primary(request):
+        return SessionLocal
+    healthy = replica_lag_monitor.cached_healthy()
+    if healthy is None:
+        return await run_in_threadpool(read_sessionmaker, request)
+    return ReplicaSessionLocal if healthy else SessionLocal
+
+
+def get_read_db(request: Request) -> Iterator[Session]:
+    """
+    Dependency to get a session for read-only endpoints (replica when usable).
+    """
+    db = read_sessionmaker(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_read_db_runner(request: Request) -> AsyncIterator[DbRunner]:
+    """
+    Async counterpart of get_read_db yielding a DbRunner (see get_db_runner).
+    """
+    use_replica = ReplicaSessionLocal is not None and not wants_primary(request)
+    if use_replica:
+        healthy = replica_lag_monitor.cached_healthy()
+        if healthy is None:
+            healthy = await run_in_threadpool(replica_lag_monitor.is_healthy)
+        use_replica = healthy
+
+    if AsyncSessionLocal is not None:
+        factory = AsyncReplicaSessionLocal if use_replica else AsyncSessionLocal
+        async with factory() as session:
+            yield DbRunner(async_session=session)
+    else:
+        db = (ReplicaSessionLocal if use_replica else SessionLocal)()
+        try:
+            yield DbRunner(sync_session=db)
+        finally:
+            await run_in_threadpool(db.close)
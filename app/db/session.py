@@ -2,14 +2,35 @@
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool
+
+
+def engine_options(queue_pool_class) -> dict:
+    """
+    Pool configuration shared by the sync and async engines (see DB_POOL_* settings).
+    With DB_USE_NULLPOOL every checkout opens a fresh connection, which is what
+    PgBouncer transaction pooling expects.
+    """
+    if settings.DB_USE_NULLPOOL:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": queue_pool_class,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,  # Recycle connections periodically
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # Verify connections before use (one extra round trip)
+        "pool_use_lifo": settings.DB_POOL_USE_LIFO,  # Reuse hot connections; lets idle ones time out
+    }
+
 
 # Create the database engine
 engine = create_engine(
     settings.DATABASE_URL,
     echo=False,  # Set to True for SQL query logging
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=300,  # Recycle connections every 5 minutes
+    **engine_options(InstrumentedQueuePool),
 )
 
 # Create the session factory
@@ -24,4 +45,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
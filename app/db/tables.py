@@ -1,6 +1,8 @@
 # In app/db/init_db.py
 
 import logging
+
+from sqlalchemy import text
 from app.db.base import Base
 from app.db.session import engine
 
@@ -19,4 +21,183 @@ def create_tables():
         logger.info("Database tables created successfully (if they didn't exist).")
     except Exception as e:
         logger.error(f"An error occurred during table creation: {e}")
+    create_missing_indexes()
+    backfill_daily_rollups()
+    seed_daily_counters()
+
+
+LEDGER_NAME_INDEX = "uq_ledgers_client_user_lower_name"
+
+# Ledgers whose names differ only in case, mapped to the one that survives
+# (the one with most transactions): balances, transactions and rollups move to it
+_LEDGER_MERGE_SQL = [
+    """
+    CREATE TEMP TABLE ledger_merge ON COMMIT DROP AS
+    SELECT ranked.id AS duplicate_id, ranked.keeper_id, ranked.client_id, ranked.user_id
+    FROM (
+        SELECT l.id, l.client_id, l.user_id,
+               first_value(l.id) OVER (
+                   PARTITION BY l.client_id, l.user_id, lower(l.name)
+                   ORDER BY (SELECT count(*) FROM transactions t WHERE t.ledger_id = l.id) DESC, l.id
+               ) AS keeper_id
+        FROM ledgers l
+        WHERE (l.client_id, l.user_id, lower(l.name)) IN (
+            SELECT client_id, user_id, lower(name) FROM ledgers
+            GROUP BY client_id, user_id, lower(name) HAVING count(*) > 1
+        )
+    ) ranked
+    WHERE ranked.id <> ranked.keeper_id
+    """,
+    """
+    UPDATE ledgers k SET balance = coalesce(k.balance, 0) + d.total
+    FROM (
+        SELECT m.keeper_id, sum(coalesce(l.balance, 0)) AS total
+        FROM ledger_merge m JOIN ledgers l ON l.id = m.duplicate_id
+        GROUP BY m.keeper_id
+    ) d
+    WHERE k.id = d.keeper_id
+    """,
+    "UPDATE transactions t SET ledger_id = m.keeper_id FROM ledger_merge m WHERE t.ledger_id = m.duplicate_id",
+    """
+    INSERT INTO daily_rollups (client_id, user_id, day, ledger_id, type, tx_count, amount, base_amount, gst_amount)
+    SELECT r.client_id, r.user_id, r.day, m.keeper_id, r.type,
+           sum(r.tx_count), sum(r.amount), sum(r.base_amount), sum(r.gst_amount)
+    FROM daily_rollups r JOIN ledger_merge m ON r.ledger_id = m.duplicate_id
+    GROUP BY r.client_id, r.user_id, r.day, m.keeper_id, r.type
+    ON CONFLICT (client_id, user_id, day, ledger_id, type) DO UPDATE SET
+        tx_count = daily_rollups.tx_count + excluded.tx_count,
+        amount = daily_rollups.amount + excluded.amount,
+        base_amount = daily_rollups.base_amount + excluded.base_amount,
+        gst_amount = daily_rollups.gst_amount + excluded.gst_amount
+    """,
+    # Openings are re-adopted from the merged balance; snapshots are rebuilt on demand
+    """
+    DELETE FROM balance_openings o USING ledger_merge m
+    WHERE o.entity_type = 'ledger' AND o.entity_id IN (m.duplicate_id, m.keeper_id)
+    """,
+    """
+    DELETE FROM balance_snapshots s USING ledger_merge m
+    WHERE s.client_id = m.client_id AND s.user_id = m.user_id
+    """,
+    "DELETE FROM ledgers l USING ledger_merge m WHERE l.id = m.duplicate_id",
+]
+
+
+def merge_case_duplicate_ledgers() -> int:
+    """
+    The unique lower(name) index cannot be built while a tenant has ledgers whose
+    names differ only in case (created before it existed), and every ledger upsert
+    needs it. Such ledgers are merged into one before the index is created; this is
+    an explicit migration step (`python -m app.db.tables merge-ledgers`), never run
+    on startup. The advisory lock and the index re-check under it keep a second run
+    from adding the merged balances again. Ledgers of different types are never
+    merged: they are reported and have to be renamed first.
+    Returns the number of ledgers merged away.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('ledgers:merge_case_duplicates'))"))
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": LEDGER_NAME_INDEX}
+        ).first()
+        if exists:
+            return 0
+        mixed = conn.execute(text(
+            "SELECT client_id, user_id, lower(name) FROM ledgers "
+            "GROUP BY client_id, user_id, lower(name) HAVING count(DISTINCT type) > 1"
+        )).all()
+        if mixed:
+            names = ", ".join(f"{name!r} ({client_id}/{user_id})" for client_id, user_id, name in mixed)
+            raise RuntimeError(f"Ledgers with the same name but different types must be renamed first: {names}")
+        merged = 0
+        for statement in _LEDGER_MERGE_SQL:
+            result = conn.execute(text(statement))
+            if statement is _LEDGER_MERGE_SQL[-1]:
+                merged = result.rowcount
+    if merged:
+        logger.warning(f"Merged {merged} ledgers whose names differed only in case")
+    return merged
+
+
+def create_missing_indexes():
+    """
+    create_all() skips tables that already exist, so indexes added to models later
+    are created here individually (CREATE INDEX only when it is missing).
+    Unique indexes back ON CONFLICT upserts, so failing to build one aborts startup.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                logger.error(f"Could not create index {index.name} on {table.name}: {e}")
+                if index.unique:
+                    hint = (
+                        "; merge case-duplicate ledgers with `python -m app.db.tables merge-ledgers`"
+                        if index.name == LEDGER_NAME_INDEX else ""
+                    )
+                    raise RuntimeError(f"Required unique index {index.name} could not be created{hint}") from e
+
+
+
+def backfill_daily_rollups():
+    """
+    Period summaries read only `daily_rollups`, so transactions recorded before the
+    table existed would be missing from them. When the table is empty but live
+    transactions exist, it is rebuilt from `transactions` once; the advisory lock
+    keeps concurrently starting workers from rebuilding it twice.
+    """
+    from app.db.session import SessionLocal
+    from app.utils.rollup_service import DailyRollupService
+
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext('daily_rollups:backfill'))"))
+        needed = db.execute(text(
+            "SELECT NOT EXISTS (SELECT 1 FROM daily_rollups) "
+            "AND EXISTS (SELECT 1 FROM transactions WHERE is_deleted = false)"
+        )).scalar_one()
+        if not needed:
+            db.commit()
+            return
+        logger.info("daily_rollups is empty; backfilling it from transactions...")
+        tenants = DailyRollupService(db).rebuild()
+        logger.info(f"Backfilled daily rollups for {tenants} tenant(s).")
+
+
+
+def seed_daily_counters():
+    """
+    The daily limit counts from `daily_transaction_counters`, so transactions created
+    today before a tenant had a counter row (e.g. before the table existed) would not
+    count and the user could post up to twice the limit on the day of the deploy.
+    Today's missing rows are filled from live transactions; existing rows are left
+    alone, since they already count every create committed with them.
+    """
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "INSERT INTO daily_transaction_counters (client_id, user_id, day, count) "
+            "SELECT client_id, user_id, current_date, count(*) FROM transactions "
+            "WHERE is_deleted = false AND created_at >= current_date AND created_at < current_date + 1 "
+            "GROUP BY client_id, user_id "
+            "ON CONFLICT (client_id, user_id, day) DO NOTHING"
+        ))
+    if result.rowcount:
+        logger.info(f"Seeded today's transaction counters for {result.rowcount} tenant(s).")
+
+def _main() -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Database migration steps that do not run on startup.")
+    parser.add_argument(
+        "command", choices=["merge-ledgers"],
+        help="merge-ledgers: merge ledgers whose names differ only in case, then build the unique name index",
+    )
+    parser.parse_args()
+
+    merged = merge_case_duplicate_ledgers()
+    create_missing_indexes()
+    print(json.dumps({"merged_ledgers": merged}, indent=2))
+
 
+if __name__ == "__main__":
+    _main()
@@ -1,8 +1,21 @@
+import os
+
 from fastapi import FastAPI
 from app.api.v1.api_router import api_router
+from app.core.auth import auth_status
 from app.core.middleware import setup_middleware
 from app.core.errors import add_exception_handlers
+from app.db.async_session import async_engine
+from app.db.pool import pool_status
+from app.db.replica import async_replica_engine, replica_engine, replica_lag_monitor
+from app.db.session import engine
 from app.db.tables import create_tables
+from app.services.auth_client import rejected_users, remote_user_verifier, verified_users
+from app.services.gemini_services import gemini_client
+from app.services.parse_cache import parse_cache, preview_tokens
+from app.services.prompts import prompt_registry
+from app.utils.financial_settings import active_settings_cache
+from app.utils.statement_jobs import statement_jobs
 
 app = FastAPI(title="AccountBook AI")
 
@@ -13,6 +26,16 @@ add_exception_handlers(app)
 def on_startup():
     create_tables() #
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await gemini_client.aclose()
+    statement_jobs.shutdown()
+    remote_user_verifier.close()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+
 app.include_router(api_router)
 
 
@@ -22,4 +45,49 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/health/db")
+def db_pool_health():
+    pools = {"primary": pool_status(engine.pool)}
+    if async_engine is not None:
+        pools["primary_async"] = pool_status(async_engine.pool)
+    if replica_engine is None:
+        return {"status": "ok", "pid": os.getpid(), "pools": pools}
+
+    pools["replica"] = pool_status(replica_engine.pool)
+    if async_replica_engine is not None:
+        pools["replica_async"] = pool_status(async_replica_engine.pool)
+    replica_lag_monitor.is_healthy()
+    return {"status": "ok", "pid": os.getpid(), "pools": pools, "replica": replica_lag_monitor.status()}
+
+@app.get("/health/cache")
+def cache_stats():
+    return {
+        "financial_settings": active_settings_cache.stats(),
+        "nl_parse": parse_cache.stats(),
+        "nl_preview_tokens": preview_tokens.stats(),
+    }
+
+@app.get("/health/ai")
+def ai_health():
+    breaker = gemini_client.breaker
+    return {
+        "status": "ok",
+        "circuit": breaker.state,
+        "consecutive_failures": breaker.failures,
+        "prompt_version": prompt_registry.active_version,
+        "prompts": prompt_registry.stats.snapshot(),
+    }
+
+@app.get("/health/auth")
+def auth_health():
+    return {
+        "status": "ok",
+        **auth_status(),
+        "upstream": remote_user_verifier.stats.snapshot(),
+        "caches": {
+            "verified": verified_users.stats(),
+            "rejected": rejected_users.stats(),
+        },
+    }
@@ -0,0 +1,45 @@
+# In app/models/balance_snapshot.py
+
+from sqlalchemy import Column, Date, Index, Numeric, String, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class BalanceOpening(Base):
+    """
+    Balance of a bank account or ledger before its first transaction (the initial
+    or opening balance). Entities that predate this table get a row from their
+    first reconciliation: stored balance minus the transaction total ("adopted").
+    """
+    __tablename__ = "balance_openings"
+
+    entity_type = Column(String(20), primary_key=True)  # "bank_account" | "ledger"
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    client_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+
+    opening_balance = Column(Numeric(18, 2), nullable=False, default=0)
+    source = Column(String(20), nullable=False, default="created")  # "created" | "adopted"
+    recorded_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+class BalanceSnapshot(Base):
+    """
+    Closing balance of a bank account or ledger at the end of a local month (tenant
+    timezone): its opening balance plus every live transaction created before the
+    next month began. "Balance as of" reads the latest snapshot plus a short delta.
+    """
+    __tablename__ = "balance_snapshots"
+
+    entity_type = Column(String(20), primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    period_end = Column(Date, primary_key=True)
+    client_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+
+    balance = Column(Numeric(18, 2), nullable=False)
+    computed_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_balance_snapshots_client_user_period", "client_id", "user_id", "period_end"),
+    )
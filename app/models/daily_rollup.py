@@ -0,0 +1,23 @@
+# In app/models/daily_rollup.py
+
+from sqlalchemy import Column, Date, String, Numeric, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+
+class DailyRollup(Base):
+    """
+    Per-day totals of live transactions, keyed by tenant, local day (tenant timezone),
+    ledger and type. Maintained incrementally by the posting paths.
+    """
+    __tablename__ = "daily_rollups"
+
+    client_id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    ledger_id = Column(UUID(as_uuid=True), ForeignKey("ledgers.id", ondelete="CASCADE"), primary_key=True)
+    type = Column(String(30), primary_key=True)
+
+    tx_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(18, 2), nullable=False, default=0)
+    base_amount = Column(Numeric(18, 2), nullable=False, default=0)
+    gst_amount = Column(Numeric(18, 2), nullable=False, default=0)
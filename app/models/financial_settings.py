@@ -1,6 +1,6 @@
 
 import uuid
-from sqlalchemy import Column, Date, String, Boolean, Numeric
+from sqlalchemy import Column, Date, String, Boolean, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.base_class import Base
 
@@ -17,4 +17,9 @@ class FinancialSettings(Base):
     timezone = Column(String(50), default='Asia/Kolkata')
     
     gst_enabled = Column(Boolean, nullable=False, default=False)
-    gst_rate = Column(Numeric(5, 2), nullable=False, default=0.0)  
\ No newline at end of file
+    gst_rate = Column(Numeric(5, 2), nullable=False, default=0.0)
+
+    __table_args__ = (
+        # Serves the "latest settings for tenant" lookup (ORDER BY financial_year_start DESC LIMIT 1)
+        Index("ix_financial_settings_client_user_fy_start", "client_id", "user_id", financial_year_start.desc()),
+    )
\ No newline at end of file
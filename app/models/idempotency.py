@@ -0,0 +1,28 @@
+# In app/models/idempotency.py
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class IdempotencyKey(Base):
+    """
+    A request made with an `Idempotency-Key` header and, once it finished, its
+    response, which is replayed for retries of the same request until `expires_at`.
+    While the first request runs (state "pending") `expires_at` is a short lock
+    timeout, so a request whose worker died can be retried.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of (method, path, header value)
+    key = Column(String(64), primary_key=True)
+    # sha256 of the request body; a retry must send the same body
+    fingerprint = Column(String(64), nullable=False)
+    state = Column(String(20), nullable=False, default="pending")  # "pending" | "complete"
+
+    status_code = Column(Integer, nullable=True)
+    headers = Column(JSONB, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,6 +1,6 @@
 
 import uuid
-from sqlalchemy import Column, String, Numeric
+from sqlalchemy import Column, String, Numeric, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.base_class import Base
@@ -17,4 +17,9 @@ class Ledger(Base):
     balance = Column(Numeric(18, 2), default=0.0)
     
     
-    transactions = relationship("Transaction", back_populates="ledger")
\ No newline at end of file
+    transactions = relationship("Transaction", back_populates="ledger")
+
+    __table_args__ = (
+        # Case-insensitive unique name per tenant; also the ON CONFLICT target for ledger upserts
+        Index("uq_ledgers_client_user_lower_name", "client_id", "user_id", func.lower(name), unique=True),
+    )
\ No newline at end of file
@@ -0,0 +1,16 @@
+# In app/models/parse_cache.py
+
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.base_class import Base
+
+class CacheEntry(Base):
+    """
+    Persistent second level for process-local caches (see DatabaseCacheBackend),
+    e.g. parsed natural-language queries and preview tokens.
+    """
+    __tablename__ = "cache_entries"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(JSONB, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
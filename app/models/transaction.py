@@ -2,7 +2,7 @@
 
 import uuid
 from sqlalchemy import (Column, String, Numeric, Text,
-                        ForeignKey, TIMESTAMP, Boolean)
+                        ForeignKey, TIMESTAMP, Boolean, Index, text)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
@@ -29,4 +29,24 @@ class Transaction(Base):
     deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     ledger = relationship("Ledger", back_populates="transactions")
-    bank_account = relationship("BankAccount", back_populates="transactions")
\ No newline at end of file
+    bank_account = relationship("BankAccount", back_populates="transactions")
+
+    __table_args__ = (
+        # History/summary lookups: tenant + created_at range over live rows only
+        Index(
+            "ix_transactions_client_user_created_live",
+            "client_id", "user_id", "created_at",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        # Per-account / per-ledger balance deltas over a date range (balance snapshots)
+        Index(
+            "ix_transactions_bank_account_created_live",
+            "bank_account_id", "created_at",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_transactions_ledger_created_live",
+            "ledger_id", "created_at",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+    )
\ No newline at end of file
@@ -0,0 +1,35 @@
+# In app/models/transaction_limit.py
+
+import uuid
+from sqlalchemy import Column, Date, Integer, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+
+class DailyTransactionCounter(Base):
+    """
+    Number of live transactions a user created on a given (DB server) day.
+    Incremented in the same DB transaction as the insert, decremented on soft delete.
+    """
+    __tablename__ = "daily_transaction_counters"
+
+    client_id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TransactionLimitOverride(Base):
+    """
+    Per-tenant override of MAX_TRANSACTIONS_PER_DAY.
+    A row with user_id NULL applies to every user of the client.
+    """
+    __tablename__ = "transaction_limit_overrides"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    client_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=True)
+    max_per_day = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('client_id', 'user_id', name='_limit_override_client_user_uc'),
+    )
@@ -0,0 +1,16 @@
+# In app/schemas/balance.py
+
+from datetime import date
+from decimal import Decimal
+from typing import Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+class BalanceAsOfOut(BaseModel):
+    entity_type: Literal["bank_account", "ledger"]
+    entity_id: UUID
+    as_of: date
+    balance: Decimal
+    # Month-end snapshot the balance was computed from (None: from the opening balance)
+    snapshot_date: Optional[date] = None
@@ -0,0 +1,23 @@
+# In app/schemas/statement.py
+
+from datetime import date
+from typing import Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+class StatementJobCreate(BaseModel):
+    client_id: UUID
+    user_id: UUID
+    filter_type: Literal[
+        "today", "yesterday", "this_week", "last_week", "this_month",
+        "this_financial_year", "last_financial_year", "custom",
+    ]
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class StatementJobOut(BaseModel):
+    job_id: str
+    status: Literal["pending", "ready", "failed"]
+    download_url: Optional[str] = None
+    error: Optional[str] = None
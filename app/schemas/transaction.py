@@ -1,7 +1,7 @@
 # In app/schemas/transaction.py
 
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Literal
+from typing import Optional, Literal, List, Any, Dict
 from uuid import UUID
 from decimal import Decimal
 import datetime
@@ -17,6 +17,9 @@ class TransactionAutoCreate(BaseModel):
     description: str
     include_gst: Optional[bool] = False
 
+class TransactionBulkCreate(BaseModel):
+    items: List[TransactionAutoCreate] = Field(..., min_length=1)
+
 class TransactionUpdate(BaseModel):
     bank_account_id: Optional[UUID] = None
     type: Optional[Literal["income", "expense", "loan_payable", "loan_receivable"]] = None
@@ -29,17 +32,34 @@ class TransactionFromQueryCreate(BaseModel):
     user_id: UUID
     query: str = Field(..., min_length=5)
     bank_account_id: Optional[UUID] = None
+    # Returned with the preview; lets the create call skip re-parsing the same query
+    preview_token: Optional[str] = None
+
+class TransactionBatchQueryCreate(BaseModel):
+    client_id: UUID
+    user_id: UUID
+    # Each query may hold several entries ("rent 10000, electricity 1500")
+    queries: List[str] = Field(..., min_length=1)
+    bank_account_id: Optional[UUID] = None
+    preview_token: Optional[str] = None
 
 class TransactionOut(BaseModel):
     id: UUID
     ledger_id: UUID
-    bank_account_id: UUID
+    bank_account_id: Optional[UUID] = None  # SET NULL when the account is removed
     type: str
     amount: Decimal # Total Amount
     base_amount: Optional[Decimal] = None # Amount without GST
     gst_amount: Optional[Decimal] = None # The GST part
-    description: str
+    description: Optional[str] = None
     created_at: datetime.datetime
     
     # Pydantic v2 config for ORM parsing
     model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionBulkRowResult(BaseModel):
+    index: int
+    success: bool
+    data: Optional[TransactionOut] = None
+    error: Optional[Dict[str, Any]] = None
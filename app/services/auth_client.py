@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Tuple
+from uuid import UUID
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Auth-service answers that mean "this user/token is not valid" (cached as such);
+# anything else that is not 200 is treated as an upstream failure
+REJECTED_STATUSES = {400, 401, 403, 404}
+
+
+class UpstreamStats:
+    """
+    Auth-service call counts and latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, latency: float, status: int | None) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            label = str(status) if status is not None else "error"
+            self.statuses[label] = self.statuses.get(label, 0) + 1
+            if status is None or (status != 200 and status not in REJECTED_STATUSES):
+                self.errors += 1
+
+    def record_coalesced(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "coalesced": self.coalesced,
+                "statuses": dict(self.statuses),
+                "avg_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 1),
+            }
+
+
+# (client_id, user_id, token hash) -> True; confirmed and rejected users expire separately
+verified_users = TTLCache(
+    maxsize=settings.AUTH_VERIFY_CACHE_SIZE,
+    ttl=settings.AUTH_VERIFY_CACHE_TTL,
+    namespace="auth_verified",
+)
+rejected_users = TTLCache(
+    maxsize=settings.AUTH_VERIFY_CACHE_SIZE,
+    ttl=settings.AUTH_VERIFY_NEGATIVE_TTL,
+    namespace="auth_rejected",
+)
+
+
+class RemoteUserVerifier:
+    """
+    Checks with the auth service that a user exists, as seen with the caller's token.
+
+    One `requests.Session` (keep-alive, AUTH_POOL_SIZE connections) is shared by the
+    process, results are cached per (client_id, user_id, token hash), and concurrent
+    checks for the same key wait on a single upstream call. Upstream failures
+    (timeouts, 5xx) return False and are not cached.
+    """
+
+    def __init__(self, *, base_url: str = settings.AUTH_API_URL):
+        self.base_url = base_url
+        self.timeout = (settings.AUTH_CONNECT_TIMEOUT, settings.AUTH_TIMEOUT)
+        self.stats = UpstreamStats()
+        self._session: requests.Session | None = None
+        self._session_lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def _http(self) -> requests.Session:
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.AUTH_POOL_SIZE, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def close(self) -> None:
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @staticmethod
+    def cache_key(client_id: UUID, user_id: UUID, token: str) -> Tuple[str, str, str]:
+        return str(client_id), str(user_id), hashlib.sha256(token.encode()).hexdigest()
+
+    def verify(self, client_id: UUID, user_id: UUID, token: str) -> bool:
+        key = self.cache_key(client_id, user_id, token)
+        if verified_users.get(key) is not MISSING:
+            return True
+        if rejected_users.get(key) is not MISSING:
+            return False
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self.stats.record_coalesced()
+            return future.result()
+
+        result = False
+        try:
+            result = self._fetch(client_id, user_id, token, key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_result(result)
+        return result
+
+    def _fetch(self, client_id: UUID, user_id: UUID, token: str, key: Tuple[str, str, str]) -> bool:
+        url = f"{self.base_url}{client_id}/user/{user_id}"
+        headers = {"authorization": f"Bearer {token}"}
+        started = time.perf_counter()
+        try:
+            resp = self._http().get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as exc:
+            self.stats.record(time.perf_counter() - started, None)
+            logger.error("User verify: request failed: %s", exc)
+            return False
+        self.stats.record(time.perf_counter() - started, resp.status_code)
+
+        if resp.status_code == 200:
+            verified_users.set(key, True)
+            return True
+        if resp.status_code in REJECTED_STATUSES:
+            rejected_users.set(key, True)
+        else:
+            logger.warning("User verify: auth service returned %s", resp.status_code)
+        return False
+
+
+remote_user_verifier = RemoteUserVerifier()
@@ -0,0 +1,78 @@
+import asyncio
+import re
+from typing import Any, Dict, List, Tuple
+
+from app.core.cache import MISSING
+from app.core.config import settings
+from app.services.gemini_services import gemini_client
+from app.services.parse_cache import cache_call, parse_cache, parse_cache_key
+from app.services.rule_parser import parse_with_rules
+
+# Entry separators: newlines, semicolons and ", " (a comma inside "42,500" has no space)
+_ENTRY_SEPARATOR = re.compile(r"\s*(?:\n|;|,\s+)\s*")
+
+
+def split_entries(text: str) -> List[str]:
+    """
+    Splits a pasted list ("rent 10000, electricity 1500") into entries. A piece
+    without a number is not an entry on its own and stays with the previous one.
+    """
+    entries: List[str] = []
+    for piece in _ENTRY_SEPARATOR.split(text.strip()):
+        if not piece:
+            continue
+        if entries and not any(ch.isdigit() for ch in piece):
+            entries[-1] = f"{entries[-1]}, {piece}"
+        else:
+            entries.append(piece)
+    return entries or [text.strip()]
+
+
+async def parse_queries_batched(queries: List[str]) -> List[Tuple[int, Dict[str, Any]]] | Dict[str, Any]:
+    """
+    Parses many queries, each possibly holding several entries, into a flat list of
+    (query index, parsed transaction) in input order.
+
+    Entries the rule-based fast path is confident about never reach the LLM; the
+    rest are looked up in the parse cache and the misses are packed
+    NL_BATCH_INPUTS_PER_CALL at a time into Gemini batch requests.
+    Returns an {"error": ...} dict if any LLM call fails, or if an entry yields no
+    transaction (its query indexes are listed under "query_indexes"); empty parses
+    are not cached, so a retry asks the model again.
+    """
+    entries = [(qi, entry) for qi, query in enumerate(queries) for entry in split_entries(query)]
+    results: List[List[Dict[str, Any]] | None] = [None] * len(entries)
+
+    pending: List[int] = []
+    for i, (_, entry) in enumerate(entries):
+        if settings.NL_FAST_PATH_ENABLED:
+            parsed, confidence = parse_with_rules(entry)
+            if parsed is not None and confidence >= settings.NL_FAST_PATH_THRESHOLD:
+                results[i] = [parsed]
+                continue
+        cached = await cache_call(parse_cache.get, parse_cache_key(entry, batch=True))
+        if cached is not MISSING:
+            results[i] = [dict(p) for p in cached]
+        else:
+            pending.append(i)
+
+    size = max(settings.NL_BATCH_INPUTS_PER_CALL, 1)
+    chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+    responses = await asyncio.gather(
+        *(gemini_client.parse_transaction_batch([entries[i][1] for i in chunk]) for chunk in chunks)
+    )
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, dict):
+            return response
+        for i, parsed_list in zip(chunk, response):
+            results[i] = [p for p in parsed_list if isinstance(p, dict)]
+            if results[i]:
+                await cache_call(parse_cache.set, parse_cache_key(entries[i][1], batch=True), results[i])
+
+    empty = sorted({entries[i][0] for i in range(len(entries)) if not results[i]})
+    if empty:
+        numbers = ", ".join(str(qi + 1) for qi in empty)
+        label = "query" if len(empty) == 1 else "queries"
+        return {"error": f"No transaction found in {label} {numbers}.", "query_indexes": empty}
+
+    return [(entries[i][0], parsed) for i in range(len(entries)) for parsed in results[i]]
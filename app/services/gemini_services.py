@@ -1,102 +1,374 @@
-import os
-import requests
+import asyncio
 import json
 import logging
-from dotenv import load_dotenv
- 
-load_dotenv()
- 
-API_KEY = os.getenv("GEMINI_API_KEY")
-API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+import random
+import time
+from typing import Any, List
+
+import httpx
+
+from app.core.config import settings
+from app.services.prompts import prompt_registry
+
+API_KEY = settings.GEMINI_API_KEY
+API_URL = settings.GEMINI_API_URL
  
 if not API_KEY:
     raise RuntimeError("❌ Gemini API key not found in .env file.")
  
 logger = logging.getLogger(__name__)
- 
-def parse_transaction_query(text: str) -> dict:
-    """
-    Analyzes the user's query using Gemini AI to extract transaction details,
-    intelligently inferring GST and identifying inventory and loan types.
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_ai_response(data: dict) -> Any:
     """
-    headers = {"Content-Type": "application/json"}
-    params = {"key": API_KEY}
-   
-    system_prompt = f"""
-    You are an intelligent financial transaction parser for India. Your task is to analyze the user's text and extract details into a structured JSON object.
- 
-    The JSON output MUST contain:
-    - "type": "income", "expense", "loan_payable", or "loan_receivable".
-    - "total_amount": The full numeric value of the transaction.
-    - "description": A clear description of the item or service.
-    - "category": A relevant category (e.g., "Vehicle", "Electronics", "Salary", "Loan").
-    - "inventory" (optional): An object with "item", "quantity", "unit_price", and "total_value" if the query is about purchasing goods.
-    - "gst_details" (optional): An object with "base_amount", "gst_amount", and "gst_percentage".
-    - "gst_assumption_reason" (optional): A brief explanation if you inferred the GST rate.
- 
-    --- LOAN RULES (VERY IMPORTANT) ---
-    1.  **loan_receivable**: If the user says they "lent money", "gave a loan", "dile", or similar phrases to another person/entity, it means money is going OUT. The type MUST be "loan_receivable".
-    2.  **loan_payable**: If the user says they "borrowed money", "took a loan", "ghetle", or received money from any person/entity that is NOT their salary, it means money is coming IN as a liability. The type MUST be "loan_payable".
-    3.  For any loan-related transaction, the category should be "Loan".
- 
-    --- GST RULES (VERY IMPORTANT) ---
-    (He rules jase ahet tase ahet...)
- 
-    --- INVENTORY RULES ---
-    (He rules jase ahet tase ahet...)
- 
-    --- EXAMPLES ---
-    - User Input: "i purchase the swift car 1000000 rupees"
-    - Your Output: {{"type": "expense", "total_amount": 1000000, "description": "Purchase swift car", "category": "Vehicle"}}
- 
-    - User Input: "mi aaj 10 chairs ghetlya tyanchi kimmat 1000 rupaye jhali saglya chair chi"
-    - Your Output: {{"type": "expense", "total_amount": 1000, "description": "Purchase of 10 chairs", "category": "Furniture", "inventory": {{"item": "chair", "quantity": 10, "unit_price": 100, "total_value": 1000}}}}
- 
-    - User Input: "got my 50000 salary"
-    - Your Output: {{"type": "income", "total_amount": 50000, "description": "Salary", "category": "Salary"}}
- 
-    - User Input: "i sold 20 quintal of soyabean at the rate 5000 rupees per quintal"
-    - Your Output: {{"type": "income", "total_amount": 20000, "description": "Sale of 10 quintal wheat", "category": "Sales"}}
- 
-    - User Input: "lent 5000 rs to Rohan"
-    - Your Output: {{"type": "loan_receivable", "total_amount": 5000, "description": "Lent money to Rohan", "category": "Loan"}}
- 
-    - User Input: "mitrani mla 500 dile"
-    - Your Output: {{"type": "loan_payable", "total_amount": 500, "description": "Received money from friend", "category": "Loan"}}
- 
-    - User Input: "took a loan of 20000 from my friend"
-    - Your Output: {{"type": "loan_payable", "total_amount": 20000, "description": "Took a loan from friend", "category": "Loan"}}
- 
-    IMPORTANT: Your response MUST be ONLY the raw, single-line, compact JSON object without any markdown.
- 
-    User Input: "{text}"
+    Extracts the JSON value from a generateContent response, or returns an {"error": ...} dict.
     """
- 
-    payload = {"contents": [{"parts": [{"text": system_prompt}]}]}
     raw_ai_text = ""
     try:
-        resp = requests.post(API_URL, headers=headers, params=params, json=payload, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
- 
         raw_ai_text = data["candidates"][0]["content"]["parts"][0].get("text", "").strip()
         json_str = raw_ai_text.strip().replace('```json', '').replace('```', '')
-       
+
         if not json_str:
             logger.error("Empty response from Gemini AI.")
             return {"error": "AI returned an empty response."}
- 
+
         return json.loads(json_str)
- 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request to Gemini failed: {e}")
-        return {"error": f"API request failed: {str(e)}"}
-    except (KeyError, IndexError, json.JSONDecodeError) as e:
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
         logger.error(f"Failed to parse AI response: {e}. Raw text was: '{raw_ai_text}'")
         return {"error": "Failed to parse AI response"}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred in Gemini service: {e}")
-        return {"error": f"An unexpected error occurred: {str(e)}"}
- 
- 
- 
\ No newline at end of file
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for `cooldown`
+    seconds; then lets a single trial call through (half-open) to decide whether to close.
+    """
+
+    def __init__(self, *, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """
+    Async Gemini client shared by the process.
+
+    One `httpx.AsyncClient` (keep-alive, HTTP/2) is reused for every call, a semaphore
+    caps in-flight calls, 429/5xx and transport errors are retried with jittered
+    exponential backoff, and a circuit breaker fails fast while the API is down.
+    Failures are returned as {"error": ...} dicts; "unavailable": True marks the ones
+    caused by the upstream service rather than the query.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_url: str = API_URL,
+        api_key: str | None = API_KEY,
+        max_concurrency: int = settings.GEMINI_MAX_CONCURRENCY,
+        max_retries: int = settings.GEMINI_MAX_RETRIES,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(
+            threshold=settings.GEMINI_BREAKER_THRESHOLD,
+            cooldown=settings.GEMINI_BREAKER_COOLDOWN,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: httpx.AsyncClient | None = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(settings.GEMINI_TIMEOUT, connect=settings.GEMINI_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.GEMINI_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.GEMINI_MAX_CONCURRENCY,
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _backoff(attempt: int, response: httpx.Response | None = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.GEMINI_BACKOFF_MAX)
+        # Full jitter: spreads retries of concurrent callers apart
+        return random.uniform(0, min(settings.GEMINI_BACKOFF_MAX, settings.GEMINI_BACKOFF_BASE * 2 ** attempt))
+
+    async def generate(self, payload: dict) -> dict:
+        """
+        POSTs a generateContent payload and returns the decoded response body.
+        Raises httpx.HTTPError once retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self._http().post(self.api_url, params={"key": self.api_key}, json=payload)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            delay = self._backoff(attempt, response)
+            attempt += 1
+            logger.warning(f"Gemini call failed (attempt {attempt}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _call(self, payload: dict, prompt_version: str) -> dict:
+        """
+        generate() behind the circuit breaker. Returns the response body, or an
+        {"error": ...} dict (with "unavailable": True for upstream failures).
+        Token usage and latency are recorded against the prompt version.
+        """
+        if not self.breaker.allow():
+            return {"error": "AI service is temporarily unavailable. Please try again shortly.", "unavailable": True}
+
+        started = time.perf_counter()
+        try:
+            data = await self.generate(payload)
+            prompt_registry.stats.record(
+                prompt_version, latency=time.perf_counter() - started, usage=data.get("usageMetadata")
+            )
+        except httpx.HTTPStatusError as e:
+            prompt_registry.stats.record(prompt_version, latency=time.perf_counter() - started, ok=False)
+            logger.error(f"API request to Gemini failed: {e}")
+            if e.response.status_code in RETRYABLE_STATUSES:
+                self.breaker.record_failure()
+                return {"error": f"API request failed: {str(e)}", "unavailable": True}
+            self.breaker.record_success()
+            return {"error": f"API request failed: {str(e)}"}
+        except httpx.HTTPError as e:
+            prompt_registry.stats.record(prompt_version, latency=time.perf_counter() - started, ok=False)
+            self.breaker.record_failure()
+            logger.error(f"API request to Gemini failed: {e}")
+            return {"error": f"API request failed: {str(e)}", "unavailable": True}
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"An unexpected error occurred in Gemini service: {e}")
+            return {"error": f"An unexpected error occurred: {str(e)}"}
+
+        self.breaker.record_success()
+        return {"data": data}
+
+    async def parse_transaction_query(self, text: str) -> dict:
+        """
+        Analyzes the user's query using Gemini AI to extract transaction details,
+        intelligently inferring GST and identifying inventory and loan types.
+        """
+        template = prompt_registry.active
+        result = await self._call(template.single_payload(text), template.version)
+        if "error" in result:
+            return result
+        return parse_ai_response(result["data"])
+
+    async def parse_transaction_batch(self, texts: List[str]) -> List[List[dict]] | dict:
+        """
+        Parses several independent inputs with one request. Returns one list of
+        transaction objects per input, in order, or an {"error": ...} dict.
+        """
+        template = prompt_registry.active
+        result = await self._call(template.batch_payload(texts), template.version)
+        if "error" in result:
+            return result
+
+        parsed = parse_ai_response(result["data"])
+        if isinstance(parsed, dict) and "error" in parsed:
+            return parsed
+        if not isinstance(parsed, list) or len(parsed) != len(texts):
+            logger.error(f"Batch response has the wrong shape for {len(texts)} inputs: {parsed!r}")
+            return {"error": "Failed to parse AI response"}
+        # Tolerate a bare object where a one-element array was expected
+        return [entry if isinstance(entry, list) else [entry] for entry in parsed]
+
+
+gemini_client = GeminiClient()
+
+
+async def parse_transaction_query(text: str) -> dict:
+    return await gemini_client.parse_transaction_query(text)
+
+
+class _FakeGemini:
+    """
+    Local stand-in for the generateContent endpoint used by the self-test. Each
+    request pops the next (status, delay) from `script` (the last entry repeats)
+    and records how many requests were in flight at once.
+    """
+
+    def __init__(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.script: List[tuple] = [(200, 0.0)]
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    status, delay = fake.script.pop(0) if len(fake.script) > 1 else fake.script[0]
+                time.sleep(delay)
+                text = json.dumps({"type": "expense", "amount": 500})
+                body = json.dumps(
+                    {"candidates": [{"content": {"parts": [{"text": text}]}}]} if status == 200
+                    else {"error": {"code": status}}
+                ).encode()
+                with fake._lock:
+                    fake.in_flight -= 1
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status in RETRYABLE_STATUSES:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/generate"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self, *script: tuple) -> None:
+        with self._lock:
+            self.script = list(script)
+            self.requests = self.in_flight = self.max_in_flight = 0
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+async def _selftest() -> dict:
+    """
+    Runs GeminiClient against _FakeGemini: a plain success, a 429 retried into a
+    success, a 400 that is neither retried nor counted by the breaker, repeated 503s
+    opening the circuit breaker, and the concurrency cap under parallel calls.
+    """
+    fake = _FakeGemini()
+    checks = {}
+
+    def client(**kwargs) -> GeminiClient:
+        c = GeminiClient(api_url=fake.url, api_key="test", **kwargs)
+        c.breaker = CircuitBreaker(threshold=2, cooldown=60)
+        return c
+
+    try:
+        c = client(max_retries=2)
+        fake.reset((200, 0.0))
+        result = await c.parse_transaction_query("spent 500")
+        checks["success"] = result == {"type": "expense", "amount": 500} and fake.requests == 1
+
+        fake.reset((429, 0.0), (200, 0.0))
+        result = await c.parse_transaction_query("spent 500")
+        checks["retry_after_429"] = "error" not in result and fake.requests == 2
+
+        fake.reset((400, 0.0))
+        result = await c.parse_transaction_query("spent 500")
+        checks["no_retry_on_400"] = (
+            "error" in result and not result.get("unavailable") and fake.requests == 1
+            and c.breaker.state == "closed"
+        )
+        await c.aclose()
+
+        c = client(max_retries=1)
+        fake.reset((503, 0.0))
+        first = await c.parse_transaction_query("spent 500")
+        second = await c.parse_transaction_query("spent 500")
+        requests_before_open = fake.requests
+        third = await c.parse_transaction_query("spent 500")
+        checks["breaker_opens_on_5xx"] = (
+            all(r.get("unavailable") for r in (first, second, third))
+            and requests_before_open == 4
+            and fake.requests == requests_before_open
+            and c.breaker.state == "open"
+        )
+        await c.aclose()
+
+        c = client(max_concurrency=3)
+        fake.reset((200, 0.2))
+        results = await asyncio.gather(*(c.parse_transaction_query("spent 500") for _ in range(12)))
+        checks["concurrency_cap"] = (
+            all("error" not in r for r in results) and fake.requests == 12 and fake.max_in_flight == 3
+        )
+        await c.aclose()
+    finally:
+        fake.close()
+
+    return {"checks": checks, "ok": all(checks.values())}
+
+
+def _main() -> None:
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Gemini client checks against a local fake server.")
+    parser.add_argument("command", choices=["selftest"])
+    parser.parse_args()
+
+    result = asyncio.run(_selftest())
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    _main()
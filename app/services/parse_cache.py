@@ -0,0 +1,192 @@
+import copy
+import hashlib
+import logging
+import re
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.parse_cache import CacheEntry
+from app.services.gemini_services import parse_transaction_query
+from app.services.prompts import prompt_registry
+from app.services.rule_parser import parse_with_rules
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class DatabaseCacheBackend:
+    """
+    CacheBackend storing JSON values in the `cache_entries` table.
+    Expired rows are ignored on read and purged every `purge_every` writes.
+    """
+
+    def __init__(self, session_factory=SessionLocal, *, purge_every: int = 1000):
+        self.session_factory = session_factory
+        self.purge_every = purge_every
+        self._writes = 0
+
+    def get(self, key: str) -> Any:
+        with self.session_factory() as db:
+            value = db.execute(
+                select(CacheEntry.value).where(
+                    CacheEntry.key == key,
+                    CacheEntry.expires_at > datetime.now(timezone.utc),
+                )
+            ).scalar_one_or_none()
+        return MISSING if value is None else value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        stmt = insert(CacheEntry).values(key=key, value=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheEntry.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at},
+        )
+        with self.session_factory() as db:
+            db.execute(stmt)
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                db.execute(delete(CacheEntry).where(CacheEntry.expires_at <= datetime.now(timezone.utc)))
+            db.commit()
+
+    def delete(self, key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(CacheEntry).where(CacheEntry.key == key))
+            db.commit()
+
+    def pop(self, key: str) -> Any:
+        # DELETE ... RETURNING: concurrent pops of one key cannot both see the row
+        with self.session_factory() as db:
+            row = db.execute(
+                delete(CacheEntry).where(CacheEntry.key == key).returning(CacheEntry.value, CacheEntry.expires_at)
+            ).first()
+            db.commit()
+        if row is None or row.expires_at <= datetime.now(timezone.utc):
+            return MISSING
+        return row.value
+
+
+_backend = DatabaseCacheBackend() if settings.NL_PARSE_CACHE_PERSISTENT else None
+
+# Successful parses keyed by hash(prompt version, normalized query text)
+parse_cache = TTLCache(
+    maxsize=settings.NL_PARSE_CACHE_SIZE,
+    ttl=settings.NL_PARSE_CACHE_TTL,
+    namespace="nl_parse",
+    backend=_backend,
+)
+
+# Preview token -> {"client_id", "user_id", "kind", "query", "parsed"}; single use
+preview_tokens = TTLCache(
+    maxsize=settings.NL_PARSE_CACHE_SIZE,
+    ttl=settings.NL_PREVIEW_TOKEN_TTL,
+    namespace="nl_preview",
+    backend=_backend,
+)
+
+
+def normalize_query(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def parse_cache_key(text: str, *, batch: bool = False) -> str:
+    # Batch entries hold a list of transactions, so they live under their own keys
+    mode = "batch" if batch else "single"
+    version = prompt_registry.active_version
+    return hashlib.sha256(f"{version}\n{mode}\n{normalize_query(text)}".encode()).hexdigest()
+
+
+async def cache_call(fn, *args):
+    # A persistent backend does blocking DB I/O; keep it off the event loop
+    if _backend is not None:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def parse_query_cached(text: str) -> Dict[str, Any]:
+    """
+    Parses `text` with the rule-based fast path when it is confident enough, else
+    parse_transaction_query() behind the parse cache. Errors are not cached.
+    Returns a copy, so callers may modify the result.
+    """
+    if settings.NL_FAST_PATH_ENABLED:
+        parsed, confidence = parse_with_rules(text)
+        if parsed is not None and confidence >= settings.NL_FAST_PATH_THRESHOLD:
+            return parsed
+
+    key = parse_cache_key(text)
+    cached = await cache_call(parse_cache.get, key)
+    if cached is not MISSING:
+        return dict(cached)
+
+    parsed = await parse_transaction_query(text)
+    if "error" not in parsed:
+        await cache_call(parse_cache.set, key, parsed)
+    return dict(parsed)
+
+
+def _query_fingerprint(query: str | List[str]) -> str | List[str]:
+    if isinstance(query, str):
+        return normalize_query(query)
+    return [normalize_query(text) for text in query]
+
+
+async def issue_preview_token(
+    client_id: UUID, user_id: UUID, query: str | List[str], parsed: Any, *, kind: str = "single"
+) -> str:
+    """
+    Stores a successful parse of `query` (a dict, or a list for kind="batch" parsed
+    from a list of queries) for the create call to redeem without re-parsing.
+    """
+    token = secrets.token_urlsafe(24)
+    await cache_call(
+        preview_tokens.set,
+        token,
+        {
+            "client_id": str(client_id),
+            "user_id": str(user_id),
+            "kind": kind,
+            "query": _query_fingerprint(query),
+            "parsed": parsed,
+        },
+    )
+    return token
+
+
+async def redeem_preview_token(
+    token: str, client_id: UUID, user_id: UUID, query: str | List[str], *, kind: str = "single"
+) -> Any:
+    """
+    Returns (a copy of) the parse stored under `token` and consumes it, or None if it
+    expired, was already redeemed or was issued for different query text (the caller
+    then parses `query` itself). The token only saves the AI call; duplicate creates
+    are prevented by the Idempotency-Key header, not by the token.
+    Raises HTTPException 400 if the token belongs to another user or the other
+    endpoint (the token is consumed all the same).
+    """
+    entry = await cache_call(preview_tokens.pop, token)
+    if entry is MISSING:
+        return None
+    if (
+        entry["client_id"] != str(client_id)
+        or entry["user_id"] != str(user_id)
+        or entry.get("kind", "single") != kind
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Preview token is not valid for this request.", "code": "INVALID_PREVIEW_TOKEN"},
+        )
+    if entry.get("query") != _query_fingerprint(query):
+        return None
+    return copy.deepcopy(entry["parsed"])
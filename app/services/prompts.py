@@ -0,0 +1,277 @@
+"""
+Versioned prompt templates for Gemini transaction parsing.
+
+Each template is compiled once at import: its system instruction, generation config
+and response schema are prebuilt request fragments, so a call only formats the
+user's text. Cached parses are keyed by the template version (see parse_cache),
+so register a new version instead of editing an existing one.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List
+
+from app.core.config import settings
+
+# Gemini responseSchema (OpenAPI subset) for one parsed transaction
+TRANSACTION_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "type": {"type": "STRING", "enum": ["income", "expense", "loan_payable", "loan_receivable"]},
+        "total_amount": {"type": "NUMBER"},
+        "description": {"type": "STRING"},
+        "category": {"type": "STRING"},
+        "inventory": {
+            "type": "OBJECT",
+            "properties": {
+                "item": {"type": "STRING"},
+                "quantity": {"type": "NUMBER"},
+                "unit_price": {"type": "NUMBER"},
+                "total_value": {"type": "NUMBER"},
+            },
+            "required": ["item", "quantity", "unit_price", "total_value"],
+        },
+        "gst_details": {
+            "type": "OBJECT",
+            "properties": {
+                "base_amount": {"type": "NUMBER"},
+                "gst_amount": {"type": "NUMBER"},
+                "gst_percentage": {"type": "NUMBER"},
+            },
+            "required": ["base_amount", "gst_amount", "gst_percentage"],
+        },
+        "gst_assumption_reason": {"type": "STRING"},
+    },
+    "required": ["type", "total_amount", "description", "category"],
+}
+
+# One array of transactions per numbered input
+BATCH_SCHEMA: Dict[str, Any] = {"type": "ARRAY", "items": {"type": "ARRAY", "items": TRANSACTION_SCHEMA}}
+
+
+# v1: the original single-message prompt (rules and examples resent with every call)
+_V1_INSTRUCTIONS = """
+    You are an intelligent financial transaction parser for India. Your task is to analyze the user's text and extract details into a structured JSON object.
+ 
+    The JSON output MUST contain:
+    - "type": "income", "expense", "loan_payable", or "loan_receivable".
+    - "total_amount": The full numeric value of the transaction.
+    - "description": A clear description of the item or service.
+    - "category": A relevant category (e.g., "Vehicle", "Electronics", "Salary", "Loan").
+    - "inventory" (optional): An object with "item", "quantity", "unit_price", and "total_value" if the query is about purchasing goods.
+    - "gst_details" (optional): An object with "base_amount", "gst_amount", and "gst_percentage".
+    - "gst_assumption_reason" (optional): A brief explanation if you inferred the GST rate.
+ 
+    --- LOAN RULES (VERY IMPORTANT) ---
+    1.  **loan_receivable**: If the user says they "lent money", "gave a loan", "dile", or similar phrases to another person/entity, it means money is going OUT. The type MUST be "loan_receivable".
+    2.  **loan_payable**: If the user says they "borrowed money", "took a loan", "ghetle", or received money from any person/entity that is NOT their salary, it means money is coming IN as a liability. The type MUST be "loan_payable".
+    3.  For any loan-related transaction, the category should be "Loan".
+ 
+    --- GST RULES (VERY IMPORTANT) ---
+    (He rules jase ahet tase ahet...)
+ 
+    --- INVENTORY RULES ---
+    (He rules jase ahet tase ahet...)
+ 
+    --- EXAMPLES ---
+    - User Input: "i purchase the swift car 1000000 rupees"
+    - Your Output: {"type": "expense", "total_amount": 1000000, "description": "Purchase swift car", "category": "Vehicle"}
+ 
+    - User Input: "mi aaj 10 chairs ghetlya tyanchi kimmat 1000 rupaye jhali saglya chair chi"
+    - Your Output: {"type": "expense", "total_amount": 1000, "description": "Purchase of 10 chairs", "category": "Furniture", "inventory": {"item": "chair", "quantity": 10, "unit_price": 100, "total_value": 1000}}
+ 
+    - User Input: "got my 50000 salary"
+    - Your Output: {"type": "income", "total_amount": 50000, "description": "Salary", "category": "Salary"}
+ 
+    - User Input: "i sold 20 quintal of soyabean at the rate 5000 rupees per quintal"
+    - Your Output: {"type": "income", "total_amount": 20000, "description": "Sale of 10 quintal wheat", "category": "Sales"}
+ 
+    - User Input: "lent 5000 rs to Rohan"
+    - Your Output: {"type": "loan_receivable", "total_amount": 5000, "description": "Lent money to Rohan", "category": "Loan"}
+ 
+    - User Input: "mitrani mla 500 dile"
+    - Your Output: {"type": "loan_payable", "total_amount": 500, "description": "Received money from friend", "category": "Loan"}
+ 
+    - User Input: "took a loan of 20000 from my friend"
+    - Your Output: {"type": "loan_payable", "total_amount": 20000, "description": "Took a loan from friend", "category": "Loan"}
+ 
+"""
+
+
+def _v1_prompt(text: str) -> str:
+    """
+    Prompt for extracting transaction details (GST, inventory and loan types) from the user's text.
+    """
+    return _V1_INSTRUCTIONS + f"""    IMPORTANT: Your response MUST be ONLY the raw, single-line, compact JSON object without any markdown.
+ 
+    User Input: "{text}"
+    """
+
+
+def _v1_batch_prompt(texts: List[str]) -> str:
+    """
+    Prompt for several independent user inputs, each of which may describe more than one transaction.
+    """
+    numbered = "\n".join(f'    {i}. "{text}"' for i, text in enumerate(texts))
+    return _V1_INSTRUCTIONS + f"""    --- BATCH MODE ---
+    You will receive {len(texts)} numbered, independent user inputs. An input may describe several
+    transactions (e.g. "rent 10000, electricity 1500"); return one object per transaction.
+
+    IMPORTANT: Your response MUST be ONLY a JSON array with exactly {len(texts)} elements, in input order.
+    Element i is an array of the transaction objects parsed from input i (an empty array if none).
+
+    User Inputs:
+{numbered}
+    """
+
+
+
+
+# v2: compact system instruction sent as `systemInstruction`, structured JSON output
+_V2_SYSTEM_INSTRUCTION = """You convert Indian finance messages (English, Marathi or Hindi, often romanized) into transactions.
+Fields: type (income | expense | loan_payable | loan_receivable); total_amount (full amount incl. GST; k=1000, lakh=100000, crore=10000000); description (short); category (e.g. Salary, Rent, Vehicle, Electronics, Sales, Loan).
+Loans use category "Loan". Money lent or given to someone ("lent", "gave a loan", "X la dile") is loan_receivable. Money borrowed or received that is not earnings ("borrowed", "took a loan", "udhar ghetle", "mla dile") is loan_payable.
+Add inventory {item, quantity, unit_price, total_value} only for purchases of countable goods.
+Add gst_details {base_amount, gst_amount, gst_percentage} when GST is stated, or infer the standard Indian rate for taxable business goods/services and explain it in gst_assumption_reason. Never add GST to salary, loans or personal transfers.
+Examples:
+"got my 50000 salary" -> {"type":"income","total_amount":50000,"description":"Salary","category":"Salary"}
+"mi aaj 10 chairs ghetlya tyanchi kimmat 1000 rupaye jhali saglya chair chi" -> {"type":"expense","total_amount":1000,"description":"Purchase of 10 chairs","category":"Furniture","inventory":{"item":"chair","quantity":10,"unit_price":100,"total_value":1000}}
+"lent 5000 rs to Rohan" -> {"type":"loan_receivable","total_amount":5000,"description":"Lent money to Rohan","category":"Loan"}
+"mitrani mla 500 dile" -> {"type":"loan_payable","total_amount":500,"description":"Received money from friend","category":"Loan"}"""
+
+_V2_BATCH_RULES = """
+Batch mode: the message lists numbered, independent inputs; an input may describe several transactions ("rent 10000, electricity 1500").
+Return a JSON array with one element per input, in order; each element is the array of transactions parsed from that input (empty if none)."""
+
+
+def _v2_batch_input(texts: List[str]) -> str:
+    return "\n".join(f'{i}. "{text}"' for i, text in enumerate(texts))
+
+
+class PromptTemplate:
+    """
+    A compiled prompt version. `single_payload` / `batch_payload` return complete
+    generateContent request bodies.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        *,
+        render: Callable[[str], str],
+        render_batch: Callable[[List[str]], str],
+        system_instruction: str | None = None,
+        batch_system_instruction: str | None = None,
+        json_output: bool = False,
+    ):
+        self.version = version
+        self._render = render
+        self._render_batch = render_batch
+        self._system = {"parts": [{"text": system_instruction}]} if system_instruction else None
+        self._batch_system = {"parts": [{"text": batch_system_instruction}]} if batch_system_instruction else None
+        self._config = (
+            {"responseMimeType": "application/json", "responseSchema": TRANSACTION_SCHEMA, "temperature": 0}
+            if json_output
+            else None
+        )
+        # Batch output is always a JSON array
+        self._batch_config = (
+            {"responseMimeType": "application/json", "responseSchema": BATCH_SCHEMA, "temperature": 0}
+            if json_output
+            else {"responseMimeType": "application/json"}
+        )
+
+    def single_payload(self, text: str) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": self._render(text)}]}]}
+        if self._system:
+            payload["systemInstruction"] = self._system
+        if self._config:
+            payload["generationConfig"] = self._config
+        return payload
+
+    def batch_payload(self, texts: List[str]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "contents": [{"role": "user", "parts": [{"text": self._render_batch(texts)}]}],
+            "generationConfig": self._batch_config,
+        }
+        if self._batch_system:
+            payload["systemInstruction"] = self._batch_system
+        return payload
+
+
+class PromptStats:
+    """
+    Per-version call counts, Gemini token usage (usageMetadata) and latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Dict[str, float]] = {}
+
+    def record(self, version: str, *, latency: float, usage: Dict[str, Any] | None = None, ok: bool = True) -> None:
+        usage = usage or {}
+        with self._lock:
+            row = self._versions.setdefault(
+                version,
+                {"calls": 0, "failures": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+                 "latency_total": 0.0, "latency_max": 0.0},
+            )
+            row["calls"] += 1
+            row["failures"] += 0 if ok else 1
+            row["prompt_tokens"] += usage.get("promptTokenCount", 0)
+            row["output_tokens"] += usage.get("candidatesTokenCount", 0)
+            row["total_tokens"] += usage.get("totalTokenCount", 0)
+            row["latency_total"] += latency
+            row["latency_max"] = max(row["latency_max"], latency)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report = {}
+            for version, row in self._versions.items():
+                calls = row["calls"] or 1
+                report[version] = {
+                    "calls": row["calls"],
+                    "failures": row["failures"],
+                    "prompt_tokens": row["prompt_tokens"],
+                    "output_tokens": row["output_tokens"],
+                    "avg_prompt_tokens": round(row["prompt_tokens"] / calls, 1),
+                    "avg_total_tokens": round(row["total_tokens"] / calls, 1),
+                    "avg_latency_ms": round(row["latency_total"] / calls * 1000, 1),
+                    "max_latency_ms": round(row["latency_max"] * 1000, 1),
+                }
+            return report
+
+
+class PromptRegistry:
+    def __init__(self, active_version: str):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self.active_version = active_version
+        self.stats = PromptStats()
+
+    def register(self, template: PromptTemplate) -> None:
+        self._templates[template.version] = template
+
+    def get(self, version: str) -> PromptTemplate:
+        try:
+            return self._templates[version]
+        except KeyError:
+            raise ValueError(f"Unknown Gemini prompt version {version!r}; known: {sorted(self._templates)}")
+
+    @property
+    def active(self) -> PromptTemplate:
+        return self.get(self.active_version)
+
+
+prompt_registry = PromptRegistry(settings.GEMINI_PROMPT_VERSION)
+prompt_registry.register(PromptTemplate("v1", render=_v1_prompt, render_batch=_v1_batch_prompt))
+prompt_registry.register(
+    PromptTemplate(
+        "v2",
+        render=lambda text: text,
+        render_batch=_v2_batch_input,
+        system_instruction=_V2_SYSTEM_INSTRUCTION,
+        batch_system_instruction=_V2_SYSTEM_INSTRUCTION + _V2_BATCH_RULES,
+        json_output=True,
+    )
+)
+# Fail at startup rather than on the first parse
+prompt_registry.active
@@ -0,0 +1,385 @@
+"""
+Deterministic parser for simple natural-language transactions.
+
+Handles the common shapes ("got 50000 salary", "paid 1200 rent", "lent 5000 to Rohan",
+"mitrani mla 500 dile", "sold 20 quintal soyabean at 5000 per quintal") in English,
+Marathi and Hindi (romanized) and returns the same JSON shape as the Gemini parser,
+plus a confidence score. Anything it is not sure about is left to the LLM.
+
+Benchmark against the labeled corpus:
+    python -m app.services.rule_parser benchmark [--llm]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+CORPUS_PATH = Path(__file__).parent / "data" / "nl_parse_corpus.jsonl"
+
+_MULTIPLIERS = {
+    "k": 1000, "thousand": 1000, "hazar": 1000, "hajar": 1000, "hajaar": 1000,
+    "lakh": 100000, "lakhs": 100000, "lac": 100000, "lakh.": 100000,
+    "cr": 10000000, "crore": 10000000,
+}
+_CURRENCY_WORDS = {"rs", "rs.", "inr", "rupee", "rupees", "rupaye", "rupay", "rupye", "rupya", "₹", "/-"}
+_TOKEN = re.compile(r"₹|/-|@|\d[\d,]*(?:\.\d+)?|[a-z]+\.?")
+
+# Words that are never the unit/item following a quantity
+_NON_ITEM_WORDS = _CURRENCY_WORDS | set(_MULTIPLIERS) | {
+    "to", "from", "for", "at", "on", "in", "of", "and", "the", "a", "as", "la", "ko", "ne",
+    "each", "per", "only", "total", "rate", "salary", "rent", "me", "my", "mla", "mala",
+}
+
+_LOAN_OUT = {"lent", "lend", "lending", "udhar_dile", "udhar_diye", "karj_dile", "loan_dila", "loan_dile", "loan_diya"}
+_LOAN_IN = {
+    "borrowed", "borrow", "udhar_ghetle", "udhar_ghetla", "karj_ghetle", "karj_ghetla",
+    "udhar_liye", "udhar_liya", "loan_liya", "loan_ghetla", "loan_ghetle", "took_loan", "taken_loan", "got_loan",
+}
+# "gave"/"dile"/"diye" whose direction comes from the recipient marker
+_GAVE = {"dile", "dila", "dili", "diye", "diya", "di", "gave", "given"}
+_TO_ME = {"mla", "mala", "mujhe", "mujhko", "me"}
+# "Rohan se" / "mitra kadun" / "from Rohan": money that came from someone
+_SOURCE_MARKERS = {"se", "kadun", "kadon", "kadoon"}
+
+_INCOME = {
+    "got", "received", "receive", "recieved", "earned", "credited", "income",
+    "milale", "milala", "milali", "mila", "mile", "mili", "aale", "aala", "aaya",
+    "sold", "sell", "vikle", "vikla", "vikli", "becha", "bechi", "beche",
+}
+_EXPENSE = {
+    "paid", "pay", "spent", "spend", "bought", "buy", "purchased", "purchase",
+    "kharch", "kharcha", "bharle", "bharla", "bhara", "bhari", "kharidi", "kharida", "kharidle",
+    "ghetle", "ghetla", "ghetli", "ghetlya", "liya", "liye", "debited",
+}
+_SALE = {"sold", "sell", "vikle", "vikla", "vikli", "becha", "bechi", "beche", "sale"}
+
+# keyword -> (category, implied type or None)
+_CATEGORIES = {
+    "salary": ("Salary", "income"), "pagar": ("Salary", "income"), "tankhwah": ("Salary", "income"),
+    "rent": ("Rent", None), "bhade": ("Rent", None), "bhada": ("Rent", None), "kiraya": ("Rent", None),
+    "electricity": ("Utilities", "expense"), "bijli": ("Utilities", "expense"), "light": ("Utilities", "expense"),
+    "recharge": ("Utilities", "expense"), "wifi": ("Utilities", "expense"), "internet": ("Utilities", "expense"),
+    "petrol": ("Fuel", "expense"), "diesel": ("Fuel", "expense"), "fuel": ("Fuel", "expense"),
+    "grocery": ("Groceries", "expense"), "groceries": ("Groceries", "expense"), "kirana": ("Groceries", "expense"),
+    "vegetables": ("Groceries", "expense"), "bhaji": ("Groceries", "expense"), "sabzi": ("Groceries", "expense"),
+    "food": ("Food", "expense"), "lunch": ("Food", "expense"), "dinner": ("Food", "expense"),
+    "breakfast": ("Food", "expense"), "jevan": ("Food", "expense"), "khana": ("Food", "expense"),
+    "fees": ("Education", "expense"), "fee": ("Education", "expense"), "tuition": ("Education", "expense"),
+    "medicine": ("Medical", "expense"), "medicines": ("Medical", "expense"), "doctor": ("Medical", "expense"),
+    "hospital": ("Medical", "expense"), "dawai": ("Medical", "expense"), "aushadh": ("Medical", "expense"),
+    "interest": ("Interest", None), "vyaj": ("Interest", None), "byaj": ("Interest", None),
+}
+
+_NON_ITEM_WORDS |= set(_CATEGORIES) | _INCOME | _EXPENSE | _GAVE
+
+_TOTAL_MARKERS = {"total", "saglya", "sagle", "saglyanchi", "kul", "in_total"}
+_RATE_MARKERS = {"each", "per", "prati", "@", "rate", "ek", "har"}
+
+
+@dataclass
+class _Number:
+    index: int
+    value: Decimal
+    is_money: bool
+    unit: Optional[str]
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = _TOKEN.findall(text.lower())
+    # Join two-word phrases ("udhar dile" -> "udhar_dile") so they are matched as one signal
+    joined: List[str] = []
+    for token in tokens:
+        if joined and f"{joined[-1]}_{token}" in _LOAN_OUT | _LOAN_IN | _TOTAL_MARKERS:
+            joined[-1] = f"{joined[-1]}_{token}"
+        elif joined and joined[-1] in {"took", "taken", "got"} and token == "a":
+            continue
+        elif joined and joined[-1] in {"took", "taken", "got"} and token == "loan":
+            joined[-1] = f"{joined[-1]}_loan"
+        else:
+            joined.append(token)
+    return joined
+
+
+def _numbers(tokens: List[str]) -> List[_Number]:
+    numbers: List[_Number] = []
+    for i, token in enumerate(tokens):
+        if not token[0].isdigit():
+            continue
+        value = Decimal(token.replace(",", ""))
+        following = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if following in _MULTIPLIERS:
+            value *= _MULTIPLIERS[following]
+            following = tokens[i + 2] if i + 2 < len(tokens) else ""
+        preceding = tokens[i - 1] if i > 0 else ""
+        is_money = preceding in _CURRENCY_WORDS or following in _CURRENCY_WORDS
+        unit = following if following.isalpha() and following not in _NON_ITEM_WORDS and not is_money else None
+        numbers.append(_Number(i, value, is_money, unit))
+    return numbers
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _item(tokens: List[str], quantity: _Number) -> str:
+    # "20 quintal of soyabean" / "5 bags cement" -> the goods, not the unit
+    after = tokens[quantity.index + 2: quantity.index + 4]
+    if after and after[0] == "of" and len(after) == 2 and after[1].isalpha():
+        return after[1]
+    if after and after[0].isalpha() and after[0] not in _NON_ITEM_WORDS:
+        return after[0]
+    return quantity.unit
+
+
+def _counterparty(tokens: List[str]) -> Optional[str]:
+    for i, token in enumerate(tokens[:-1]):
+        if token in {"to", "from"} and tokens[i + 1].isalpha() and tokens[i + 1] not in {"my", "me", "the", "a"}:
+            return tokens[i + 1].capitalize()
+        if token == "my" and tokens[i + 1].isalpha():
+            return tokens[i + 1]
+    for i, token in enumerate(tokens[1:], start=1):
+        if token in {"la", "ko"} and tokens[i - 1].isalpha() and tokens[i - 1] not in _TO_ME:
+            return tokens[i - 1].capitalize()
+    if any(t in {"mitrani", "mitrane", "mitrala", "dost", "dostane"} for t in tokens):
+        return "friend"
+    return None
+
+
+def _names_source(tokens: List[str]) -> bool:
+    for i, token in enumerate(tokens):
+        if token == "from" and i + 1 < len(tokens) and tokens[i + 1].isalpha():
+            return True
+        if token in _SOURCE_MARKERS and i > 0 and tokens[i - 1].isalpha():
+            return True
+    return False
+
+
+def _money(value: Decimal) -> int | float:
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+def parse_with_rules(text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    """
+    Returns (parsed, confidence). `parsed` has the Gemini parser's shape
+    ("type", "total_amount", "description", "category", optional "inventory"),
+    or is None when the text does not fit any known pattern.
+    """
+    tokens = _tokens(text)
+    words = set(tokens)
+    numbers = _numbers(tokens)
+    if not numbers:
+        return None, 0.0
+
+    confidence = 0.0
+    counterparty = _counterparty(tokens)
+
+    # --- type ---
+    tx_type = None
+    if words & _LOAN_IN or ("loan" in words and words & _INCOME):
+        tx_type, confidence = "loan_payable", 0.45
+    elif words & _LOAN_OUT:
+        tx_type, confidence = "loan_receivable", 0.45
+    elif words & _GAVE:
+        # "mitrani mla 500 dile" (gave to me) vs "Rohan la 500 dile" (I gave)
+        if words & _TO_ME:
+            tx_type, confidence = "loan_payable", 0.45
+        elif counterparty or "loan" in words or "udhar" in words:
+            # A bare "gave 5000 to mom" may be a loan, a gift or spending ("... for groceries"):
+            # without loan/udhar it is left to the LLM
+            explicit_loan = "loan" in words or "udhar" in words
+            tx_type, confidence = "loan_receivable", 0.45 if explicit_loan else 0.15
+    if (words & (_LOAN_IN | _LOAN_OUT)) and tx_type is None:
+        return None, 0.0
+
+    category_hits = [_CATEGORIES[w] for w in tokens if w in _CATEGORIES]
+    if tx_type is None:
+        income, expense = bool(words & _INCOME), bool(words & _EXPENSE)
+        implied = {t for _, t in category_hits if t}
+        if income and not expense:
+            tx_type, confidence = "income", 0.4
+        elif expense and not income:
+            tx_type, confidence = "expense", 0.4
+        elif len(implied) == 1:
+            tx_type, confidence = implied.pop(), 0.35
+        else:
+            return None, 0.0
+        # A category that implies the opposite direction ("paid salary" is fine, "got rent" too) is a weak conflict
+        if any(t and t != tx_type for _, t in category_hits) and not (words & _SALE):
+            confidence -= 0.1
+        # "Rohan se 5000 liye" / "mitra kadun 2000 ghetle": taking money from someone is
+        # more likely borrowing than spending, which only the LLM can tell without loan/udhar
+        if _names_source(tokens):
+            confidence -= 0.3
+
+    # --- amount / inventory ---
+    inventory = None
+    money = [n for n in numbers if n.is_money]
+    if len(numbers) == 1:
+        total = numbers[0].value
+        confidence += 0.35 if numbers[0].unit is None else 0.3
+    elif len(money) == 1 and not (words & _RATE_MARKERS) and not (words & _TOTAL_MARKERS):
+        total = money[0].value
+        confidence += 0.25
+    elif len(numbers) == 2 and numbers[0].unit:
+        qty, other = numbers
+        if words & _TOTAL_MARKERS:
+            total = other.value
+            unit_price = (total / qty.value).quantize(Decimal("0.01"))
+        elif words & _RATE_MARKERS or {"at", "rate"} & words:
+            unit_price = other.value
+            total = qty.value * unit_price
+        else:
+            return None, 0.0
+        confidence += 0.3
+        item = _item(tokens, qty)
+        if tx_type == "expense":
+            inventory = {
+                "item": _singular(item),
+                "quantity": _money(qty.value),
+                "unit_price": _money(unit_price),
+                "total_value": _money(total),
+            }
+    else:
+        return None, 0.0
+
+    if total <= 0:
+        return None, 0.0
+
+    # --- category / description ---
+    if tx_type.startswith("loan"):
+        category = "Loan"
+        confidence += 0.2
+        who = counterparty or "someone"
+        description = f"Lent money to {who}" if tx_type == "loan_receivable" else f"Received money from {who}"
+        if tx_type == "loan_payable" and words & _LOAN_IN:
+            description = f"Took a loan from {who}"
+    elif words & _SALE and tx_type == "income":
+        category = "Sales"
+        confidence += 0.2
+        quantity = next((n for n in numbers if n.unit), None)
+        description = f"Sale of {_item(tokens, quantity)}" if quantity else "Sales"
+    elif inventory:
+        category = "Inventory"
+        confidence += 0.2
+        description = f"Purchase of {inventory['quantity']} {inventory['item']}"
+    elif category_hits:
+        category = category_hits[0][0]
+        confidence += 0.2
+        description = category if tx_type == "income" else f"Paid {category.lower()}"
+    else:
+        # Unknown goods/services: leave category and GST inference to the LLM
+        category = "General"
+        description = text.strip()
+
+    parsed = {
+        "type": tx_type,
+        "total_amount": _money(total),
+        "description": description,
+        "category": category,
+    }
+    if inventory:
+        parsed["inventory"] = inventory
+    return parsed, round(min(confidence, 1.0), 2)
+
+
+def _matches(parsed: Dict[str, Any] | None, expected: Dict[str, Any]) -> bool:
+    if not parsed or "error" in parsed:
+        return False
+    amount = parsed.get("total_amount", parsed.get("amount"))
+    try:
+        same_amount = Decimal(str(amount)) == Decimal(str(expected["total_amount"]))
+    except Exception:
+        return False
+    if parsed.get("type") != expected["type"] or not same_amount:
+        return False
+    # Inventory purchases post to the "Inventory" ledger, so their category is only a label
+    if "category" in expected and "inventory" not in expected and str(parsed.get("category", "")).lower() != expected["category"].lower():
+        return False
+    if "inventory" in expected:
+        inv = parsed.get("inventory") or {}
+        for key in ("quantity", "unit_price"):
+            if Decimal(str(inv.get(key, 0))) != Decimal(str(expected["inventory"][key])):
+                return False
+    return True
+
+
+def _benchmark(corpus_path: Path, threshold: float, with_llm: bool) -> Dict[str, Any]:
+    cases = [json.loads(line) for line in corpus_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    timings, hits, correct = [], 0, 0
+    rule_results = []
+    for case in cases:
+        started = time.perf_counter()
+        parsed, confidence = parse_with_rules(case["text"])
+        timings.append((time.perf_counter() - started) * 1000)
+        accepted = parsed is not None and confidence >= threshold
+        rule_results.append(parsed if accepted else None)
+        if accepted:
+            hits += 1
+            correct += _matches(parsed, case["expected"])
+
+    report: Dict[str, Any] = {
+        "cases": len(cases),
+        "threshold": threshold,
+        "fast_path_hit_rate": round(hits / len(cases), 4) if cases else 0.0,
+        "fast_path_accuracy": round(correct / hits, 4) if hits else None,
+        "rules_latency_ms": {
+            "p50": round(statistics.median(timings), 4) if timings else 0.0,
+            "p95": round(sorted(timings)[int(len(timings) * 0.95) - 1], 4) if timings else 0.0,
+        },
+    }
+
+    if with_llm:
+        import asyncio
+        from app.services.gemini_services import gemini_client
+
+        async def run_llm():
+            results, llm_timings = [], []
+            for case in cases:
+                started = time.perf_counter()
+                results.append(await gemini_client.parse_transaction_query(case["text"]))
+                llm_timings.append((time.perf_counter() - started) * 1000)
+            await gemini_client.aclose()
+            return results, llm_timings
+
+        llm_results, llm_timings = asyncio.run(run_llm())
+        llm_correct = sum(_matches(r, c["expected"]) for r, c in zip(llm_results, cases))
+        agree = [
+            _matches(rule, {"type": llm.get("type"), "total_amount": llm.get("total_amount", llm.get("amount", 0))})
+            for rule, llm in zip(rule_results, llm_results)
+            if rule is not None and "error" not in llm
+        ]
+        report["llm_accuracy"] = round(llm_correct / len(cases), 4) if cases else None
+        report["fast_path_agreement_with_llm"] = round(sum(agree) / len(agree), 4) if agree else None
+        report["llm_latency_ms"] = {
+            "p50": round(statistics.median(llm_timings), 1),
+            "p95": round(sorted(llm_timings)[int(len(llm_timings) * 0.95) - 1], 1),
+        }
+    return report
+
+
+def _main() -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based NL transaction parser.")
+    parser.add_argument("command", choices=["benchmark"])
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--threshold", type=float, default=settings.NL_FAST_PATH_THRESHOLD)
+    parser.add_argument("--llm", action="store_true", help="Also parse the corpus with Gemini and compare")
+    args = parser.parse_args()
+    print(json.dumps(_benchmark(args.corpus, args.threshold, args.llm), indent=2))
+
+
+if __name__ == "__main__":
+    _main()
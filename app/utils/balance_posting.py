@@ -0,0 +1,325 @@
+from decimal import Decimal
+from typing import Dict, Hashable, List, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.models.bank_account import BankAccount
+from app.models.ledger import Ledger
+
+
+class BalancePostingService:
+    """
+    Applies balance deltas to bank accounts and ledgers with single atomic
+    `UPDATE ... SET balance = balance + :delta RETURNING balance` statements,
+    so concurrent postings to the same row never lose updates and no row lock
+    is held while Python code runs.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def post_to_bank_account(
+        self,
+        account_id: UUID,
+        delta: Decimal,
+        *,
+        client_id: UUID | None = None,
+        user_id: UUID | None = None,
+        require_funds: bool = False,
+        must_exist: bool = True,
+        not_found_detail: str = "Bank account not found",
+        insufficient_detail: str = "Insufficient balance",
+    ) -> Decimal | None:
+        """
+        Adds `delta` to the bank account balance and returns the new balance.
+        With `require_funds`, the update only applies when the resulting balance
+        stays non-negative (`WHERE balance >= -delta`).
+        Returns None when the account does not exist and `must_exist` is False.
+        """
+        delta = Decimal(str(delta))
+        criteria = [BankAccount.id == account_id]
+        if client_id is not None:
+            criteria.append(BankAccount.client_id == client_id)
+        if user_id is not None:
+            criteria.append(BankAccount.user_id == user_id)
+
+        conditions = list(criteria)
+        if require_funds and delta < 0:
+            conditions.append(func.coalesce(BankAccount.balance, 0) >= -delta)
+
+        new_balance = self.db.execute(
+            update(BankAccount)
+            .where(*conditions)
+            .values(balance=func.coalesce(BankAccount.balance, 0) + delta)
+            .returning(BankAccount.balance)
+            .execution_options(synchronize_session="fetch")
+        ).scalar_one_or_none()
+        if new_balance is not None:
+            return new_balance
+
+        # Nothing matched: tell a missing account apart from a failed funds check
+        exists = self.db.query(BankAccount.id).filter(*criteria).first() is not None
+        if exists:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=insufficient_detail)
+        if must_exist:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found_detail)
+        return None
+
+    def post_to_ledger(self, ledger_id: UUID, delta: Decimal) -> Decimal | None:
+        """
+        Adds `delta` to the ledger balance and returns the new balance
+        (None when the ledger does not exist).
+        """
+        delta = Decimal(str(delta))
+        return self.db.execute(
+            update(Ledger)
+            .where(Ledger.id == ledger_id)
+            .values(balance=func.coalesce(Ledger.balance, 0) + delta)
+            .returning(Ledger.balance)
+            .execution_options(synchronize_session="fetch")
+        ).scalar_one_or_none()
+
+    def post_bank_postings(self, postings: Dict[UUID, List[Tuple[Hashable, Decimal]]]) -> Dict[Hashable, HTTPException]:
+        """
+        Applies per-account postings, given as (key, delta) in order, with the funds
+        check: one UPDATE with the account's net delta, or, when that would overdraw
+        it (balances moved concurrently), one UPDATE per posting in order so only the
+        debits that no longer fit fail. Returns the failed postings' errors by key.
+        """
+        failed: Dict[Hashable, HTTPException] = {}
+        for account_id, account_postings in postings.items():
+            net = sum((delta for _, delta in account_postings), Decimal("0"))
+            if not net:
+                continue
+            try:
+                self.post_to_bank_account(account_id, net, require_funds=True)
+                continue
+            except HTTPException as e:
+                if e.status_code != status.HTTP_400_BAD_REQUEST:
+                    failed.update((key, e) for key, _ in account_postings)
+                    continue
+            for key, delta in account_postings:
+                try:
+                    self.post_to_bank_account(account_id, delta, require_funds=True)
+                except HTTPException as e:
+                    failed[key] = e
+        return failed
+
+    def post_ledger_deltas(self, deltas: Dict[UUID, Decimal]) -> None:
+        """
+        Applies aggregated per-ledger deltas (one UPDATE per ledger).
+        """
+        for ledger_id, delta in deltas.items():
+            if delta:
+                self.post_to_ledger(ledger_id, delta)
+
+
+def _stress(postings: int, workers: int, amount: Decimal) -> Dict[str, object]:
+    """
+    Fires `postings` concurrent debits (with the funds check) and then as many
+    concurrent credits at one throwaway account, each in its own session and
+    database transaction, and checks that no posting was lost or overdrawn.
+    The account starts with funds for exactly half of the debits.
+    """
+    import time
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import app.db.base  # noqa: F401  (maps every model)
+    from app.core.config import settings
+
+    engine = create_engine(settings.DATABASE_URL, pool_size=workers, max_overflow=0)
+    make_session = sessionmaker(bind=engine)
+    client_id, user_id = uuid.uuid4(), uuid.uuid4()
+    opening = amount * (postings // 2)
+    with make_session() as db:
+        account = BankAccount(
+            client_id=client_id, user_id=user_id, account_name="stress", account_type="bank", balance=opening
+        )
+        ledger = Ledger(client_id=client_id, user_id=user_id, name="stress", type="expense", balance=0)
+        db.add_all([account, ledger])
+        db.commit()
+        account_id, ledger_id = account.id, ledger.id
+
+    def post(delta: Decimal) -> bool:
+        with make_session() as db:
+            try:
+                BalancePostingService(db).post_to_bank_account(account_id, delta, require_funds=True)
+            except HTTPException:
+                db.rollback()
+                return False
+            BalancePostingService(db).post_to_ledger(ledger_id, -delta)
+            db.commit()
+            return True
+
+    def balances() -> tuple:
+        with make_session() as db:
+            return (
+                Decimal(db.get(BankAccount, account_id).balance),
+                Decimal(db.get(Ledger, ledger_id).balance),
+            )
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            started = time.perf_counter()
+            debited = sum(pool.map(post, [-amount] * postings))
+            debit_seconds = time.perf_counter() - started
+            after_debits = balances()
+            started = time.perf_counter()
+            credited = sum(pool.map(post, [amount] * postings))
+            credit_seconds = time.perf_counter() - started
+        final = balances()
+    finally:
+        with make_session() as db:
+            db.query(BankAccount).filter(BankAccount.id == account_id).delete()
+            db.query(Ledger).filter(Ledger.id == ledger_id).delete()
+            db.commit()
+        engine.dispose()
+
+    expected_debits = postings // 2
+    checks = {
+        "debits_accepted": debited == expected_debits,
+        "balance_after_debits": after_debits == (Decimal(0), amount * expected_debits),
+        "credits_accepted": credited == postings,
+        "balance_after_credits": final == (amount * postings, amount * (expected_debits - postings)),
+    }
+    return {
+        "postings": postings,
+        "workers": workers,
+        "debits_accepted": debited,
+        "credits_accepted": credited,
+        "balance_after_debits": [str(b) for b in after_debits],
+        "balance_after_credits": [str(b) for b in final],
+        "debit_postings_per_second": round(postings / debit_seconds, 1),
+        "credit_postings_per_second": round(postings / credit_seconds, 1),
+        "checks": checks,
+        "ok": all(checks.values()),
+    }
+
+
+
+def _stress_create_delete(operations: int, workers: int, amount: Decimal) -> Dict[str, object]:
+    """
+    Creates `operations` expenses on one throwaway account, then fires as many
+    concurrent creates and deletes of those expenses at it. Creates take the tenant
+    snapshot lock before the bank row and deletes must do the same, or they
+    deadlock. Checks that every call succeeded and that the stored balances
+    reconcile with the transactions.
+    """
+    import time
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import date
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import app.db.base  # noqa: F401  (maps every model)
+    from app.core.config import settings
+    from app.models.financial_settings import FinancialSettings
+    from app.models.transaction_limit import TransactionLimitOverride
+    from app.schemas.bank_account import BankAccountCreate
+    from app.schemas.transaction import TransactionAutoCreate
+    from app.utils.balance_reconciliation import BalanceReconciliationService
+    from app.utils.bank_accounts import BankAccountService
+    from app.utils.load_bench import drop_tenant
+    from app.utils.transaction_service import TransactionService
+
+    engine = create_engine(settings.DATABASE_URL, pool_size=workers, max_overflow=0)
+    make_session = sessionmaker(bind=engine)
+    client_id, user_id = uuid.uuid4(), uuid.uuid4()
+    opening = amount * operations * 4
+    with make_session() as db:
+        db.add(FinancialSettings(
+            client_id=client_id, user_id=user_id, financial_year_start=date(date.today().year, 4, 1),
+            gst_enabled=False, gst_rate=Decimal("0"),
+        ))
+        db.add(TransactionLimitOverride(client_id=client_id, user_id=user_id, max_per_day=operations * 2))
+        db.commit()
+        account_id = BankAccountService(db).create_account(
+            BankAccountCreate(client_id=client_id, user_id=user_id, account_name="stress", balance=opening),
+            preverified=True,
+        ).id
+        payload = TransactionAutoCreate(
+            client_id=client_id, user_id=user_id, bank_account_id=account_id,
+            type="expense", amount=amount, description="stress",
+        )
+        existing = [TransactionService(db).create_with_auto_ledger(payload).id for _ in range(operations)]
+
+    def create(_) -> str | None:
+        with make_session() as db:
+            try:
+                TransactionService(db).create_with_auto_ledger(payload)
+            except Exception as e:
+                return type(e).__name__
+        return None
+
+    def delete(tx_id) -> str | None:
+        with make_session() as db:
+            try:
+                TransactionService(db).delete(tx_id=tx_id, client_id=client_id, user_id=user_id)
+            except Exception as e:
+                return type(e).__name__
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            started = time.perf_counter()
+            creates = [pool.submit(create, i) for i in range(operations)]
+            deletes = [pool.submit(delete, tx_id) for tx_id in existing]
+            errors: Dict[str, int] = {}
+            for future in creates + deletes:
+                error = future.result()
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+            seconds = time.perf_counter() - started
+        with make_session() as db:
+            balance = Decimal(db.get(BankAccount, account_id).balance)
+            drifts = BalanceReconciliationService(db).reconcile_tenant(client_id, user_id)["drifts"]
+    finally:
+        drop_tenant(str(client_id), str(user_id))
+        engine.dispose()
+
+    checks = {
+        "no_errors": not errors,
+        "balance": balance == opening - amount * operations,
+        "reconciled": not drifts,
+    }
+    return {
+        "creates": operations,
+        "deletes": operations,
+        "errors": errors,
+        "balance": str(balance),
+        "drifts": drifts,
+        "operations_per_second": round(2 * operations / seconds, 1),
+        "checks": checks,
+        "ok": all(checks.values()),
+    }
+
+def _main() -> None:
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Concurrency stress test for balance postings.")
+    parser.add_argument("command", choices=["stress"])
+    parser.add_argument("--postings", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--amount", type=Decimal, default=Decimal("10.00"))
+    args = parser.parse_args()
+
+    result = _stress(args.postings, args.workers, args.amount)
+    result["create_delete"] = _stress_create_delete(args.postings, args.workers, args.amount)
+    result["ok"] = result["ok"] and result["create_delete"]["ok"]
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,534 @@
+import argparse
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Date, and_, case, cast, delete, func, literal, select, union, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.models.balance_snapshot import BalanceOpening, BalanceSnapshot
+from app.models.bank_account import BankAccount
+from app.models.ledger import Ledger
+from app.models.transaction import Transaction
+from app.utils.balance_posting import BalancePostingService
+from app.utils.transaction_filter import day_range_bounds, get_tenant_timezone
+
+logger = logging.getLogger(__name__)
+
+BANK_ACCOUNT = "bank_account"
+LEDGER = "ledger"
+
+# Bank sign per transaction type; other types move no money (as in the posting paths)
+DEBIT_TYPES = ("expense", "loan_receivable")
+CREDIT_TYPES = ("income", "loan_payable")
+
+
+def record_opening(
+    db: Session, *, entity_type: str, entity_id: UUID, client_id: UUID, user_id: UUID, amount
+) -> None:
+    """
+    Records the opening balance of a new bank account or ledger (caller commits).
+    """
+    db.execute(
+        insert(BalanceOpening)
+        .values(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            client_id=client_id,
+            user_id=user_id,
+            opening_balance=Decimal(str(amount or 0)),
+            source="created",
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+def month_end(day: date) -> date:
+    first_of_next = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return first_of_next - timedelta(days=1)
+
+
+def lock_tenant_snapshots(db: Session, client_id: UUID, user_id: UUID, *, shared: bool = False) -> None:
+    """
+    Serializes snapshot writes and invalidations of one tenant until the
+    current database transaction ends. Transaction creates take it `shared`
+    (they do not block each other), so a month-end snapshot never runs while a
+    create whose created_at falls in that month is still uncommitted.
+    Take it before updating any balance row (creates, updates and deletes all do),
+    so the lock and the row locks are always acquired in the same order.
+    """
+    key = func.hashtext(f"balance_snapshots:{client_id}:{user_id}")
+    lock = func.pg_advisory_xact_lock_shared(key) if shared else func.pg_advisory_xact_lock(key)
+    db.execute(select(lock))
+
+
+def last_closed_month_end(db: Session, client_id: UUID, user_id: UUID) -> date:
+    """
+    Last day of the previous month in the tenant's timezone.
+    """
+    today = datetime.now(get_tenant_timezone(db, user_id, client_id)).date()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def invalidate_snapshots(db: Session, *, client_id: UUID, user_id: UUID, changed_at: datetime) -> None:
+    """
+    Drops the tenant's snapshots that include a transaction created at
+    `changed_at` (a backdated update or delete); they are rebuilt on the next
+    balance read. Caller commits.
+    """
+    day = changed_at.astimezone(get_tenant_timezone(db, user_id, client_id)).date()
+    lock_tenant_snapshots(db, client_id, user_id)
+    db.execute(
+        delete(BalanceSnapshot).where(
+            BalanceSnapshot.client_id == client_id,
+            BalanceSnapshot.user_id == user_id,
+            BalanceSnapshot.period_end >= day,
+        )
+    )
+
+
+def postings(
+    client_id: UUID,
+    user_id: UUID,
+    *,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """
+    The balance postings implied by the tenant's live transactions, as a subquery
+    of (entity_type, entity_id, delta) rows, mirroring the posting paths:
+    - bank account: -amount for expense/loan_receivable, +amount for income/loan_payable
+    - main ledger: base_amount (amount minus GST when no base was stored)
+    - GST ledger: gst_amount, on "GST Collected" for income/loan_payable and on
+      "GST Paid" otherwise
+    `since`/`until` bound created_at to [since, until).
+    """
+    live = [
+        Transaction.client_id == client_id,
+        Transaction.user_id == user_id,
+        Transaction.is_deleted == False,
+    ]
+    if since is not None:
+        live.append(Transaction.created_at >= since)
+    if until is not None:
+        live.append(Transaction.created_at < until)
+
+    gst = func.coalesce(Transaction.gst_amount, 0)
+    bank_sign = case(
+        (Transaction.type.in_(DEBIT_TYPES), -1),
+        (Transaction.type.in_(CREDIT_TYPES), 1),
+        else_=0,
+    )
+    gst_ledger = aliased(Ledger)
+    gst_ledger_name = case((Transaction.type.in_(CREDIT_TYPES), "gst collected"), else_="gst paid")
+
+    bank = select(
+        literal(BANK_ACCOUNT).label("entity_type"),
+        Transaction.bank_account_id.label("entity_id"),
+        (bank_sign * Transaction.amount).label("delta"),
+    ).where(*live, Transaction.bank_account_id.isnot(None))
+    main_ledger = select(
+        literal(LEDGER),
+        Transaction.ledger_id,
+        func.coalesce(Transaction.base_amount, Transaction.amount - gst),
+    ).where(*live)
+    gst_ledgers = (
+        select(literal(LEDGER), gst_ledger.id, gst)
+        .join(
+            gst_ledger,
+            and_(
+                gst_ledger.client_id == Transaction.client_id,
+                gst_ledger.user_id == Transaction.user_id,
+                func.lower(gst_ledger.name) == gst_ledger_name,
+            ),
+        )
+        .where(*live, gst > 0)
+    )
+    return union_all(bank, main_ledger, gst_ledgers).subquery("postings")
+
+
+def posted_totals(client_id: UUID, user_id: UUID, *, since: datetime | None = None, until: datetime | None = None):
+    """
+    postings() summed per entity: (entity_type, entity_id, posted).
+    """
+    p = postings(client_id, user_id, since=since, until=until)
+    return (
+        select(p.c.entity_type, p.c.entity_id, func.sum(p.c.delta).label("posted"))
+        .group_by(p.c.entity_type, p.c.entity_id)
+        .subquery("posted")
+    )
+
+
+def tenant_entities(client_id: UUID, user_id: UUID):
+    """
+    The tenant's bank accounts and ledgers with their stored balances.
+    """
+    return union_all(
+        select(
+            literal(BANK_ACCOUNT).label("entity_type"),
+            BankAccount.id.label("entity_id"),
+            BankAccount.client_id.label("client_id"),
+            BankAccount.user_id.label("user_id"),
+            func.coalesce(BankAccount.balance, 0).label("stored"),
+        ).where(BankAccount.client_id == client_id, BankAccount.user_id == user_id),
+        select(literal(LEDGER), Ledger.id, Ledger.client_id, Ledger.user_id, func.coalesce(Ledger.balance, 0)).where(
+            Ledger.client_id == client_id, Ledger.user_id == user_id
+        ),
+    ).subquery("entities")
+
+
+class BalanceReconciliationService:
+    """
+    Recomputes bank account and ledger balances from `transactions` (one set-based
+    query per tenant), reports or repairs drift from the stored balances, and
+    writes month-end balance snapshots.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _balances(self, client_id: UUID, user_id: UUID) -> List[Tuple[str, UUID, Decimal, Decimal, Decimal | None]]:
+        """
+        (entity_type, entity_id, stored, posted, opening or None) for every entity of the
+        tenant, read in one statement (so stored and posted come from the same snapshot).
+        """
+        entities = tenant_entities(client_id, user_id)
+        posted = posted_totals(client_id, user_id)
+        stmt = (
+            select(
+                entities.c.entity_type,
+                entities.c.entity_id,
+                entities.c.stored,
+                func.coalesce(posted.c.posted, 0),
+                BalanceOpening.opening_balance,
+            )
+            .select_from(entities)
+            .outerjoin(
+                posted,
+                and_(posted.c.entity_type == entities.c.entity_type, posted.c.entity_id == entities.c.entity_id),
+            )
+            .outerjoin(
+                BalanceOpening,
+                and_(
+                    BalanceOpening.entity_type == entities.c.entity_type,
+                    BalanceOpening.entity_id == entities.c.entity_id,
+                ),
+            )
+        )
+        return [tuple(row) for row in self.db.execute(stmt).all()]
+
+    def reconcile_tenant(self, client_id: UUID, user_id: UUID, *, repair: bool = False) -> Dict[str, Any]:
+        """
+        Compares stored balances with opening balance + transaction postings.
+        Entities without an opening balance adopt (stored - posted) as theirs.
+        With `repair`, drifted balances are corrected by a relative update, so
+        postings that commit meanwhile are kept.
+        """
+        drifts: List[Dict[str, Any]] = []
+        adopted = 0
+        poster = BalancePostingService(self.db)
+        rows = self._balances(client_id, user_id)
+        for entity_type, entity_id, stored, posted, opening in rows:
+            stored, posted = Decimal(stored), Decimal(posted)
+            if opening is None:
+                self.db.execute(
+                    insert(BalanceOpening)
+                    .values(
+                        entity_type=entity_type,
+                        entity_id=entity_id,
+                        client_id=client_id,
+                        user_id=user_id,
+                        opening_balance=stored - posted,
+                        source="adopted",
+                    )
+                    .on_conflict_do_nothing()
+                )
+                adopted += 1
+                continue
+
+            expected = Decimal(opening) + posted
+            if stored == expected:
+                continue
+            drifts.append({
+                "entity_type": entity_type,
+                "entity_id": str(entity_id),
+                "stored": str(stored),
+                "expected": str(expected),
+                "drift": str(stored - expected),
+            })
+            if repair:
+                correction = expected - stored
+                if entity_type == BANK_ACCOUNT:
+                    poster.post_to_bank_account(entity_id, correction, must_exist=False)
+                else:
+                    poster.post_to_ledger(entity_id, correction)
+                logger.warning("Repaired %s %s balance drift of %s", entity_type, entity_id, stored - expected)
+
+        self.db.commit()
+        return {
+            "client_id": str(client_id),
+            "user_id": str(user_id),
+            "entities": len(rows),
+            "adopted_openings": adopted,
+            "drifted": len(drifts),
+            "repaired": len(drifts) if repair else 0,
+            "drifts": drifts,
+        }
+
+    def tenants(self, *, client_id: UUID | None = None, user_id: UUID | None = None) -> List[Tuple[UUID, UUID]]:
+        queries = []
+        for model in (BankAccount, Ledger):
+            query = select(model.client_id, model.user_id)
+            if client_id is not None:
+                query = query.where(model.client_id == client_id)
+            if user_id is not None:
+                query = query.where(model.user_id == user_id)
+            queries.append(query)
+        return [tuple(row) for row in self.db.execute(union(*queries)).all()]
+
+    def reconcile(
+        self, *, client_id: UUID | None = None, user_id: UUID | None = None, repair: bool = False
+    ) -> Dict[str, Any]:
+        reports = [
+            self.reconcile_tenant(tenant_client_id, tenant_user_id, repair=repair)
+            for tenant_client_id, tenant_user_id in self.tenants(client_id=client_id, user_id=user_id)
+        ]
+        return {
+            "tenants": len(reports),
+            "entities": sum(r["entities"] for r in reports),
+            "adopted_openings": sum(r["adopted_openings"] for r in reports),
+            "drifted": sum(r["drifted"] for r in reports),
+            "repaired": sum(r["repaired"] for r in reports),
+            "reports": [r for r in reports if r["drifted"]],
+        }
+
+    def write_month_snapshots(self, client_id: UUID, user_id: UUID, period_end: date) -> int:
+        """
+        Stores the closing balance of every tenant entity at the end of local day
+        `period_end`: the latest earlier snapshot (else the opening balance) plus
+        the postings since. Returns the number of snapshot rows written (caller commits).
+        """
+        tz = get_tenant_timezone(self.db, user_id, client_id)
+        _, until = day_range_bounds(period_end, period_end, tz)
+
+        previous_end = self.db.execute(
+            select(func.max(BalanceSnapshot.period_end)).where(
+                BalanceSnapshot.client_id == client_id,
+                BalanceSnapshot.user_id == user_id,
+                BalanceSnapshot.period_end < period_end,
+            )
+        ).scalar()
+        since = day_range_bounds(previous_end, previous_end, tz)[1] if previous_end else None
+
+        entities = tenant_entities(client_id, user_id)
+        posted = posted_totals(client_id, user_id, since=since, until=until)
+        previous = aliased(BalanceSnapshot)
+        source = (
+            select(
+                entities.c.entity_type,
+                entities.c.entity_id,
+                cast(literal(period_end), Date),
+                entities.c.client_id,
+                entities.c.user_id,
+                func.coalesce(previous.balance, BalanceOpening.opening_balance, 0) + func.coalesce(posted.c.posted, 0),
+            )
+            .select_from(entities)
+            .outerjoin(
+                posted,
+                and_(posted.c.entity_type == entities.c.entity_type, posted.c.entity_id == entities.c.entity_id),
+            )
+            .outerjoin(
+                BalanceOpening,
+                and_(
+                    BalanceOpening.entity_type == entities.c.entity_type,
+                    BalanceOpening.entity_id == entities.c.entity_id,
+                ),
+            )
+            .outerjoin(
+                previous,
+                and_(
+                    previous.entity_type == entities.c.entity_type,
+                    previous.entity_id == entities.c.entity_id,
+                    previous.period_end == previous_end,
+                ),
+            )
+        )
+        stmt = insert(BalanceSnapshot).from_select(
+            ["entity_type", "entity_id", "period_end", "client_id", "user_id", "balance"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BalanceSnapshot.entity_type, BalanceSnapshot.entity_id, BalanceSnapshot.period_end],
+            set_={"balance": stmt.excluded.balance, "computed_at": func.now()},
+        )
+        return self.db.execute(stmt).rowcount
+
+    def snapshot(
+        self, period_end: date | None = None, *, client_id: UUID | None = None, user_id: UUID | None = None
+    ) -> Dict[str, int]:
+        """
+        Writes `period_end` snapshots for every tenant in scope (default: each
+        tenant's last closed month in its own timezone). Missing opening
+        balances are adopted first, so snapshots start from a known baseline.
+        """
+        tenants = self.tenants(client_id=client_id, user_id=user_id)
+        rows = 0
+        for tenant_client_id, tenant_user_id in tenants:
+            self.reconcile_tenant(tenant_client_id, tenant_user_id)
+            lock_tenant_snapshots(self.db, tenant_client_id, tenant_user_id)
+            tenant_period_end = period_end or last_closed_month_end(self.db, tenant_client_id, tenant_user_id)
+            rows += self.write_month_snapshots(tenant_client_id, tenant_user_id, tenant_period_end)
+            self.db.commit()
+        return {"tenants": len(tenants), "snapshots": rows}
+
+    def balance_as_of(
+        self, *, entity_type: str, entity_id: UUID, client_id: UUID, user_id: UUID, as_of: date
+    ) -> Tuple[Decimal, date | None]:
+        """
+        (balance, snapshot date) at the end of local day `as_of`: the latest snapshot
+        on or before it (else the opening balance) plus the entity's postings since.
+        """
+        tz = get_tenant_timezone(self.db, user_id, client_id)
+        _, until = day_range_bounds(as_of, as_of, tz)
+        snapshot = self.db.execute(
+            select(BalanceSnapshot.period_end, BalanceSnapshot.balance)
+            .where(
+                BalanceSnapshot.entity_type == entity_type,
+                BalanceSnapshot.entity_id == entity_id,
+                BalanceSnapshot.period_end <= as_of,
+            )
+            .order_by(BalanceSnapshot.period_end.desc())
+            .limit(1)
+        ).first()
+        if snapshot is not None:
+            base = Decimal(snapshot.balance)
+            since = day_range_bounds(snapshot.period_end, snapshot.period_end, tz)[1]
+        else:
+            opening = self.db.execute(
+                select(BalanceOpening.opening_balance).where(
+                    BalanceOpening.entity_type == entity_type, BalanceOpening.entity_id == entity_id
+                )
+            ).scalar()
+            base = Decimal(opening or 0)
+            since = None
+
+        p = postings(client_id, user_id, since=since, until=until)
+        delta = self.db.execute(
+            select(func.coalesce(func.sum(p.c.delta), 0)).where(
+                p.c.entity_type == entity_type, p.c.entity_id == entity_id
+            )
+        ).scalar()
+        return base + Decimal(delta), snapshot.period_end if snapshot is not None else None
+
+    def ensure_snapshots(self, client_id: UUID, user_id: UUID, through: date) -> int:
+        """
+        Writes the tenant's missing month-end snapshots up to the last month closed
+        on or before `through`, each from the one before it. Months before the
+        tenant's first transaction are skipped. Returns the number of months written.
+        """
+        tz = get_tenant_timezone(self.db, user_id, client_id)
+        last_closed = last_closed_month_end(self.db, client_id, user_id)
+        closed = through if month_end(through) == through else through.replace(day=1) - timedelta(days=1)
+        target = min(closed, last_closed)
+
+        lock_tenant_snapshots(self.db, client_id, user_id)
+        latest = self.db.execute(
+            select(func.max(BalanceSnapshot.period_end)).where(
+                BalanceSnapshot.client_id == client_id, BalanceSnapshot.user_id == user_id
+            )
+        ).scalar()
+        if latest is not None:
+            period_end = month_end(latest + timedelta(days=1))
+        else:
+            first = self.db.execute(
+                select(func.min(Transaction.created_at)).where(
+                    Transaction.client_id == client_id,
+                    Transaction.user_id == user_id,
+                    Transaction.is_deleted == False,
+                )
+            ).scalar()
+            if first is None:
+                self.db.commit()
+                return 0
+            period_end = month_end(first.astimezone(tz).date())
+
+        months = 0
+        while period_end <= target:
+            self.write_month_snapshots(client_id, user_id, period_end)
+            period_end = month_end(period_end + timedelta(days=1))
+            months += 1
+        self.db.commit()
+        return months
+
+    def balance_on(
+        self, *, entity_type: str, entity_id: UUID, client_id: UUID, user_id: UUID, as_of: date | None = None
+    ) -> Dict[str, Any]:
+        """
+        Point-in-time balance of a tenant's bank account or ledger at the end of
+        local day `as_of` (default: today). Opening balances and month-end snapshots
+        are created on first use, so the read covers at most one month of postings.
+        """
+        model, label = (BankAccount, "Bank account") if entity_type == BANK_ACCOUNT else (Ledger, "Ledger")
+        found = self.db.execute(
+            select(model.id).where(model.id == entity_id, model.client_id == client_id, model.user_id == user_id)
+        ).first()
+        if found is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{label} not found")
+
+        if as_of is None:
+            as_of = datetime.now(get_tenant_timezone(self.db, user_id, client_id)).date()
+        has_opening = self.db.execute(
+            select(BalanceOpening.entity_id).where(
+                BalanceOpening.entity_type == entity_type, BalanceOpening.entity_id == entity_id
+            )
+        ).first()
+        if has_opening is None:
+            self.reconcile_tenant(client_id, user_id)
+        self.ensure_snapshots(client_id, user_id, as_of)
+
+        balance, snapshot_date = self.balance_as_of(
+            entity_type=entity_type, entity_id=entity_id, client_id=client_id, user_id=user_id, as_of=as_of
+        )
+        return {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "as_of": as_of,
+            "balance": balance,
+            "snapshot_date": snapshot_date,
+        }
+
+
+def _main() -> None:
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reconcile balances and write month-end balance snapshots.")
+    parser.add_argument("command", choices=["reconcile", "snapshot"])
+    parser.add_argument("--client-id", type=UUID, default=None)
+    parser.add_argument("--user-id", type=UUID, default=None)
+    parser.add_argument("--repair", action="store_true", help="reconcile: correct drifted balances")
+    parser.add_argument(
+        "--month", default=None,
+        help="snapshot: month to close as YYYY-MM (default: each tenant's previous month in its timezone)",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = BalanceReconciliationService(db)
+        if args.command == "reconcile":
+            result = service.reconcile(client_id=args.client_id, user_id=args.user_id, repair=args.repair)
+        else:
+            period_end = month_end(datetime.strptime(args.month, "%Y-%m").date()) if args.month else None
+            result = service.snapshot(period_end, client_id=args.client_id, user_id=args.user_id)
+        print(json.dumps(result, indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    _main()
@@ -4,11 +4,11 @@ from sqlalchemy.exc import IntegrityError
 from typing import Tuple, List, Optional
 from uuid import UUID
 import logging
-import requests
 
 from app.models.bank_account import BankAccount
-from app.core.config import settings
 from app.schemas.bank_account import BankAccountCreate
+from app.services.auth_client import remote_user_verifier
+from app.utils.balance_reconciliation import BANK_ACCOUNT, record_opening
 from fastapi import HTTPException, status
 
 logger = logging.getLogger(__name__)
@@ -47,6 +47,11 @@ class BankAccountService:
 
         self.db.add(new_cash)
         try:
+            self.db.flush()
+            record_opening(
+                self.db, entity_type=BANK_ACCOUNT, entity_id=new_cash.id,
+                client_id=client_id, user_id=user_id, amount=initial_balance,
+            )
             self.db.commit()
             self.db.refresh(new_cash)
             return new_cash, True
@@ -64,28 +69,23 @@ class BankAccountService:
     def verify_remote_user_exists(self, client_id: UUID, user_id: UUID, bearer_token: str) -> bool:
         """
         Call external auth API to verify that the user exists.
+        Results are cached and concurrent checks coalesced (see RemoteUserVerifier).
         """
         if not bearer_token:
             logger.warning("User verify: missing Authorization header for client_id=%s user_id=%s", client_id, user_id)
             return False
 
         token = bearer_token.strip().replace("Bearer ", "")
-        url = f"{settings.AUTH_API_URL}{client_id}/user/{user_id}"
-        headers = {"authorization": f"Bearer {token}"}
-        
-        try:
-            resp = requests.get(url, headers=headers, timeout=10)
-            return resp.status_code == 200
-        except requests.RequestException as exc:
-            logger.error("User verify: request failed: %s", exc)
-            return False
+        return remote_user_verifier.verify(client_id, user_id, token)
 
-    def create_account(self, bank_account_in: BankAccountCreate) -> BankAccount:
+    def create_account(self, bank_account_in: BankAccountCreate, *, preverified: bool = False) -> BankAccount:
         """
         Handles the entire logic for creating a new bank or cash account.
+        `preverified` skips the remote user check when the request was already
+        authenticated for this client/user (see app.core.auth).
         """
         # 1. User Verification
-        if not self.verify_remote_user_exists(
+        if not preverified and not self.verify_remote_user_exists(
             client_id=bank_account_in.client_id,
             user_id=bank_account_in.user_id,
             bearer_token=bank_account_in.token or ""
@@ -115,6 +115,11 @@ class BankAccountService:
         self.db.add(new_account)
         
         try:
+            self.db.flush()
+            record_opening(
+                self.db, entity_type=BANK_ACCOUNT, entity_id=new_account.id,
+                client_id=new_account.client_id, user_id=new_account.user_id, amount=new_account.balance,
+            )
             self.db.commit()
             self.db.refresh(new_account)
             return new_account
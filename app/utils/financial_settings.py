@@ -1,11 +1,50 @@
 
 import uuid
 from sqlalchemy.orm import Session
+from app.core.cache import MISSING, CacheBackend, TTLCache
+from app.core.config import settings as app_settings
 from app.models.financial_settings import FinancialSettings
-from app.schemas.financial_settings import FinancialSettingsCreate
+from app.schemas.financial_settings import FinancialSettingsCreate, FinancialSettingsResponse
 from fastapi import HTTPException, status
 from typing import List
 
+# Active settings per (client_id, user_id); holds detached snapshots, never ORM objects
+active_settings_cache = TTLCache(
+    maxsize=app_settings.FINANCIAL_SETTINGS_CACHE_SIZE,
+    ttl=app_settings.FINANCIAL_SETTINGS_CACHE_TTL,
+    namespace="financial_settings",
+)
+
+
+def set_active_settings_backend(backend: CacheBackend | None) -> None:
+    """
+    Plugs a shared cache backend (e.g. Redis) in front of the settings query.
+    """
+    active_settings_cache.backend = backend
+
+
+def _settings_cache_key(user_id, client_id) -> tuple:
+    return (str(client_id), str(user_id))
+
+
+# Nullable columns that legacy rows left NULL, and the values they stand for
+_NULL_DEFAULTS = {
+    "currency_code": FinancialSettingsCreate.model_fields["currency_code"].default,
+    "language": FinancialSettingsCreate.model_fields["language"].default,
+    "timezone": app_settings.DEFAULT_TIMEZONE,
+}
+
+
+def settings_response(row: FinancialSettings) -> FinancialSettingsResponse:
+    """
+    Detached response model for a settings row, with NULL legacy fields defaulted.
+    """
+    data = {name: getattr(row, name) for name in FinancialSettingsResponse.model_fields}
+    for name, default in _NULL_DEFAULTS.items():
+        if data[name] is None:
+            data[name] = default
+    return FinancialSettingsResponse.model_validate(data)
+
 class FinancialSettingsService:
     """
     Service for managing financial settings lifecycle and queries.
@@ -19,6 +58,7 @@ class FinancialSettingsService:
         self.db.add(new_settings)
         self.db.commit()
         self.db.refresh(new_settings)
+        active_settings_cache.invalidate(_settings_cache_key(new_settings.user_id, new_settings.client_id))
         return new_settings
 
     def list_by_user(self, user_id: str, client_id: str, limit: int = 10, offset: int = 0) -> List[FinancialSettings]:
@@ -34,8 +74,17 @@ class FinancialSettingsService:
         )
         return settings
 
-    def get_active_settings(self, user_id: str, client_id: str) -> FinancialSettings | None:
-        return (
+    def get_active_settings(self, user_id: str, client_id: str) -> FinancialSettingsResponse | None:
+        """
+        Returns the latest financial settings for the user, served from a TTL cache.
+        The result is a read-only snapshot, not a session-bound ORM object.
+        """
+        key = _settings_cache_key(user_id, client_id)
+        cached = active_settings_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        row = (
             self.db.query(FinancialSettings)
             .filter(
                 FinancialSettings.user_id == user_id,
@@ -43,4 +92,7 @@ class FinancialSettingsService:
             )
             .order_by(FinancialSettings.financial_year_start.desc())
             .first()
-        )
\ No newline at end of file
+        )
+        snapshot = settings_response(row) if row else None
+        active_settings_cache.set(key, snapshot)
+        return snapshot
\ No newline at end of file
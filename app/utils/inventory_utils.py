@@ -4,10 +4,12 @@ from decimal import Decimal, ROUND_HALF_UP
 from typing import Tuple 
 from app.models.inventory import Inventory
 from app.models.transaction import Transaction
-from app.models.ledger import Ledger
-from app.models.bank_account import BankAccount
 from app.schemas.inventory import InventoryCreate
+from app.utils.balance_posting import BalancePostingService
+from app.utils.balance_reconciliation import lock_tenant_snapshots
 from app.utils.financial_settings import FinancialSettingsService
+from app.utils.ledger_directory import ledger_directory
+from app.utils.rollup_service import DailyRollupService
 from app.utils.transaction_limits import enforce_daily_limit
 
 
@@ -19,55 +21,40 @@ class InventoryService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_item(self, inventory_item: InventoryCreate) -> Tuple[Inventory, Transaction]:
+    def create_item(
+        self, inventory_item: InventoryCreate, enforce_limit: bool = True, commit: bool = True
+    ) -> Tuple[Inventory, Transaction]:
         """
         Creates a new inventory item and a corresponding financial transaction.
         Returns both the created inventory item and the transaction.
+        Pass enforce_limit=False when the caller already reserved the daily slot, and
+        commit=False to only flush (the caller commits, e.g. a batch of entries).
         """
+        lock_tenant_snapshots(self.db, inventory_item.client_id, inventory_item.user_id, shared=True)
         # Enforce per-user daily transaction cap
-        enforce_daily_limit(
-            self.db,
-            user_id=inventory_item.user_id,
-            client_id=inventory_item.client_id,
-        )
-        bank_account = (
-            self.db.query(BankAccount)
-            .filter(
-                BankAccount.id == inventory_item.bank_account_id,
-                BankAccount.user_id == inventory_item.user_id,
+        if enforce_limit:
+            enforce_daily_limit(
+                self.db,
+                user_id=inventory_item.user_id,
+                client_id=inventory_item.client_id,
             )
-            .first()
+        poster = BalancePostingService(self.db)
+        poster.post_to_bank_account(
+            inventory_item.bank_account_id,
+            -inventory_item.total_value,
+            user_id=inventory_item.user_id,
+            require_funds=True,
+            not_found_detail="Bank account not found for this user.",
+            insufficient_detail="Insufficient balance.",
         )
-        if not bank_account:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Bank account not found for this user.",
-            )
-
-        if bank_account.balance < inventory_item.total_value:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance."
-            )
 
-        ledger = (
-            self.db.query(Ledger)
-            .filter(
-                Ledger.client_id == inventory_item.client_id,
-                Ledger.user_id == inventory_item.user_id,
-                Ledger.name.ilike("Inventory"),
-            )
-            .first()
+        ledger_id = ledger_directory.resolve(
+            self.db,
+            client_id=inventory_item.client_id,
+            user_id=inventory_item.user_id,
+            name="Inventory",
+            type="expense",
         )
-        if not ledger:
-            ledger = Ledger(
-                name="Inventory",
-                type="expense",
-                client_id=inventory_item.client_id,
-                user_id=inventory_item.user_id,
-                balance=Decimal("0.0"),
-            )
-            self.db.add(ledger)
-            self.db.flush()
 
         settings = FinancialSettingsService(self.db).get_active_settings(
             user_id=str(inventory_item.user_id), client_id=str(inventory_item.client_id)
@@ -81,30 +68,17 @@ class InventoryService:
                 amount_excl_gst = (inventory_item.total_value / divisor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
                 gst_amount = (inventory_item.total_value - amount_excl_gst).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-        bank_account.balance -= inventory_item.total_value
-        ledger.balance += amount_excl_gst
+        poster.post_to_ledger(ledger_id, amount_excl_gst)
         # Record GST on a separate ledger as input tax credit
         if gst_amount > 0:
-            gst_ledger = (
-                self.db.query(Ledger)
-                .filter(
-                    Ledger.client_id == inventory_item.client_id,
-                    Ledger.user_id == inventory_item.user_id,
-                    Ledger.name.ilike("GST Paid"),
-                )
-                .first()
+            gst_ledger_id = ledger_directory.resolve(
+                self.db,
+                client_id=inventory_item.client_id,
+                user_id=inventory_item.user_id,
+                name="GST Paid",
+                type="expense",
             )
-            if not gst_ledger:
-                gst_ledger = Ledger(
-                    name="GST Paid",
-                    type="expense",
-                    client_id=inventory_item.client_id,
-                    user_id=inventory_item.user_id,
-                    balance=Decimal("0.0"),
-                )
-                self.db.add(gst_ledger)
-                self.db.flush()
-            gst_ledger.balance += gst_amount
+            poster.post_to_ledger(gst_ledger_id, gst_amount)
 
         db_item = Inventory(
             client_id=inventory_item.client_id,
@@ -122,8 +96,8 @@ class InventoryService:
         db_transaction = Transaction(
             client_id=inventory_item.client_id,
             user_id=inventory_item.user_id,
-            ledger_id=ledger.id,
-            bank_account_id=bank_account.id,
+            ledger_id=ledger_id,
+            bank_account_id=inventory_item.bank_account_id,
             type="expense",
             amount=inventory_item.total_value,
             base_amount=amount_excl_gst, 
@@ -131,6 +105,19 @@ class InventoryService:
             description=f"Purchase of {inventory_item.quantity} {inventory_item.item_name}",
         )
         self.db.add(db_transaction)
+        DailyRollupService(self.db).record(
+            client_id=inventory_item.client_id,
+            user_id=inventory_item.user_id,
+            ledger_id=ledger_id,
+            tx_type="expense",
+            amount=inventory_item.total_value,
+            base_amount=amount_excl_gst,
+            gst_amount=gst_amount,
+        )
+
+        if not commit:
+            self.db.flush()
+            return db_item, db_transaction
 
         try:
             self.db.commit()
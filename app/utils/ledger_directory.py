@@ -0,0 +1,130 @@
+import threading
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ledger import Ledger
+
+LedgerKey = Tuple[UUID, UUID, str]
+
+_PENDING_KEY = "ledger_directory_pending"
+
+
+def normalize_ledger_name(name: str) -> str:
+    return name.strip().lower()
+
+
+class LedgerDirectory:
+    """
+    Process-local LRU cache of ledger ids keyed by (client_id, user_id, normalized name).
+
+    Misses are resolved with a single `INSERT ... ON CONFLICT (client_id, user_id, lower(name))`
+    upsert. Ids resolved inside a session are only published to the shared cache once that
+    session commits, so a rolled-back ledger insert is never cached.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[LedgerKey, UUID]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(client_id: UUID, user_id: UUID, name: str) -> LedgerKey:
+        return (UUID(str(client_id)), UUID(str(user_id)), normalize_ledger_name(name))
+
+    def get(self, key: LedgerKey) -> UUID | None:
+        with self._lock:
+            ledger_id = self._entries.get(key)
+            if ledger_id is not None:
+                self._entries.move_to_end(key)
+            return ledger_id
+
+    def put(self, key: LedgerKey, ledger_id: UUID) -> None:
+        with self._lock:
+            self._entries[key] = ledger_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, client_id: UUID, user_id: UUID, name: str) -> None:
+        """
+        Drops a single entry; call after a ledger is created, renamed or deleted.
+        """
+        with self._lock:
+            self._entries.pop(self.key(client_id, user_id, name), None)
+
+    def invalidate_ledger(self, ledger_id: UUID) -> None:
+        """
+        Drops every entry pointing at `ledger_id` (e.g. when the old name is unknown).
+        """
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v == ledger_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def resolve(
+        self,
+        db: Session,
+        *,
+        client_id: UUID,
+        user_id: UUID,
+        name: str,
+        type: str,
+        display_name: str | None = None,
+    ) -> UUID:
+        """
+        Returns the id of the tenant's ledger called `name` (case-insensitive),
+        creating it with `display_name` and `type` when missing.
+        """
+        key = self.key(client_id, user_id, name)
+        pending: Dict[LedgerKey, UUID] = db.info.setdefault(_PENDING_KEY, {})
+        ledger_id = pending.get(key) or self.get(key)
+        if ledger_id is not None:
+            return ledger_id
+
+        stmt = (
+            insert(Ledger)
+            .values(
+                id=uuid.uuid4(),
+                client_id=client_id,
+                user_id=user_id,
+                name=display_name or name,
+                type=type,
+                balance=Decimal("0.0"),
+            )
+            .on_conflict_do_update(
+                index_elements=[Ledger.client_id, Ledger.user_id, func.lower(Ledger.name)],
+                # No-op update so RETURNING yields the existing row's id
+                set_={"name": Ledger.__table__.c.name},
+            )
+            .returning(Ledger.id)
+        )
+        ledger_id = db.execute(stmt).scalar_one()
+        pending[key] = ledger_id
+        return ledger_id
+
+
+ledger_directory = LedgerDirectory(maxsize=settings.LEDGER_CACHE_SIZE)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_ledgers(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        for key, ledger_id in pending.items():
+            ledger_directory.put(key, ledger_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_ledgers(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,10 +1,14 @@
 
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Tuple
 from uuid import UUID
                           
 from app.models.ledger import Ledger
 from app.schemas import ledger as ledger_schema
+from app.utils.balance_reconciliation import LEDGER, record_opening
+from app.utils.ledger_directory import ledger_directory
 
 class LedgerService:
     """
@@ -18,8 +22,21 @@ class LedgerService:
         data = payload.model_dump()
         db_ledger = Ledger(**data)
         self.db.add(db_ledger)
-        self.db.commit()
+        try:
+            self.db.flush()
+            record_opening(
+                self.db, entity_type=LEDGER, entity_id=db_ledger.id,
+                client_id=db_ledger.client_id, user_id=db_ledger.user_id, amount=db_ledger.balance,
+            )
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "A ledger with this name already exists.", "code": "LEDGER_DUPLICATE"}
+            )
         self.db.refresh(db_ledger)
+        ledger_directory.invalidate(db_ledger.client_id, db_ledger.user_id, db_ledger.name)
         return db_ledger
 
     def page_by_group_user(self, client_id: UUID, user_id: UUID, page: int, size: int) -> Tuple[List[Ledger], int]:
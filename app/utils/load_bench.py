@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import httpx
+
+# Hot read endpoints that go through the DB runner; {client_id}/{user_id} are filled in
+DEFAULT_PATHS = [
+    "/accounts/{client_id}/{user_id}",
+    "/ledgers/{client_id}/{user_id}",
+    "/transactions/history?filter_type=this_month&client_id={client_id}&user_id={user_id}",
+    "/transactions/total_balance?period=this_month&client_id={client_id}&user_id={user_id}",
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(base_url: str, paths: List[str], *, clients: int, requests: int, timeout: float) -> Dict[str, Any]:
+    """
+    `clients` concurrent connections issue `requests` GETs in total, cycling
+    through `paths`. Returns throughput, latency percentiles and status counts.
+    """
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    issued = 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker() -> None:
+            nonlocal issued
+            while issued < requests:
+                path = paths[issued % len(paths)]
+                issued += 1
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    label = str(resp.status_code)
+                except httpx.HTTPError as exc:
+                    label = type(exc).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[label] = statuses.get(label, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    errors = sum(n for label, n in statuses.items() if not label.isdigit() or int(label) >= 500)
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 1),
+            "p50": round(_percentile(latencies, 50) * 1000, 1),
+            "p95": round(_percentile(latencies, 95) * 1000, 1),
+            "p99": round(_percentile(latencies, 99) * 1000, 1),
+        },
+        "errors": errors,
+        "statuses": statuses,
+    }
+
+
+async def sample_pool(base_url: str, stop: asyncio.Event, interval: float = 0.5) -> Dict[str, Any]:
+    """
+    Polls /health/db and pg_stat_activity until `stop` is set. Each uvicorn worker
+    has its own pools, so wait statistics are kept per worker pid and summed.
+    """
+    from sqlalchemy import text
+
+    from app.db.session import engine
+
+    def db_connections() -> int:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+            ).scalar_one()
+
+    workers: Dict[Any, Dict[str, Any]] = {}
+    peak = {"checked_out": 0, "overflow": 0, "db_connections": 0}
+    samples = 0
+    # No keep-alive, so successive samples can land on different workers
+    no_keepalive = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=5, limits=no_keepalive) as client:
+        while not stop.is_set():
+            try:
+                health = (await client.get("/health/db")).json()
+            except (httpx.HTTPError, ValueError):
+                health = None
+            if health:
+                samples += 1
+                for name, pool in health.get("pools", {}).items():
+                    if "checked_out" not in pool:
+                        continue
+                    peak["checked_out"] = max(peak["checked_out"], pool["checked_out"])
+                    peak["overflow"] = max(peak["overflow"], pool["overflow"])
+                    workers[(health.get("pid"), name)] = pool.get("wait", {})
+            peak["db_connections"] = max(peak["db_connections"], await asyncio.to_thread(db_connections))
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    waits = list(workers.values())
+    return {
+        "samples": samples,
+        "workers_seen": len({pid for pid, _ in workers}),
+        "max_checked_out": peak["checked_out"],
+        "max_overflow": peak["overflow"],
+        "max_wait_ms": max((w.get("max_wait_ms", 0.0) for w in waits), default=0.0),
+        "timeouts": sum(w.get("timeouts", 0) for w in waits),
+        "peak_db_connections": peak["db_connections"],
+    }
+
+
+async def run_load_with_pool_stats(base_url: str, paths: List[str], **load_args) -> Dict[str, Any]:
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_pool(base_url, stop))
+    try:
+        result = await run_load(base_url, paths, **load_args)
+    finally:
+        stop.set()
+    result["pool"] = await sampler
+    return result
+
+
+def seed_tenant(transactions: int = 50) -> Dict[str, str]:
+    """
+    Creates a throwaway tenant (settings, one account, `transactions` transactions)
+    so the benchmarked endpoints return real rows.
+    """
+    import app.db.base  # noqa: F401  (maps every model)
+    from app.db.session import SessionLocal
+    from app.models.financial_settings import FinancialSettings
+    from app.models.transaction_limit import TransactionLimitOverride
+    from app.schemas.bank_account import BankAccountCreate
+    from app.schemas.transaction import TransactionAutoCreate
+    from app.utils.bank_accounts import BankAccountService
+    from app.utils.transaction_service import TransactionService
+
+    client_id, user_id = uuid.uuid4(), uuid.uuid4()
+    with SessionLocal() as db:
+        db.add(FinancialSettings(
+            client_id=client_id, user_id=user_id, financial_year_start=date(date.today().year, 4, 1),
+            gst_enabled=True, gst_rate=Decimal("18"),
+        ))
+        db.add(TransactionLimitOverride(client_id=client_id, user_id=user_id, max_per_day=transactions))
+        db.commit()
+        account = BankAccountService(db).create_account(
+            BankAccountCreate(client_id=client_id, user_id=user_id, account_name="Bench", balance=10_000_000),
+            preverified=True,
+        )
+        items = [
+            TransactionAutoCreate(
+                client_id=client_id, user_id=user_id, bank_account_id=account.id,
+                type="expense" if i % 3 else "income", amount=100 + i, include_gst=bool(i % 2),
+                description=f"bench {i}",
+            )
+            for i in range(transactions)
+        ]
+        TransactionService(db).create_bulk(items)
+    return {"client_id": str(client_id), "user_id": str(user_id)}
+
+
+def drop_tenant(client_id: str, user_id: str) -> None:
+    from sqlalchemy import text
+
+    from app.db.session import engine
+
+    tables = [
+        "transactions", "daily_rollups", "balance_snapshots", "balance_openings", "ledgers",
+        "bank_accounts", "daily_transaction_counters", "transaction_limit_overrides", "financial_settings",
+    ]
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(
+                text(f"DELETE FROM {table} WHERE client_id = :client_id AND user_id = :user_id"),
+                {"client_id": client_id, "user_id": user_id},
+            )
+
+
+def _wait_until_up(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not come up")
+
+
+def serve_and_load(env: Dict[str, str], args, paths: List[str], *, pool_stats: bool = False) -> Dict[str, Any]:
+    """
+    Starts the app under uvicorn with `env` overrides, warms it up, runs the load
+    against it (sampling pool statistics when `pool_stats`) and stops it.
+    """
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, env={**os.environ, **env})
+    try:
+        _wait_until_up(base_url)
+        asyncio.run(run_load(base_url, paths, clients=min(args.clients, 20), requests=200, timeout=args.timeout))
+        load = run_load_with_pool_stats if pool_stats else run_load
+        return asyncio.run(load(base_url, paths, clients=args.clients, requests=args.requests, timeout=args.timeout))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            # Graceful shutdown waits for in-flight requests; don't leave a wedged server behind
+            server.kill()
+            server.wait()
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API's hot read endpoints.")
+    parser.add_argument(
+        "command", choices=["run", "compare", "pool"],
+        help=(
+            "run: against --url; compare: start the app with the sync and then the async DB layer; "
+            "pool: start the app and report connection pool statistics under load"
+        ),
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", default=None, help="repeatable; default: DEFAULT_PATHS")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--client-id", default=None)
+    parser.add_argument("--user-id", default=None)
+    parser.add_argument("--port", type=int, default=8765, help="compare: port for the spawned server")
+    parser.add_argument("--workers", type=int, default=1, help="compare/pool: uvicorn worker processes")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="KEY=VALUE",
+        help="compare/pool: repeatable setting override for the spawned server, e.g. DB_POOL_SIZE=10",
+    )
+    args = parser.parse_args()
+    overrides = dict(item.split("=", 1) for item in args.env)
+
+    seeded = None
+    if args.client_id and args.user_id:
+        tenant = {"client_id": args.client_id, "user_id": args.user_id}
+    else:
+        tenant = seeded = seed_tenant()
+    paths = [p.format(**tenant) for p in (args.path or DEFAULT_PATHS)]
+
+    try:
+        if args.command == "run":
+            result: Dict[str, Any] = asyncio.run(
+                run_load(args.url, paths, clients=args.clients, requests=args.requests, timeout=args.timeout)
+            )
+        elif args.command == "compare":
+            result = {
+                mode: serve_and_load({**overrides, "DB_ASYNC_ENABLED": flag}, args, paths)
+                for mode, flag in (("sync", "false"), ("async", "true"))
+            }
+        else:
+            result = serve_and_load(overrides, args, paths, pool_stats=True)
+            result["ok"] = result["errors"] == 0 and result["pool"]["timeouts"] == 0
+    finally:
+        if seeded:
+            drop_tenant(**seeded)
+    print(json.dumps(result, indent=2))
+    if args.command == "pool":
+        sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    _main()
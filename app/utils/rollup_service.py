@@ -0,0 +1,198 @@
+import argparse
+import logging
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.daily_rollup import DailyRollup
+from app.models.transaction import Transaction
+from app.utils.transaction_filter import get_tenant_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DailyRollupService:
+    """
+    Maintains the `daily_rollups` table: one row per (tenant, local day, ledger, type)
+    holding count and amount/base/GST sums of live transactions. Period summaries
+    then read at most one row per day per ledger instead of scanning transactions.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(
+        self,
+        *,
+        client_id: UUID,
+        user_id: UUID,
+        ledger_id: UUID,
+        tx_type: str,
+        amount: Decimal,
+        base_amount: Decimal | None = None,
+        gst_amount: Decimal | None = None,
+        created_at: datetime | None = None,
+        count: int = 1,
+    ) -> None:
+        """
+        Adds (count > 0) or removes (count < 0) transactions to the rollup of their day.
+        Without `created_at` the day is taken from the DB transaction's now(), which is
+        the value the new rows' created_at default resolves to.
+        Removals only update an existing row that holds enough transactions; a missing
+        one (history that was never rolled up) is logged rather than stored negative.
+        """
+        tz = get_tenant_timezone(self.db, user_id, client_id)
+        if created_at is None:
+            day = func.date(func.timezone(tz.key, func.now()))
+        else:
+            day = created_at.astimezone(tz).date()
+
+        amount = Decimal(str(amount))
+        gst = Decimal(str(gst_amount)) if gst_amount is not None else Decimal("0.00")
+        base = Decimal(str(base_amount)) if base_amount is not None else amount - gst
+
+        if count < 0:
+            removed = self.db.execute(
+                update(DailyRollup)
+                .where(
+                    DailyRollup.client_id == client_id,
+                    DailyRollup.user_id == user_id,
+                    DailyRollup.day == day,
+                    DailyRollup.ledger_id == ledger_id,
+                    DailyRollup.type == tx_type,
+                    DailyRollup.tx_count >= -count,
+                )
+                .values(
+                    tx_count=DailyRollup.tx_count + count,
+                    amount=DailyRollup.amount - amount,
+                    base_amount=DailyRollup.base_amount - base,
+                    gst_amount=DailyRollup.gst_amount - gst,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if not removed.rowcount:
+                logger.warning(
+                    f"No daily rollup to remove {-count} {tx_type} transaction(s) from for ledger {ledger_id}; "
+                    f"rebuild the rollups for client {client_id}, user {user_id}"
+                )
+            return
+
+        stmt = insert(DailyRollup).values(
+            client_id=client_id,
+            user_id=user_id,
+            day=day,
+            ledger_id=ledger_id,
+            type=tx_type,
+            tx_count=count,
+            amount=amount,
+            base_amount=base,
+            gst_amount=gst,
+        )
+        table = DailyRollup.__table__
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.client_id, table.c.user_id, table.c.day, table.c.ledger_id, table.c.type],
+            set_={
+                "tx_count": table.c.tx_count + stmt.excluded.tx_count,
+                "amount": table.c.amount + stmt.excluded.amount,
+                "base_amount": table.c.base_amount + stmt.excluded.base_amount,
+                "gst_amount": table.c.gst_amount + stmt.excluded.gst_amount,
+            },
+        )
+        self.db.execute(stmt)
+
+    def record_transaction(self, tx: Transaction, *, count: int = 1) -> None:
+        """
+        Adds (count=1) or removes (count=-1) an existing transaction row.
+        """
+        self.record(
+            client_id=tx.client_id,
+            user_id=tx.user_id,
+            ledger_id=tx.ledger_id,
+            tx_type=tx.type,
+            amount=tx.amount,
+            base_amount=tx.base_amount,
+            gst_amount=tx.gst_amount,
+            created_at=tx.created_at,
+            count=count,
+        )
+
+    def rebuild(self, *, client_id: UUID | None = None, user_id: UUID | None = None) -> int:
+        """
+        Recomputes rollups from `transactions` (all tenants, one client, or one user)
+        with one INSERT ... SELECT per tenant. Returns the number of tenants rebuilt.
+        """
+        scope = []
+        if client_id is not None:
+            scope.append(DailyRollup.client_id == client_id)
+        if user_id is not None:
+            scope.append(DailyRollup.user_id == user_id)
+        self.db.execute(delete(DailyRollup).where(*scope))
+
+        tenants_query = self.db.query(Transaction.client_id, Transaction.user_id).distinct()
+        if client_id is not None:
+            tenants_query = tenants_query.filter(Transaction.client_id == client_id)
+        if user_id is not None:
+            tenants_query = tenants_query.filter(Transaction.user_id == user_id)
+        tenants = tenants_query.all()
+
+        for tenant_client_id, tenant_user_id in tenants:
+            tz = get_tenant_timezone(self.db, tenant_user_id, tenant_client_id)
+            local_day = func.date(func.timezone(tz.key, Transaction.created_at))
+            gst = func.coalesce(Transaction.gst_amount, 0)
+            source = (
+                select(
+                    Transaction.client_id,
+                    Transaction.user_id,
+                    local_day,
+                    Transaction.ledger_id,
+                    Transaction.type,
+                    func.count(Transaction.id),
+                    func.sum(Transaction.amount),
+                    func.sum(func.coalesce(Transaction.base_amount, Transaction.amount - gst)),
+                    func.sum(gst),
+                )
+                .where(
+                    Transaction.client_id == tenant_client_id,
+                    Transaction.user_id == tenant_user_id,
+                    Transaction.is_deleted == False,
+                )
+                .group_by(
+                    Transaction.client_id, Transaction.user_id, local_day, Transaction.ledger_id, Transaction.type
+                )
+            )
+            self.db.execute(
+                insert(DailyRollup).from_select(
+                    ["client_id", "user_id", "day", "ledger_id", "type",
+                     "tx_count", "amount", "base_amount", "gst_amount"],
+                    source,
+                )
+            )
+
+        self.db.commit()
+        return len(tenants)
+
+
+def _main() -> None:
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily_rollups table from transactions.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--client-id", type=UUID, default=None)
+    parser.add_argument("--user-id", type=UUID, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuilt = DailyRollupService(db).rebuild(client_id=args.client_id, user_id=args.user_id)
+        logger.info("Rebuilt daily rollups for %s tenant(s).", rebuilt)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    _main()
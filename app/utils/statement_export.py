@@ -0,0 +1,158 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from typing import Iterable, Iterator, Tuple
+from uuid import UUID
+
+import xlsxwriter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.bank_account import BankAccount
+from app.models.ledger import Ledger
+from app.models.transaction import Transaction
+from app.utils.transaction_filter import TransactionFilterService, get_tenant_timezone
+
+EXPORT_HEADER = ("Date", "Description", "Type", "Amount", "Base Amount", "GST Amount", "Ledger", "Bank Account")
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _text(value: str | None) -> str:
+    if not value:
+        return ""
+    return f"'{value}" if value.startswith(_FORMULA_PREFIXES) else value
+
+
+def export_range(
+    db: Session, *, filter_type: str, user_id: UUID, client_id: UUID, start_date: date = None, end_date: date = None
+):
+    """
+    Returns (start, end, query) for the export: statement columns plus ledger and
+    bank account names, fetched in the same query via joins (no lazy loads per row).
+    """
+    start, end, query = TransactionFilterService._history_query(
+        db, filter_type, user_id, client_id, start_date, end_date
+    )
+    query = (
+        query.join(Ledger, Transaction.ledger_id == Ledger.id)
+        .outerjoin(BankAccount, Transaction.bank_account_id == BankAccount.id)
+        .with_entities(
+            Transaction.created_at,
+            Transaction.description,
+            Transaction.type,
+            Transaction.amount,
+            Transaction.base_amount,
+            Transaction.gst_amount,
+            Ledger.name,
+            BankAccount.account_name,
+        )
+    )
+    return start, end, query
+
+
+def iter_export_rows(
+    db: Session, *, filter_type: str, user_id: UUID, client_id: UUID, start_date: date = None, end_date: date = None
+) -> Iterator[Tuple]:
+    """
+    Yields export rows from a server-side cursor in batches of HISTORY_STREAM_BATCH_SIZE,
+    with timestamps converted to the tenant's timezone.
+    """
+    tz = get_tenant_timezone(db, user_id, client_id)
+    _, _, query = export_range(
+        db, filter_type=filter_type, user_id=user_id, client_id=client_id, start_date=start_date, end_date=end_date
+    )
+    for created_at, description, tx_type, amount, base_amount, gst_amount, ledger, bank_account in query.yield_per(
+        settings.HISTORY_STREAM_BATCH_SIZE
+    ):
+        yield (
+            created_at.astimezone(tz).replace(tzinfo=None),
+            description,
+            tx_type,
+            amount,
+            base_amount,
+            gst_amount,
+            ledger,
+            bank_account,
+        )
+
+
+def iter_csv(rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """
+    Encodes rows as CSV (with a UTF-8 BOM so Excel detects the encoding), yielding
+    chunks of roughly 64 KiB.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_HEADER)
+    for created_at, description, tx_type, amount, base_amount, gst_amount, ledger, bank_account in rows:
+        writer.writerow((
+            created_at.isoformat(sep=" ", timespec="seconds"),
+            _text(description),
+            tx_type,
+            amount,
+            "" if base_amount is None else base_amount,
+            "" if gst_amount is None else gst_amount,
+            _text(ledger),
+            _text(bank_account),
+        ))
+        if buffer.tell() >= _CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(rows: Iterable[Tuple]) -> Iterator[bytes]:
+    """
+    Writes rows to an XLSX workbook and yields the file in chunks.
+
+    XlsxWriter's constant_memory mode flushes each row to disk as it is written,
+    so memory stays flat; the zip container can only be assembled once every row
+    is in, so the first byte is sent after the last row is read.
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": os.path.dirname(path)})
+        sheet = workbook.add_worksheet("Statement")
+        bold = workbook.add_format({"bold": True})
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        money = workbook.add_format({"num_format": "#,##0.00"})
+        sheet.set_column(0, 0, 20)
+        sheet.set_column(1, 1, 40)
+        sheet.set_column(6, 7, 24)
+
+        sheet.write_row(0, 0, EXPORT_HEADER, bold)
+        for row_number, row in enumerate(rows, start=1):
+            created_at, description, tx_type, amount, base_amount, gst_amount, ledger, bank_account = row
+            sheet.write_datetime(row_number, 0, created_at, date_format)
+            sheet.write_string(row_number, 1, description or "")
+            sheet.write_string(row_number, 2, tx_type)
+            for column, value in ((3, amount), (4, base_amount), (5, gst_amount)):
+                if value is not None:
+                    sheet.write_number(row_number, column, float(value), money)
+            sheet.write_string(row_number, 6, ledger or "")
+            sheet.write_string(row_number, 7, bank_account or "")
+        workbook.close()
+
+        with open(path, "rb") as f:
+            while chunk := f.read(_CHUNK_SIZE):
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
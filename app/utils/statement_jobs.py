@@ -0,0 +1,266 @@
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.schemas.statement import StatementJobCreate
+from app.utils.statement_generator import TEMPLATE_DIGEST, StatementGenerator, write_statement_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class StatementCache:
+    """
+    Rendered statement PDFs on disk, named by a hash of (tenant, range, transaction
+    fingerprint, template). A sidecar JSON file records the owning tenant and a
+    `.job.json` marker next to it the state of an unfinished render, so every
+    worker process sees the same job state. The directory is created on first write.
+    The oldest files are pruned beyond STATEMENT_CACHE_MAX_FILES.
+    """
+
+    def __init__(self, directory: str, *, max_files: int, job_timeout: float):
+        self.directory = directory
+        self.max_files = max_files
+        self.job_timeout = job_timeout
+        self._directory_ready = False
+
+    def _ensure_directory(self) -> None:
+        if not self._directory_ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_ready = True
+
+    @staticmethod
+    def key(*, client_id, user_id, start, end, count: int, fingerprint: str | None) -> str:
+        raw = f"{client_id}|{user_id}|{start}|{end}|{count}|{fingerprint}|{TEMPLATE_DIGEST}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def pdf_path(self, key: str) -> str:
+        # Callers render into this path
+        self._ensure_directory()
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _job_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.job.json")
+
+    def get(self, key: str) -> str | None:
+        path = os.path.join(self.directory, f"{key}.pdf")
+        return path if os.path.exists(path) else None
+
+    def owner(self, key: str) -> Dict[str, str] | None:
+        try:
+            with open(self._meta_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_owner(self, key: str, *, client_id, user_id) -> None:
+        self._ensure_directory()
+        with open(self._meta_path(key), "w") as f:
+            json.dump({"client_id": str(client_id), "user_id": str(user_id)}, f)
+
+    def job(self, key: str) -> Dict[str, Any] | None:
+        """
+        The job marker ({"status": "pending" | "failed", "error": ...}), or None when
+        there is none or a pending marker is older than `job_timeout`.
+        """
+        path = self._job_path(key)
+        try:
+            with open(path) as f:
+                job = json.load(f)
+            age = time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        if job.get("status") == "pending" and age > self.job_timeout:
+            return None
+        return job
+
+    @contextlib.contextmanager
+    def _claim_lock(self):
+        # flock on a shared file: serializes claims across threads and worker processes
+        with open(os.path.join(self.directory, ".jobs.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def claim_job(self, key: str) -> bool:
+        """
+        Writes a pending marker unless a live pending one exists (a failed or
+        abandoned job is retried). Returns whether the caller owns the job and must
+        render it. The check and the write happen under one lock, so exactly one
+        claimant wins.
+        """
+        self._ensure_directory()
+        with self._claim_lock():
+            job = self.job(key)
+            if job is not None and job["status"] == "pending":
+                return False
+            self.write_job(key, "pending")
+            return True
+
+    def write_job(self, key: str, status: str, error: str | None = None) -> None:
+        self._ensure_directory()
+        path = self._job_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"status": status, "error": error}, f)
+        os.replace(tmp, path)
+
+    def clear_job(self, key: str) -> None:
+        try:
+            os.remove(self._job_path(key))
+        except OSError:
+            pass
+
+    def prune(self) -> None:
+        """
+        Removes the oldest PDFs (with their sidecars) beyond `max_files`, and sidecars
+        left without a PDF (failed or abandoned jobs) once they are older than
+        `job_timeout`.
+        """
+        try:
+            entries = list(os.scandir(self.directory))
+            pdfs = sorted((e for e in entries if e.name.endswith(".pdf")), key=lambda e: e.stat().st_mtime)
+            evicted = pdfs[: max(len(pdfs) - self.max_files, 0)]
+            kept = {e.name[: -len(".pdf")] for e in pdfs[len(evicted):]}
+            stale = []
+            for entry in evicted:
+                key = entry.name[: -len(".pdf")]
+                stale += [entry.path, self._meta_path(key), self._job_path(key)]
+
+            cutoff = time.time() - self.job_timeout
+            for entry in entries:
+                if not entry.name.endswith((".json", ".tmp")) or entry.name.split(".", 1)[0] in kept:
+                    continue
+                if entry.stat().st_mtime < cutoff:
+                    stale.append(entry.path)
+        except OSError:
+            logger.exception("Failed to prune the statement cache")
+            return
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def prepare_statement(
+    db: Session,
+    request: StatementJobCreate,
+    cache: StatementCache,
+    *,
+    is_pending: Callable[[str], bool] = lambda key: False,
+):
+    """
+    Returns None when the range has no transactions, else (key, data) where `data`
+    is the statement to render, or None when the PDF is already cached (or a job
+    for it is pending). Both reads share one REPEATABLE READ snapshot, so the
+    key always matches the rows that are rendered.
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    generator = StatementGenerator(db)
+    params = dict(
+        filter_type=request.filter_type,
+        user_id=request.user_id,
+        client_id=request.client_id,
+        start_date=request.start_date,
+        end_date=request.end_date,
+    )
+    start, end, count, fingerprint = generator.statement_fingerprint(**params)
+    if not count:
+        return None
+    key = cache.key(
+        client_id=request.client_id, user_id=request.user_id,
+        start=start, end=end, count=count, fingerprint=fingerprint,
+    )
+    if cache.get(key) or is_pending(key):
+        return key, None
+    return key, generator.load_statement_data(**params)
+
+
+class StatementJobQueue:
+    """
+    Renders statements in a process pool (spawned lazily) and tracks job state.
+
+    Job ids are cache keys, so identical requests share one job and a finished
+    job is served from disk by any worker process. Pending/failed state lives in
+    the cache's job markers, so a poll answered by another process sees it too.
+    """
+
+    def __init__(self, cache: StatementCache, *, workers: int):
+        self.cache = cache
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: never fork the threaded server process
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def status(self, key: str) -> Tuple[str, str | None]:
+        """
+        ("ready" | "pending" | "failed" | "unknown", error message).
+        """
+        if self.cache.get(key):
+            return "ready", None
+        job = self.cache.job(key)
+        if job is None:
+            return "unknown", None
+        return job["status"], job.get("error")
+
+    def is_pending(self, key: str) -> bool:
+        job = self.cache.job(key)
+        return job is not None and job["status"] == "pending"
+
+    async def submit(self, key: str, data: Dict[str, Any], *, client_id, user_id) -> None:
+        if not self.cache.claim_job(key):
+            return
+
+        self.cache.write_owner(key, client_id=client_id, user_id=user_id)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor(), write_statement_pdf, data, self.cache.pdf_path(key))
+        future.add_done_callback(lambda f: self._finish(key, f))
+
+    def _finish(self, key: str, future: "asyncio.Future") -> None:
+        error = None
+        try:
+            if not future.result():
+                error = "PDF rendering failed."
+        except Exception as e:
+            logger.exception("Statement job %s failed", key)
+            error = str(e)
+        if error is None:
+            # Served from disk from now on
+            self.cache.clear_job(key)
+            self.cache.prune()
+        else:
+            self.cache.write_job(key, "failed", error)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+statement_cache = StatementCache(
+    settings.STATEMENT_CACHE_DIR,
+    max_files=settings.STATEMENT_CACHE_MAX_FILES,
+    job_timeout=settings.STATEMENT_JOB_TIMEOUT_SECONDS,
+)
+statement_jobs = StatementJobQueue(statement_cache, workers=settings.STATEMENT_WORKERS)
@@ -1,12 +1,67 @@
-from datetime import date, datetime, timedelta
+import base64
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Iterator
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
+from app.core.config import settings as app_settings
+from app.models.daily_rollup import DailyRollup
 from app.models.transaction import Transaction
 from app.models.ledger import Ledger
+from app.utils.financial_settings import FinancialSettingsService
 from enum import Enum
 import uuid
 
 
+def get_tenant_timezone(db: Session, user_id: uuid.UUID, client_id: uuid.UUID) -> tzinfo:
+    """
+    Timezone from the tenant's financial settings (falls back to DEFAULT_TIMEZONE).
+    """
+    settings = FinancialSettingsService(db).get_active_settings(user_id=str(user_id), client_id=str(client_id))
+    name = (settings.timezone if settings else None) or app_settings.DEFAULT_TIMEZONE
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(app_settings.DEFAULT_TIMEZONE)
+
+
+def get_financial_year_start(db: Session, user_id: uuid.UUID, client_id: uuid.UUID) -> date | None:
+    """
+    `financial_year_start` from the tenant's financial settings, or None.
+    """
+    settings = FinancialSettingsService(db).get_active_settings(user_id=str(user_id), client_id=str(client_id))
+    return settings.financial_year_start if settings else None
+
+
+def financial_year_bounds(fy_start: date | None, today: date, years_back: int = 0) -> tuple[date, date]:
+    """
+    Inclusive (start, end) of the financial year containing `today`, shifted back
+    `years_back` years. Only the month/day of `fy_start` matter; without settings
+    the Indian financial year (1 April) is used.
+    """
+    month, day = (fy_start.month, fy_start.day) if fy_start else (4, 1)
+
+    def start_in(year: int) -> date:
+        # A 29 February start falls back to the 28th in common years
+        return date(year, month, min(day, 28) if (month, day) == (2, 29) else day)
+
+    year = today.year if today >= start_in(today.year) else today.year - 1
+    year -= years_back
+    return start_in(year), start_in(year + 1) - timedelta(days=1)
+
+
+def day_range_bounds(start: date, end: date, tz: tzinfo) -> tuple[datetime, datetime]:
+    """
+    Converts an inclusive local date range into a half-open [start, end) timestamp
+    range, so `created_at` is compared directly and its index stays usable.
+    """
+    return (
+        datetime.combine(start, time.min, tzinfo=tz),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
 class TransactionFilterService:
     """
     Service for date range computation and transaction/ledger summarization.
@@ -14,8 +69,10 @@ class TransactionFilterService:
     """
 
     @staticmethod
-    def get_date_range(filter_type: str, start_date: date = None, end_date: date = None):
-        today = date.today()
+    def get_date_range(
+        filter_type: str, start_date: date = None, end_date: date = None, tz: tzinfo = None, fy_start: date = None
+    ):
+        today = datetime.now(tz).date() if tz else date.today()
         if filter_type == "today":
             return today, today
         elif filter_type == "yesterday":
@@ -36,12 +93,16 @@ class TransactionFilterService:
             else:
                 end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
             return start, end
+        elif filter_type == "this_financial_year":
+            return financial_year_bounds(fy_start, today)
+        elif filter_type == "last_financial_year":
+            return financial_year_bounds(fy_start, today, years_back=1)
         elif filter_type == "custom" and start_date and end_date:
             return start_date, end_date
         raise ValueError("Invalid filter type or missing dates for custom filter")
 
     @staticmethod
-    def filter_transactions(
+    def _history_query(
         db: Session,
         filter_type: str,
         user_id: uuid.UUID,
@@ -49,18 +110,56 @@ class TransactionFilterService:
         start_date: date = None,
         end_date: date = None,
     ):
-        start, end = TransactionFilterService.get_date_range(filter_type, start_date, end_date)
-        txs = (
+        """
+        Returns (start, end, query) for the tenant's live transactions in the local
+        date range, ordered by (created_at, id).
+        """
+        tz = get_tenant_timezone(db, user_id, client_id)
+        fy_start = get_financial_year_start(db, user_id, client_id) if filter_type.endswith("_financial_year") else None
+        start, end = TransactionFilterService.get_date_range(filter_type, start_date, end_date, tz, fy_start)
+        range_start, range_end = day_range_bounds(start, end, tz)
+        query = (
             db.query(Transaction)
             .filter(
-                func.date(Transaction.created_at) >= start,
-                func.date(Transaction.created_at) <= end,
-                Transaction.is_deleted == False,
-                Transaction.user_id == user_id,
                 Transaction.client_id == client_id,
+                Transaction.user_id == user_id,
+                Transaction.is_deleted == False,
+                Transaction.created_at >= range_start,
+                Transaction.created_at < range_end,
             )
-            .all()
+            .order_by(Transaction.created_at.asc(), Transaction.id.asc())
         )
+        return start, end, query
+
+    @staticmethod
+    def encode_cursor(tx: Transaction) -> str:
+        raw = f"{tx.created_at.isoformat()}|{tx.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+        try:
+            created_at, tx_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+            return datetime.fromisoformat(created_at), uuid.UUID(tx_id)
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "Invalid pagination cursor.", "code": "INVALID_CURSOR"},
+            )
+
+    @staticmethod
+    def filter_transactions(
+        db: Session,
+        filter_type: str,
+        user_id: uuid.UUID,
+        client_id: uuid.UUID,
+        start_date: date = None,
+        end_date: date = None,
+    ):
+        start, end, query = TransactionFilterService._history_query(
+            db, filter_type, user_id, client_id, start_date, end_date
+        )
+        txs = query.all()
         if not txs:
             return None
         return {
@@ -70,6 +169,62 @@ class TransactionFilterService:
             "transactions": txs,
         }
 
+    @staticmethod
+    def page_transactions(
+        db: Session,
+        filter_type: str,
+        user_id: uuid.UUID,
+        client_id: uuid.UUID,
+        start_date: date = None,
+        end_date: date = None,
+        cursor: str | None = None,
+        page_size: int | None = None,
+    ):
+        """
+        Keyset-paginated history: returns one page after `cursor` plus the cursor
+        of the next page (None on the last page).
+        """
+        page_size = page_size or app_settings.HISTORY_DEFAULT_PAGE_SIZE
+        start, end, query = TransactionFilterService._history_query(
+            db, filter_type, user_id, client_id, start_date, end_date
+        )
+        if cursor:
+            after_created_at, after_id = TransactionFilterService.decode_cursor(cursor)
+            query = query.filter(
+                tuple_(Transaction.created_at, Transaction.id) > tuple_(after_created_at, after_id)
+            )
+        rows = query.limit(page_size + 1).all()
+        if not rows:
+            return None
+        has_more = len(rows) > page_size
+        txs = rows[:page_size]
+        return {
+            "filter": filter_type,
+            "start_date": start,
+            "end_date": end,
+            "transactions": txs,
+            "page_size": page_size,
+            "next_cursor": TransactionFilterService.encode_cursor(txs[-1]) if has_more else None,
+        }
+
+    @staticmethod
+    def iter_transactions(
+        db: Session,
+        filter_type: str,
+        user_id: uuid.UUID,
+        client_id: uuid.UUID,
+        start_date: date = None,
+        end_date: date = None,
+    ) -> Iterator[Transaction]:
+        """
+        Yields the whole history from a server-side cursor in batches of
+        HISTORY_STREAM_BATCH_SIZE, so memory stays flat regardless of range size.
+        """
+        _, _, query = TransactionFilterService._history_query(
+            db, filter_type, user_id, client_id, start_date, end_date
+        )
+        yield from query.yield_per(app_settings.HISTORY_STREAM_BATCH_SIZE)
+
 
 class PeriodEnum(str, Enum):
     this_week = "this_week"
@@ -80,8 +235,8 @@ class PeriodEnum(str, Enum):
 
 class LedgerSummaryService:
     @staticmethod
-    def get_date_range_period(period: 'PeriodEnum'):
-        today = datetime.today()
+    def get_date_range_period(period: 'PeriodEnum', tz: tzinfo = None):
+        today = datetime.now(tz).date() if tz else date.today()
         if period == PeriodEnum.this_week:
             start_date = today - timedelta(days=today.weekday())
             end_date = today
@@ -102,19 +257,41 @@ class LedgerSummaryService:
         return start_date, end_date
 
     @staticmethod
-    def calculate_ledger_summary(db: Session, period: 'PeriodEnum', user_id: uuid.UUID, client_id: uuid.UUID):
-        start_date, end_date = LedgerSummaryService.get_date_range_period(period)
-        transactions = (
-            db.query(Transaction)
-            .filter(
-                Transaction.created_at >= start_date,
-                Transaction.created_at <= end_date,
-                Transaction.user_id == user_id,
-                Transaction.client_id == client_id,
-            )
+    def calculate_ledger_summary(
+        db: Session,
+        period: 'PeriodEnum',
+        user_id: uuid.UUID,
+        client_id: uuid.UUID,
+        breakdown: str | None = None,
+    ):
+        """
+        Period totals per transaction type, summed from the `daily_rollups` table
+        (at most one row per local day, ledger and type).
+        `breakdown` adds per-ledger ("ledger") or per-local-day ("day") totals.
+        """
+        tz = get_tenant_timezone(db, user_id, client_id)
+        start_date, end_date = LedgerSummaryService.get_date_range_period(period, tz)
+        in_period = (
+            DailyRollup.client_id == client_id,
+            DailyRollup.user_id == user_id,
+            DailyRollup.day >= start_date,
+            DailyRollup.day <= end_date,
+        )
+        totals = (
+            func.coalesce(func.sum(DailyRollup.tx_count), 0),
+            func.coalesce(func.sum(DailyRollup.amount), 0),
+            func.coalesce(func.sum(DailyRollup.base_amount), 0),
+            func.coalesce(func.sum(DailyRollup.gst_amount), 0),
+        )
+        live = func.sum(DailyRollup.tx_count) > 0
+        rows = (
+            db.query(DailyRollup.type, *totals)
+            .filter(*in_period)
+            .group_by(DailyRollup.type)
+            .having(live)
             .all()
         )
-        if not transactions:
+        if not rows:
             return None
         summary = {
             "income": 0,
@@ -123,22 +300,169 @@ class LedgerSummaryService:
             "loan_receivable": 0,
             "total": 0,
         }
-        for txn in transactions:
-            if txn.type == "income":
-                summary["income"] += txn.amount
-            elif txn.type == "expense":
-                summary["expense"] += txn.amount
-            elif txn.type == "loan_payable":
-                summary["loan_payable"] += txn.amount
-            elif txn.type == "loan_receivable":
-                summary["loan_receivable"] += txn.amount
+        splits = {}
+        for tx_type, count, amount, base_amount, gst_amount in rows:
+            if tx_type in summary and tx_type != "total":
+                summary[tx_type] = amount
+            splits[tx_type] = {
+                "count": count,
+                "amount": amount,
+                "base_amount": base_amount,
+                "gst_amount": gst_amount,
+            }
         summary["total"] = (
             summary["income"] - summary["expense"] + summary["loan_receivable"] - summary["loan_payable"]
         )
-        return {
+        result = {
             "period": period.value,
-            "start_date": start_date.date(),
-            "end_date": end_date.date(),
+            "start_date": start_date,
+            "end_date": end_date,
             "summary": summary,
+            "splits": splits,
         }
+        if breakdown == "ledger":
+            result["by_ledger"] = [
+                {
+                    "ledger_id": ledger_id,
+                    "ledger_name": name,
+                    "type": tx_type,
+                    "count": count,
+                    "amount": amount,
+                    "base_amount": base_amount,
+                    "gst_amount": gst_amount,
+                }
+                for ledger_id, name, tx_type, count, amount, base_amount, gst_amount in (
+                    db.query(DailyRollup.ledger_id, Ledger.name, DailyRollup.type, *totals)
+                    .join(Ledger, Ledger.id == DailyRollup.ledger_id)
+                    .filter(*in_period)
+                    .group_by(DailyRollup.ledger_id, Ledger.name, DailyRollup.type)
+                    .having(live)
+                    .order_by(Ledger.name)
+                    .all()
+                )
+            ]
+        elif breakdown == "day":
+            result["by_day"] = [
+                {"day": day, "type": tx_type, "count": count, "amount": amount}
+                for day, tx_type, count, amount in (
+                    db.query(DailyRollup.day, DailyRollup.type, totals[0], totals[1])
+                    .filter(*in_period)
+                    .group_by(DailyRollup.day, DailyRollup.type)
+                    .having(live)
+                    .order_by(DailyRollup.day)
+                    .all()
+                )
+            ]
+        return result
+
+
+HISTORY_INDEX = "ix_transactions_client_user_created_live"
+
+
+def _plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _explain_history(rows: int, tenants: int, days: int) -> dict:
+    """
+    Seeds `rows` live transactions spread over `tenants` tenants and the last
+    `days` days, then EXPLAIN ANALYZEs one tenant's history queries (a month range
+    and its first keyset page) and checks both read transactions through
+    HISTORY_INDEX, never a sequential scan. Everything runs in one database
+    transaction that is rolled back, so nothing is left behind.
+    """
+    import hashlib
+    import time as _time
+
+    from sqlalchemy import text
+    from sqlalchemy.dialects import postgresql
+
+    import app.db.base  # noqa: F401  (maps every model)
+    from app.db.session import engine
+
+    # Tenant n is md5('c' || n) / md5('u' || n); tenant 0 is the one queried
+    client_id = uuid.UUID(hashlib.md5(b"c0").hexdigest())
+    user_id = uuid.UUID(hashlib.md5(b"u0").hexdigest())
+    ledger_id = uuid.uuid4()
+    report = {"rows": rows, "tenants": tenants, "days": days, "queries": {}}
+    with engine.connect() as conn:
+        outer = conn.begin()
+        try:
+            started = _time.perf_counter()
+            conn.execute(
+                text(
+                    "INSERT INTO ledgers (id, client_id, user_id, name, type, balance) "
+                    "VALUES (:id, :client_id, :user_id, 'explain-seed', 'expense', 0)"
+                ),
+                {"id": ledger_id, "client_id": client_id, "user_id": user_id},
+            )
+            conn.execute(
+                text(
+                    """
+                    INSERT INTO transactions (id, client_id, user_id, ledger_id, type, amount, is_deleted, created_at)
+                    SELECT gen_random_uuid(),
+                           md5('c' || (g % :tenants))::uuid,
+                           md5('u' || (g % :tenants))::uuid,
+                           :ledger_id, 'expense', 10, ((g / :tenants) % 50 = 0),
+                           now() - random() * make_interval(days => :days)
+                    FROM generate_series(1, :rows) AS g
+                    """
+                ),
+                {"tenants": tenants, "ledger_id": ledger_id, "days": days, "rows": rows},
+            )
+            conn.execute(text("ANALYZE transactions"))
+            report["seed_seconds"] = round(_time.perf_counter() - started, 1)
+
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            today = datetime.now(get_tenant_timezone(db, user_id, client_id)).date()
+            _, _, query = TransactionFilterService._history_query(
+                db, "custom", user_id, client_id, today - timedelta(days=30), today
+            )
+            statements = {
+                "month_range": query.statement,
+                "first_page": query.limit(app_settings.HISTORY_DEFAULT_PAGE_SIZE + 1).statement,
+            }
+            for name, statement in statements.items():
+                sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()[0]
+                nodes = list(_plan_nodes(plan["Plan"]))
+                scans = [
+                    {"node": n["Node Type"], "index": n.get("Index Name")}
+                    for n in nodes
+                    if n.get("Relation Name") == "transactions" or "Index Name" in n
+                ]
+                report["queries"][name] = {
+                    "scans": scans,
+                    "rows": plan["Plan"].get("Actual Rows"),
+                    "execution_ms": plan.get("Execution Time"),
+                    "uses_index": any(s["index"] == HISTORY_INDEX for s in scans),
+                    "seq_scan": any(s["node"] == "Seq Scan" for s in scans),
+                }
+            db.close()
+        finally:
+            outer.rollback()
+    report["ok"] = all(q["uses_index"] and not q["seq_scan"] for q in report["queries"].values())
+    return report
+
+
+def _main() -> None:
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Check that history queries use the tenant/created_at index.")
+    parser.add_argument("command", choices=["explain"])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    report = _explain_history(args.rows, args.tenants, args.days)
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(0 if report["ok"] else 1)
+
 
+if __name__ == "__main__":
+    _main()
@@ -1,40 +1,147 @@
+from datetime import datetime
 from uuid import UUID
+from sqlalchemy import and_, or_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from fastapi import HTTPException, status
 
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
-from app.models.transaction import Transaction
+from app.models.transaction_limit import DailyTransactionCounter, TransactionLimitOverride
 
+# Effective per-day limit per (client_id, user_id)
+daily_limit_cache = TTLCache(
+    maxsize=settings.FINANCIAL_SETTINGS_CACHE_SIZE,
+    ttl=settings.FINANCIAL_SETTINGS_CACHE_TTL,
+    namespace="daily_limit",
+)
 
-def enforce_daily_limit(
+
+def get_daily_limit(db: Session, *, user_id: UUID, client_id: UUID) -> int:
+    """
+    Returns the tenant's max transactions per day: a user-specific override,
+    else a client-wide override, else MAX_TRANSACTIONS_PER_DAY.
+    """
+    key = (str(client_id), str(user_id))
+    cached = daily_limit_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    override = (
+        db.query(TransactionLimitOverride.max_per_day)
+        .filter(
+            TransactionLimitOverride.client_id == client_id,
+            or_(TransactionLimitOverride.user_id == user_id, TransactionLimitOverride.user_id.is_(None)),
+        )
+        # User-specific row first (NULLs sort last in ascending order)
+        .order_by(TransactionLimitOverride.user_id.asc())
+        .first()
+    )
+    max_per_day = override[0] if override else settings.MAX_TRANSACTIONS_PER_DAY
+    daily_limit_cache.set(key, max_per_day)
+    return max_per_day
+
+
+def remaining_daily_quota(
     db: Session,
     *,
     user_id: UUID,
     client_id: UUID,
     limit: int | None = None,
-) -> None:
+) -> int:
     """
-    Ensures a user cannot create more than `limit` transactions today (server DB date).
-    Excludes soft-deleted transactions.
-    Raises HTTPException 429 when the limit is reached.
+    Returns how many more transactions the user may create today (server DB date).
+    Reads today's counter row by primary key.
     """
-    max_per_day = limit if limit is not None else settings.MAX_TRANSACTIONS_PER_DAY
+    max_per_day = limit if limit is not None else get_daily_limit(db, user_id=user_id, client_id=client_id)
 
     todays_count = (
-        db.query(func.count(Transaction.id))
+        db.query(DailyTransactionCounter.count)
         .filter(
-            Transaction.user_id == user_id,
-            Transaction.client_id == client_id,
-            Transaction.is_deleted == False,
-            func.date(Transaction.created_at) == func.current_date(),
+            DailyTransactionCounter.client_id == client_id,
+            DailyTransactionCounter.user_id == user_id,
+            DailyTransactionCounter.day == func.current_date(),
         )
         .scalar()
-    )
+    ) or 0
+    return max(max_per_day - todays_count, 0)
 
-    if todays_count >= max_per_day:
+
+def check_daily_limit(db: Session, *, user_id: UUID, client_id: UUID) -> None:
+    """
+    Read-only pre-check: raises HTTPException 429 if no slot is left today.
+    Does not reserve anything; use enforce_daily_limit() in the write transaction.
+    """
+    max_per_day = get_daily_limit(db, user_id=user_id, client_id=client_id)
+    if remaining_daily_quota(db, user_id=user_id, client_id=client_id, limit=max_per_day) <= 0:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=f"Daily transaction limit reached (max {max_per_day} per day).",
         )
 
+
+def enforce_daily_limit(
+    db: Session,
+    *,
+    user_id: UUID,
+    client_id: UUID,
+    limit: int | None = None,
+    count: int = 1,
+) -> None:
+    """
+    Reserves `count` of today's transaction slots for the user, or raises
+    HTTPException 429 when that would exceed the daily limit.
+
+    The reservation is a single conditional upsert on today's counter row and is
+    part of the caller's DB transaction: it commits with the inserted transactions
+    and is undone on rollback. Concurrent requests for the same user serialize on
+    the counter row, so the limit is exact.
+    """
+    max_per_day = limit if limit is not None else get_daily_limit(db, user_id=user_id, client_id=client_id)
+    limit_error = HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Daily transaction limit reached (max {max_per_day} per day).",
+    )
+    if count > max_per_day:
+        raise limit_error
+
+    stmt = insert(DailyTransactionCounter).values(
+        client_id=client_id,
+        user_id=user_id,
+        day=func.current_date(),
+        count=count,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            DailyTransactionCounter.client_id,
+            DailyTransactionCounter.user_id,
+            DailyTransactionCounter.day,
+        ],
+        set_={"count": DailyTransactionCounter.__table__.c.count + count},
+        where=DailyTransactionCounter.__table__.c.count + count <= max_per_day,
+    ).returning(DailyTransactionCounter.count)
+
+    if db.execute(stmt).scalar_one_or_none() is None:
+        raise limit_error
+
+
+def release_daily_slot(db: Session, *, user_id: UUID, client_id: UUID, created_at: datetime | None) -> None:
+    """
+    Gives back the slot of a soft-deleted transaction on the day it was created.
+    """
+    if created_at is None:
+        return
+    db.execute(
+        update(DailyTransactionCounter)
+        .where(
+            and_(
+                DailyTransactionCounter.client_id == client_id,
+                DailyTransactionCounter.user_id == user_id,
+                DailyTransactionCounter.day == func.date(created_at),
+                DailyTransactionCounter.count > 0,
+            )
+        )
+        .values(count=DailyTransactionCounter.count - 1)
+        .execution_options(synchronize_session=False)
+    )
@@ -2,16 +2,18 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from uuid import UUID
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 from app.models.transaction import Transaction
-from app.models.ledger import Ledger
 from app.models.bank_account import BankAccount
-from app.schemas.transaction import TransactionFromQueryCreate
+from app.schemas.transaction import TransactionBatchQueryCreate, TransactionFromQueryCreate
 from app.schemas.bank_account import BankAccountOut
 from app.schemas.inventory import InventoryCreate
-from app.services.gemini_services import parse_transaction_query
+from app.utils.balance_posting import BalancePostingService
+from app.utils.balance_reconciliation import lock_tenant_snapshots
 from app.utils.inventory_utils import InventoryService
+from app.utils.ledger_directory import ledger_directory
+from app.utils.rollup_service import DailyRollupService
 from app.utils.financial_settings import FinancialSettingsService
 from app.utils.transaction_limits import enforce_daily_limit
 
@@ -20,21 +22,31 @@ class TransactionQueryService:
     def __init__(self, db: Session):
         self.db = db
 
-    def find_or_create_ledger(self, name: str, type: str, client_id: UUID, user_id: UUID) -> Ledger:
-        ledger = self.db.query(Ledger).filter(
-            Ledger.client_id == client_id,
-            Ledger.user_id == user_id,
-            Ledger.name.ilike(name)
-        ).first()
-        if not ledger:
-            ledger = Ledger(name=name.capitalize(), type=type, client_id=client_id, user_id=user_id, balance=Decimal("0.0"))
-            self.db.add(ledger)
-            self.db.flush()
-        return ledger
-
-    def handle_query_transaction(self, payload: TransactionFromQueryCreate) -> Dict[str, Any] | Transaction:
+    def find_or_create_ledger(self, name: str, type: str, client_id: UUID, user_id: UUID) -> UUID:
+        return ledger_directory.resolve(
+            self.db,
+            client_id=client_id,
+            user_id=user_id,
+            name=name,
+            type=type,
+            display_name=name.capitalize(),
+        )
+
+    @staticmethod
+    def raise_if_unavailable(parsed: Dict[str, Any]) -> None:
+        # The AI service itself failed (not the query): surface it as 503
+        if parsed.get("unavailable"):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=parsed["error"])
+
+    def handle_query_transaction(
+        self, payload: TransactionFromQueryCreate, parsed: Dict[str, Any]
+    ) -> Dict[str, Any] | Transaction:
+        """
+        `parsed` is the AI parse of payload.query (see gemini_services.parse_transaction_query),
+        done by the caller outside of the DB session.
+        """
+        self.raise_if_unavailable(parsed)
         if not payload.bank_account_id:
-            parsed = parse_transaction_query(payload.query)
             if "error" in parsed:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=parsed)
             
@@ -47,18 +59,21 @@ class TransactionQueryService:
 
             return {"accounts": [BankAccountOut.model_validate(a, from_attributes=True) for a in accounts], "preview": parsed}
         
-        return self.create_from_query(payload)
-
-    def create_from_query(self, payload: TransactionFromQueryCreate) -> Transaction:
-        # Enforce per-user daily transaction cap before creating
-        enforce_daily_limit(
-            self.db,
-            user_id=payload.user_id,
-            client_id=payload.client_id,
-        )
+        return self.create_from_query(payload, parsed)
 
-        parsed_data = parse_transaction_query(payload.query)
-        
+    def create_from_query(
+        self,
+        payload: TransactionFromQueryCreate | TransactionBatchQueryCreate,
+        parsed_data: Dict[str, Any],
+        *,
+        enforce_limit: bool = True,
+        commit: bool = True,
+    ) -> Transaction:
+        """
+        Posts one parsed transaction. Only payload.client_id, user_id and bank_account_id
+        are used. With commit=False the rows are only flushed (see create_batch_from_parsed).
+        """
+        self.raise_if_unavailable(parsed_data)
         if "error" in parsed_data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not parse query: {parsed_data.get('error', 'Missing required fields')}")
 
@@ -73,6 +88,15 @@ class TransactionQueryService:
         if "error" in parsed_data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not parse query: {parsed_data.get('error', 'Missing required fields')}")
 
+        lock_tenant_snapshots(self.db, payload.client_id, payload.user_id, shared=True)
+        # Enforce per-user daily transaction cap before creating
+        if enforce_limit:
+            enforce_daily_limit(
+                self.db,
+                user_id=payload.user_id,
+                client_id=payload.client_id,
+            )
+
         # === INVENTORY LOGIC (RELIABLE VERSION) ===
         if "inventory" in parsed_data and parsed_data["inventory"]:
             inventory_data = parsed_data["inventory"]
@@ -92,7 +116,7 @@ class TransactionQueryService:
             inventory_service = InventoryService(self.db)
             
             # InventoryService ata inventory aani transaction donhi return karto.
-            new_inventory_item, created_transaction = inventory_service.create_item(inventory_in)
+            new_inventory_item, created_transaction = inventory_service.create_item(inventory_in, enforce_limit=False, commit=commit)
             
             # Direct transaction return kara, shodhaychi (searching) garaj nahi.
             return created_transaction
@@ -103,11 +127,22 @@ class TransactionQueryService:
             if amount_key not in parsed_data:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not parse query: {parsed_data.get('error', 'Missing required fields')}")
 
-            bank_account = self.db.query(BankAccount).filter(BankAccount.id == payload.bank_account_id, BankAccount.user_id == payload.user_id).first()
-            if not bank_account:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bank account not found.")
-
             total_amount = Decimal(str(parsed_data[amount_key]))
+            poster = BalancePostingService(self.db)
+            if parsed_data["type"] in ["expense", "loan_receivable"]:
+                bank_delta = -total_amount
+            elif parsed_data["type"] in ["income", "loan_payable"]:
+                bank_delta = total_amount
+            else:
+                bank_delta = Decimal("0")
+            poster.post_to_bank_account(
+                payload.bank_account_id,
+                bank_delta,
+                user_id=payload.user_id,
+                require_funds=True,
+                not_found_detail="Bank account not found.",
+                insufficient_detail="Insufficient balance.",
+            )
             gst_details = parsed_data.get("gst_details")
             
             base_amount = total_amount
@@ -120,10 +155,10 @@ class TransactionQueryService:
                 if gst_amount > 0:
                     # Choose correct GST ledger based on type
                     if parsed_data["type"] in ["income", "loan_payable"]:
-                        gst_ledger = self.find_or_create_ledger("GST Collected", "income", payload.client_id, payload.user_id)
+                        gst_ledger_id = self.find_or_create_ledger("GST Collected", "income", payload.client_id, payload.user_id)
                     else:
-                        gst_ledger = self.find_or_create_ledger("GST Paid", "expense", payload.client_id, payload.user_id)
-                    gst_ledger.balance += gst_amount
+                        gst_ledger_id = self.find_or_create_ledger("GST Paid", "expense", payload.client_id, payload.user_id)
+                    poster.post_to_ledger(gst_ledger_id, gst_amount)
             else:
                 # Fallback GST calculation using active financial settings
                 settings = FinancialSettingsService(self.db).get_active_settings(
@@ -141,30 +176,35 @@ class TransactionQueryService:
                         # Post GST to appropriate ledger
                         if gst_amount > 0:
                             if parsed_data["type"] == "income":
-                                gst_ledger = self.find_or_create_ledger("GST Collected", "income", payload.client_id, payload.user_id)
+                                gst_ledger_id = self.find_or_create_ledger("GST Collected", "income", payload.client_id, payload.user_id)
                             else:
-                                gst_ledger = self.find_or_create_ledger("GST Paid", "expense", payload.client_id, payload.user_id)
-                            gst_ledger.balance += gst_amount
+                                gst_ledger_id = self.find_or_create_ledger("GST Paid", "expense", payload.client_id, payload.user_id)
+                            poster.post_to_ledger(gst_ledger_id, gst_amount)
 
-            main_ledger = self.find_or_create_ledger(name=parsed_data["category"], type=parsed_data["type"], client_id=payload.client_id, user_id=payload.user_id)
-          
-            if parsed_data["type"] in ["expense", "loan_receivable"]:
-                if bank_account.balance < total_amount:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance.")
-                bank_account.balance -= total_amount
-            elif parsed_data["type"] in ["income", "loan_payable"]:
-                bank_account.balance += total_amount
-            
-            main_ledger.balance += base_amount
+            main_ledger_id = self.find_or_create_ledger(name=parsed_data["category"], type=parsed_data["type"], client_id=payload.client_id, user_id=payload.user_id)
+            poster.post_to_ledger(main_ledger_id, base_amount)
 
             db_transaction = Transaction(
                 client_id=payload.client_id, user_id=payload.user_id,
-                ledger_id=main_ledger.id, bank_account_id=bank_account.id,
+                ledger_id=main_ledger_id, bank_account_id=payload.bank_account_id,
                 type=parsed_data["type"], amount=total_amount,
                 base_amount=base_amount, gst_amount=gst_amount,
                 description=parsed_data["description"]
             )
             self.db.add(db_transaction)
+            DailyRollupService(self.db).record(
+                client_id=payload.client_id,
+                user_id=payload.user_id,
+                ledger_id=main_ledger_id,
+                tx_type=parsed_data["type"],
+                amount=total_amount,
+                base_amount=base_amount,
+                gst_amount=gst_amount,
+            )
+
+            if not commit:
+                self.db.flush()
+                return db_transaction
 
             try:
                 self.db.commit()
@@ -174,3 +214,58 @@ class TransactionQueryService:
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database commit failed: {e}")
                 
             return db_transaction
+
+    def preview_batch(
+        self, payload: TransactionBatchQueryCreate, parsed_items: List[Tuple[int, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        accounts = self.db.query(BankAccount).filter(BankAccount.client_id == payload.client_id, BankAccount.user_id == payload.user_id).all()
+        if not accounts:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No bank accounts found.")
+
+        preview = []
+        for query_index, parsed in parsed_items:
+            entry = {"query_index": query_index, **parsed}
+            if 'total_amount' in entry:
+                entry['amount'] = entry.pop('total_amount')
+            preview.append(entry)
+        return {"accounts": [BankAccountOut.model_validate(a, from_attributes=True) for a in accounts], "preview": preview}
+
+    def create_batch_from_parsed(
+        self, payload: TransactionBatchQueryCreate, parsed_items: List[Tuple[int, Dict[str, Any]]]
+    ) -> List[Transaction]:
+        """
+        Posts parsed entries (query index, parsed transaction) in one DB transaction:
+        either every entry is created or none is. The daily quota is reserved once
+        for the whole batch.
+        """
+        if not parsed_items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No transactions found in the queries.")
+
+        lock_tenant_snapshots(self.db, payload.client_id, payload.user_id, shared=True)
+        enforce_daily_limit(
+            self.db,
+            user_id=payload.user_id,
+            client_id=payload.client_id,
+            count=len(parsed_items),
+        )
+        created: List[Transaction] = []
+        for position, (query_index, parsed) in enumerate(parsed_items):
+            try:
+                created.append(self.create_from_query(payload, parsed, enforce_limit=False, commit=False))
+            except HTTPException as e:
+                self.db.rollback()
+                message = e.detail.get("message") if isinstance(e.detail, dict) else e.detail
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail={
+                        "message": f"Entry {position + 1} (query {query_index + 1}): {message}",
+                        "code": "BATCH_ENTRY_FAILED",
+                    },
+                )
+
+        try:
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database commit failed: {e}")
+        return created
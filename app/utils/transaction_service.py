@@ -1,18 +1,29 @@
+from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Literal
+from typing import Any, Dict, List, Literal, Tuple
 from uuid import UUID as UUID_t , UUID
 
 from fastapi import HTTPException, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
 from app.models.transaction import Transaction
-from app.models.ledger import Ledger
 from app.models.bank_account import BankAccount
-from app.schemas.transaction import TransactionAutoCreate
+from app.core.config import settings as app_settings
+from app.schemas.transaction import TransactionAutoCreate, TransactionOut
 from app.schemas.transaction import TransactionUpdate
+from app.utils.balance_posting import BalancePostingService
+from app.utils.balance_reconciliation import invalidate_snapshots, lock_tenant_snapshots
 from app.utils.financial_settings import FinancialSettingsService
-from app.utils.transaction_limits import enforce_daily_limit
+from app.utils.ledger_directory import ledger_directory
+from app.utils.rollup_service import DailyRollupService
+from app.utils.transaction_limits import (
+    enforce_daily_limit,
+    get_daily_limit,
+    release_daily_slot,
+    remaining_daily_quota,
+)
 
 
 class TransactionService:
@@ -23,9 +34,9 @@ class TransactionService:
     def __init__(self, db: Session):
         self.db = db
 
-    def _get_gst_ledger(self, *, client_id: UUID_t, user_id: UUID_t, tx_type: str) -> Ledger | None:
+    def _get_gst_ledger(self, *, client_id: UUID_t, user_id: UUID_t, tx_type: str) -> UUID_t | None:
         """
-        Returns the GST ledger based on transaction type.
+        Returns the GST ledger id based on transaction type.
         - For expense/loan_receivable: GST Paid (input credit)
         - For income/loan_payable: GST Collected (output tax)
         """
@@ -38,28 +49,11 @@ class TransactionService:
         else:
             return None
 
-        ledger = (
-            self.db.query(Ledger)
-            .filter(
-                Ledger.client_id == client_id,
-                Ledger.user_id == user_id,
-                Ledger.name.ilike(name),
-            )
-            .first()
+        return ledger_directory.resolve(
+            self.db, client_id=client_id, user_id=user_id, name=name, type=ledger_type
         )
-        if ledger is None:
-            ledger = Ledger(
-                client_id=client_id,
-                user_id=user_id,
-                name=name,
-                type=ledger_type,
-                balance=Decimal("0.0"),
-            )
-            self.db.add(ledger)
-            self.db.flush()
-        return ledger
 
-    def _resolve_or_create_ledger(self, *, client_id: UUID_t, user_id: UUID_t, tx_type: str) -> Ledger:
+    def _resolve_or_create_ledger(self, *, client_id: UUID_t, user_id: UUID_t, tx_type: str) -> UUID_t:
         type_to_default_name = {
             "income": "Income",
             "expense": "Expense",
@@ -67,24 +61,26 @@ class TransactionService:
             "loan_receivable": "Loan Receivable",
         }
         default_name = type_to_default_name.get(tx_type, tx_type.title())
-        ledger = self.db.query(Ledger).filter(
-            Ledger.client_id == client_id,
-            Ledger.user_id == user_id,
-            Ledger.name.ilike(default_name)
-        ).first()
-        if ledger is None:
-            ledger = Ledger(
-                client_id=client_id,
-                user_id=user_id,
-                name=default_name,
-                type=tx_type,
-                balance=Decimal("0.0"),
-            )
-            self.db.add(ledger)
-            self.db.flush()
-        return ledger
+        return ledger_directory.resolve(
+            self.db, client_id=client_id, user_id=user_id, name=default_name, type=tx_type
+        )
+
+    @staticmethod
+    def _split_gst(amount: Decimal, gst_rate: Decimal | None) -> Tuple[Decimal | None, Decimal | None]:
+        """
+        Splits a GST-inclusive total into (base_amount, gst_amount).
+        Returns (None, None) when no GST applies.
+        """
+        if gst_rate is None or gst_rate <= 0:
+            return None, None
+        divisor = Decimal("1") + (gst_rate / Decimal("100"))
+        base_amount = (amount / divisor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        gst_amount = (amount - base_amount).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return base_amount, gst_amount
 
     def create_with_auto_ledger(self, payload: TransactionAutoCreate) -> Transaction:
+        # First in the DB transaction: created_at (now()) is then never older than the lock
+        lock_tenant_snapshots(self.db, payload.client_id, payload.user_id, shared=True)
         # Enforce per-user daily transaction cap
         enforce_daily_limit(
             self.db,
@@ -98,57 +94,44 @@ class TransactionService:
         gst_rate = None
         if settings and settings.gst_enabled and payload.include_gst:
             gst_rate = Decimal(str(settings.gst_rate))
-        bank_account = self.db.query(BankAccount).filter(
-            BankAccount.id == payload.bank_account_id,
-            BankAccount.client_id == payload.client_id,
-            BankAccount.user_id == payload.user_id,
-        ).first()
-        if bank_account is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bank account not found")
+        if payload.type in ["expense", "loan_receivable"]:
+            bank_delta = -Decimal(str(payload.amount))
+        elif payload.type in ["income", "loan_payable"]:
+            bank_delta = Decimal(str(payload.amount))
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported transaction type")
 
-        ledger = self._resolve_or_create_ledger(
+        amount = Decimal(str(payload.amount))
+        base_amount, gst_amount = self._split_gst(amount, gst_rate)
+
+        # Adjust balances: bank always by total amount; ledgers split into base and GST when applicable
+        poster = BalancePostingService(self.db)
+        poster.post_to_bank_account(
+            payload.bank_account_id,
+            bank_delta,
             client_id=payload.client_id,
             user_id=payload.user_id,
-            tx_type=payload.type,
+            require_funds=True,
         )
 
-        amount = Decimal(str(payload.amount))
-        base_amount = None
-        gst_amount = None
-        if gst_rate is not None and gst_rate > 0:
-            divisor = Decimal("1") + (gst_rate / Decimal("100"))
-            base_amount = (amount / divisor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            gst_amount = (amount - base_amount).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        # Adjust balances: bank always by total amount; ledgers split into base and GST when applicable
-        if payload.type in ["expense", "loan_receivable"]:
-            if bank_account.balance < amount:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance")
-            bank_account.balance -= amount
-            if gst_amount and gst_amount > 0:
-                ledger.balance += base_amount or Decimal("0.00")
-                gst_ledger = self._get_gst_ledger(client_id=payload.client_id, user_id=payload.user_id, tx_type=payload.type)
-                if gst_ledger:
-                    gst_ledger.balance += gst_amount
-            else:
-                ledger.balance += amount
-        elif payload.type in ["income", "loan_payable"]:
-            bank_account.balance += amount
-            if gst_amount and gst_amount > 0:
-                ledger.balance += base_amount or Decimal("0.00")
-                gst_ledger = self._get_gst_ledger(client_id=payload.client_id, user_id=payload.user_id, tx_type=payload.type)
-                if gst_ledger:
-                    gst_ledger.balance += gst_amount
-            else:
-                ledger.balance += amount
+        ledger_id = self._resolve_or_create_ledger(
+            client_id=payload.client_id,
+            user_id=payload.user_id,
+            tx_type=payload.type,
+        )
+        if gst_amount and gst_amount > 0:
+            poster.post_to_ledger(ledger_id, base_amount or Decimal("0.00"))
+            gst_ledger_id = self._get_gst_ledger(client_id=payload.client_id, user_id=payload.user_id, tx_type=payload.type)
+            if gst_ledger_id:
+                poster.post_to_ledger(gst_ledger_id, gst_amount)
         else:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported transaction type")
+            poster.post_to_ledger(ledger_id, amount)
 
         tx = Transaction(
             client_id=payload.client_id,
             user_id=payload.user_id,
-            ledger_id=ledger.id,
-            bank_account_id=bank_account.id,
+            ledger_id=ledger_id,
+            bank_account_id=payload.bank_account_id,
             type=payload.type,
             amount=amount,
             base_amount=base_amount,
@@ -157,6 +140,15 @@ class TransactionService:
         )
 
         self.db.add(tx)
+        DailyRollupService(self.db).record(
+            client_id=payload.client_id,
+            user_id=payload.user_id,
+            ledger_id=ledger_id,
+            tx_type=payload.type,
+            amount=amount,
+            base_amount=base_amount,
+            gst_amount=gst_amount,
+        )
         try:
             self.db.commit()
             self.db.refresh(tx)
@@ -165,10 +157,204 @@ class TransactionService:
             self.db.rollback()
             raise
 
+    def create_bulk(self, items: List[TransactionAutoCreate]) -> List[Dict[str, Any]]:
+        """
+        Creates many transactions in a single database transaction.
+        Settings, daily quota, bank accounts and ledgers are resolved once per tenant,
+        balance deltas are aggregated per account/ledger and rows are written with one
+        multi-row INSERT. Rows that fail validation are reported and skipped.
+        """
+        if len(items) > app_settings.BULK_TRANSACTIONS_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Too many transactions in one batch (max {app_settings.BULK_TRANSACTIONS_MAX_ITEMS}).",
+            )
+
+        results: List[Dict[str, Any] | None] = [None] * len(items)
+
+        def reject(index: int, status_code: int, message: str) -> None:
+            results[index] = {
+                "index": index,
+                "success": False,
+                "data": None,
+                "error": {"status_code": status_code, "message": message},
+            }
+
+        # Hold off month-end snapshots of every tenant in the batch until it commits
+        tenants = sorted(dict.fromkeys((i.client_id, i.user_id) for i in items), key=str)
+        for client_id, user_id in tenants:
+            lock_tenant_snapshots(self.db, client_id, user_id, shared=True)
+
+        # Per-tenant settings and remaining daily quota (one lookup per tenant)
+        gst_rates: Dict[Tuple[UUID_t, UUID_t], Decimal | None] = {}
+        limits: Dict[Tuple[UUID_t, UUID_t], int] = {}
+        quotas: Dict[Tuple[UUID_t, UUID_t], int] = {}
+        for client_id, user_id in tenants:
+            tenant_settings = FinancialSettingsService(self.db).get_active_settings(
+                user_id=str(user_id), client_id=str(client_id)
+            )
+            gst_rates[(client_id, user_id)] = (
+                Decimal(str(tenant_settings.gst_rate))
+                if tenant_settings and tenant_settings.gst_enabled
+                else None
+            )
+            limits[(client_id, user_id)] = get_daily_limit(self.db, user_id=user_id, client_id=client_id)
+            quotas[(client_id, user_id)] = remaining_daily_quota(
+                self.db, user_id=user_id, client_id=client_id, limit=limits[(client_id, user_id)]
+            )
+
+        # All referenced bank accounts in one query
+        account_ids = {i.bank_account_id for i in items}
+        accounts = {
+            a.id: a
+            for a in self.db.query(BankAccount).filter(BankAccount.id.in_(account_ids)).all()
+        }
+        running_balance = {a_id: Decimal(str(a.balance or 0)) for a_id, a in accounts.items()}
+
+        # GST split for every row in one pass
+        amounts = [Decimal(str(i.amount)) for i in items]
+        splits = [
+            self._split_gst(amount, gst_rates[(i.client_id, i.user_id)] if i.include_gst else None)
+            for i, amount in zip(items, amounts)
+        ]
+
+        ledgers: Dict[Tuple[UUID_t, UUID_t, str], UUID_t] = {}
+        gst_ledgers: Dict[Tuple[UUID_t, UUID_t, str], UUID_t | None] = {}
+        # Per accepted row: its bank posting (by account) and ledger postings
+        bank_postings: Dict[UUID_t, List[Tuple[int, Decimal]]] = defaultdict(list)
+        ledger_postings: List[List[Tuple[UUID_t, Decimal]]] = []
+        rows: List[Dict[str, Any]] = []
+        row_indexes: List[int] = []
+
+        for index, (item, amount, (base_amount, gst_amount)) in enumerate(zip(items, amounts, splits)):
+            tenant = (item.client_id, item.user_id)
+            if quotas[tenant] <= 0:
+                reject(
+                    index,
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    f"Daily transaction limit reached (max {limits[tenant]} per day).",
+                )
+                continue
+
+            bank_account = accounts.get(item.bank_account_id)
+            if bank_account is None or bank_account.client_id != item.client_id or bank_account.user_id != item.user_id:
+                reject(index, status.HTTP_404_NOT_FOUND, "Bank account not found")
+                continue
+
+            if item.type in ["expense", "loan_receivable"]:
+                if running_balance[bank_account.id] < amount:
+                    reject(index, status.HTTP_400_BAD_REQUEST, "Insufficient balance")
+                    continue
+                bank_delta = -amount
+            else:
+                bank_delta = amount
+            running_balance[bank_account.id] += bank_delta
+
+            ledger_key = (item.client_id, item.user_id, item.type)
+            ledger_id = ledgers.get(ledger_key)
+            if ledger_id is None:
+                ledger_id = self._resolve_or_create_ledger(
+                    client_id=item.client_id, user_id=item.user_id, tx_type=item.type
+                )
+                ledgers[ledger_key] = ledger_id
+
+            if gst_amount and gst_amount > 0:
+                postings = [(ledger_id, base_amount or Decimal("0.00"))]
+                if ledger_key not in gst_ledgers:
+                    gst_ledgers[ledger_key] = self._get_gst_ledger(
+                        client_id=item.client_id, user_id=item.user_id, tx_type=item.type
+                    )
+                gst_ledger_id = gst_ledgers[ledger_key]
+                if gst_ledger_id:
+                    postings.append((gst_ledger_id, gst_amount))
+            else:
+                postings = [(ledger_id, amount)]
+
+            quotas[tenant] -= 1
+            bank_postings[bank_account.id].append((len(rows), bank_delta))
+            ledger_postings.append(postings)
+            rows.append({
+                "client_id": item.client_id,
+                "user_id": item.user_id,
+                "ledger_id": ledger_id,
+                "bank_account_id": bank_account.id,
+                "type": item.type,
+                "amount": amount,
+                "base_amount": base_amount,
+                "gst_amount": gst_amount,
+                "description": item.description,
+                "is_deleted": False,
+            })
+            row_indexes.append(index)
+
+        try:
+            if rows:
+                # Debits are re-checked in the database in case balances moved concurrently;
+                # a debit that no longer fits rejects its row and the rest of the batch posts
+                poster = BalancePostingService(self.db)
+                failed = poster.post_bank_postings(bank_postings)
+                for position, error in failed.items():
+                    reject(row_indexes[position], error.status_code, error.detail)
+                kept = [position for position in range(len(rows)) if position not in failed]
+
+                accepted_per_tenant: Dict[Tuple[UUID_t, UUID_t], int] = defaultdict(int)
+                ledger_deltas: Dict[UUID_t, Decimal] = defaultdict(Decimal)
+                for position in kept:
+                    accepted_per_tenant[(rows[position]["client_id"], rows[position]["user_id"])] += 1
+                    for ledger_id, delta in ledger_postings[position]:
+                        ledger_deltas[ledger_id] += delta
+                rows = [rows[position] for position in kept]
+                row_indexes = [row_indexes[position] for position in kept]
+
+            if rows:
+                # Reserve the daily slots atomically; fails the batch if concurrent writes used them up
+                for (client_id, user_id), accepted in accepted_per_tenant.items():
+                    enforce_daily_limit(
+                        self.db, user_id=user_id, client_id=client_id, limit=limits[(client_id, user_id)], count=accepted
+                    )
+                poster.post_ledger_deltas(ledger_deltas)
+
+                created = self.db.scalars(
+                    insert(Transaction).returning(Transaction, sort_by_parameter_order=True),
+                    rows,
+                ).all()
+                # One rollup upsert per (tenant, ledger, type) group
+                groups: Dict[Tuple[UUID_t, UUID_t, UUID_t, str], List[Transaction]] = defaultdict(list)
+                for tx in created:
+                    groups[(tx.client_id, tx.user_id, tx.ledger_id, tx.type)].append(tx)
+                rollups = DailyRollupService(self.db)
+                for (client_id, user_id, ledger_id, tx_type), group in groups.items():
+                    rollups.record(
+                        client_id=client_id,
+                        user_id=user_id,
+                        ledger_id=ledger_id,
+                        tx_type=tx_type,
+                        amount=sum((tx.amount for tx in group), Decimal("0")),
+                        base_amount=sum(
+                            (tx.base_amount if tx.base_amount is not None else tx.amount - (tx.gst_amount or 0) for tx in group),
+                            Decimal("0"),
+                        ),
+                        gst_amount=sum((tx.gst_amount or Decimal("0") for tx in group), Decimal("0")),
+                        created_at=group[0].created_at,
+                        count=len(group),
+                    )
+                # Serialize before commit so expired attributes are not reloaded row by row
+                for index, tx in zip(row_indexes, created):
+                    results[index] = {
+                        "index": index,
+                        "success": True,
+                        "data": TransactionOut.model_validate(tx, from_attributes=True),
+                        "error": None,
+                    }
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return results
+
     def _reverse_effects_for_transaction(self, tx: Transaction):
-        bank_account = self.db.query(BankAccount).filter(BankAccount.id == tx.bank_account_id).first()
-        ledger = self.db.query(Ledger).filter(Ledger.id == tx.ledger_id).first()
-        if bank_account is None or ledger is None:
+        if tx.bank_account_id is None or tx.ledger_id is None:
             return
         amount = Decimal(str(tx.amount))
         gst_part = Decimal(str(tx.gst_amount)) if tx.gst_amount is not None else Decimal("0.00")
@@ -176,23 +362,24 @@ class TransactionService:
             Decimal(str(tx.base_amount)) if tx.base_amount is not None else (amount - gst_part)
         )
 
-        # Reverse bank movement
         if tx.type in ["expense", "loan_receivable"]:
-            bank_account.balance += amount
-            # Reverse main ledger (only base)
-            ledger.balance -= base_part
-            # Reverse GST ledger if present
-            if gst_part > 0:
-                gst_ledger = self._get_gst_ledger(client_id=tx.client_id, user_id=tx.user_id, tx_type=tx.type)
-                if gst_ledger:
-                    gst_ledger.balance -= gst_part
+            sign = Decimal("1")
         elif tx.type in ["income", "loan_payable"]:
-            bank_account.balance -= amount
-            ledger.balance -= base_part
-            if gst_part > 0:
-                gst_ledger = self._get_gst_ledger(client_id=tx.client_id, user_id=tx.user_id, tx_type=tx.type)
-                if gst_ledger:
-                    gst_ledger.balance -= gst_part
+            sign = Decimal("-1")
+        else:
+            return
+
+        poster = BalancePostingService(self.db)
+        # Reverse bank movement; nothing to reverse if the account is gone
+        if poster.post_to_bank_account(tx.bank_account_id, sign * amount, must_exist=False) is None:
+            return
+        # Reverse main ledger (only base)
+        poster.post_to_ledger(tx.ledger_id, -base_part)
+        # Reverse GST ledger if present
+        if gst_part > 0:
+            gst_ledger_id = self._get_gst_ledger(client_id=tx.client_id, user_id=tx.user_id, tx_type=tx.type)
+            if gst_ledger_id:
+                poster.post_to_ledger(gst_ledger_id, -gst_part)
 
     def update(self, *, transaction_id: UUID, user_id: UUID, client_id: UUID, payload: TransactionUpdate) -> Transaction:
         tx = (
@@ -211,42 +398,23 @@ class TransactionService:
                 detail="Transaction not found for this user/group",
             )
 
+        # Before any balance row is locked: creates take this lock first, then the bank row
+        lock_tenant_snapshots(self.db, client_id, user_id)
         self._reverse_effects_for_transaction(tx)
+        rollups = DailyRollupService(self.db)
+        rollups.record_transaction(tx, count=-1)
 
         # Resolve target bank account (fallback to existing)
-        if payload.bank_account_id:
-            new_bank = (
-                self.db.query(BankAccount)
-                .filter(
-                    BankAccount.id == payload.bank_account_id,
-                    BankAccount.client_id == client_id,
-                    BankAccount.user_id == user_id,
-                )
-                .first()
-            )
-            if new_bank is None:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND, detail="Bank account not found"
-                )
-        else:
-            new_bank = (
-                self.db.query(BankAccount)
-                .filter(BankAccount.id == tx.bank_account_id)
-                .first()
-            )
+        new_bank_id = payload.bank_account_id or tx.bank_account_id
 
         # Determine effective type and ledger
         effective_type = payload.type or tx.type
         if payload.type:
-            new_ledger = self._resolve_or_create_ledger(
+            new_ledger_id = self._resolve_or_create_ledger(
                 client_id=client_id, user_id=user_id, tx_type=effective_type
             )
         else:
-            new_ledger = (
-                self.db.query(Ledger)
-                .filter(Ledger.id == tx.ledger_id)
-                .first()
-            )
+            new_ledger_id = tx.ledger_id
 
         # Determine amount
         amount = Decimal(str(payload.amount)) if payload.amount else Decimal(str(tx.amount))
@@ -285,35 +453,38 @@ class TransactionService:
         )
 
         if effective_type in ["expense", "loan_receivable"]:
-            if new_bank.balance < amount:
-                self.db.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance"
-                )
-            new_bank.balance -= amount
-            new_ledger.balance += base_part
-            if gst_part > 0:
-                gst_ledger = self._get_gst_ledger(client_id=client_id, user_id=user_id, tx_type=effective_type)
-                if gst_ledger:
-                    gst_ledger.balance += gst_part
+            bank_delta = -amount
         elif effective_type in ["income", "loan_payable"]:
-            new_bank.balance += amount
-            new_ledger.balance += base_part
-            if gst_part > 0:
-                gst_ledger = self._get_gst_ledger(client_id=client_id, user_id=user_id, tx_type=effective_type)
-                if gst_ledger:
-                    gst_ledger.balance += gst_part
+            bank_delta = amount
         else:
             self.db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported transaction type"
             )
 
+        poster = BalancePostingService(self.db)
+        try:
+            poster.post_to_bank_account(
+                new_bank_id,
+                bank_delta,
+                client_id=client_id if payload.bank_account_id else None,
+                user_id=user_id if payload.bank_account_id else None,
+                require_funds=True,
+            )
+        except HTTPException:
+            self.db.rollback()
+            raise
+        poster.post_to_ledger(new_ledger_id, base_part)
+        if gst_part > 0:
+            gst_ledger_id = self._get_gst_ledger(client_id=client_id, user_id=user_id, tx_type=effective_type)
+            if gst_ledger_id:
+                poster.post_to_ledger(gst_ledger_id, gst_part)
+
         # Persist field changes
         if payload.bank_account_id:
-            tx.bank_account_id = new_bank.id
+            tx.bank_account_id = new_bank_id
         if payload.type:
-            tx.ledger_id = new_ledger.id
+            tx.ledger_id = new_ledger_id
             tx.type = effective_type
         if payload.amount:
             tx.amount = amount
@@ -323,6 +494,9 @@ class TransactionService:
         if recompute_gst:
             tx.base_amount = base_amount
             tx.gst_amount = gst_amount
+        rollups.record_transaction(tx, count=1)
+        # Month-end balances from the transaction's date on are stale now
+        invalidate_snapshots(self.db, client_id=client_id, user_id=user_id, changed_at=tx.created_at)
 
         try:
             self.db.commit()
@@ -341,7 +515,12 @@ class TransactionService:
         ).first()
         if tx is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
+        # Before any balance row is locked (see update)
+        lock_tenant_snapshots(self.db, client_id, user_id)
         self._reverse_effects_for_transaction(tx)
+        release_daily_slot(self.db, user_id=user_id, client_id=client_id, created_at=tx.created_at)
+        DailyRollupService(self.db).record_transaction(tx, count=-1)
+        invalidate_snapshots(self.db, client_id=client_id, user_id=user_id, changed_at=tx.created_at)
         tx.is_deleted = True
         tx.deleted_at = func.now()
         try: